@@ -0,0 +1,94 @@
+import io
+import time
+
+import serial
+
+from sim800.manager import SIM800, TimeoutException
+
+
+class CountingStream(io.BytesIO):
+    # in-memory serial port which counts the calls that would be syscalls on a real port
+    def __init__(self, data, chunk=64):
+        super().__init__(data)
+        self.calls = 0
+        self.chunk = chunk  # bytes that arrive between two reads
+
+    @property
+    def in_waiting(self):
+        self.calls += 1
+        return min(len(self.getbuffer()) - self.tell(), self.chunk)
+
+    def read(self, size=1):
+        self.calls += 1
+        return super().read(size)
+
+    # pyserial's read_until(): one read(1) per byte
+    read_until = serial.serialutil.SerialBase.read_until
+    _timeout = None
+
+
+def legacy_readline(stream, state):
+    # SIM800.readline() before the bulk-buffered framer
+    line = state[0]
+    state[0] = b''
+    if not line.endswith(b'\r'):
+        line += stream.read_until(b'\r')
+    if len(line) < 1:
+        return None
+    if not line.endswith(b'\r'):
+        return line
+    next_b = stream.read(1)
+    if next_b.startswith(b'\n'):
+        line += next_b
+    else:
+        state[0] += next_b
+    return line
+
+
+def make_stream(size):
+    chunk = (
+        b'AT+CSQ;+CREG?;+CBC\r'
+        b'\r\n+CSQ: 20,0\r\n'
+        b'\r\n+CREG: 0,1\r\n'
+        b'\r\n+CBC: 0,80,4000\r\n'
+        b'\r\nOK\r\n'
+        b'\r\n+CMTI: "SM",1\r\n'
+    )
+    return chunk * (size // len(chunk) + 1)
+
+
+def bench_legacy(data):
+    stream = CountingStream(data)
+    state = [b'']
+    lines = 0
+    start = time.perf_counter()
+    while legacy_readline(stream, state) is not None:
+        lines += 1
+    return lines, stream.calls, time.perf_counter() - start
+
+
+def bench_framer(data):
+    s = SIM800()
+    s.serial = CountingStream(data)
+    lines = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            s.readline()
+        except TimeoutException:
+            break
+        lines += 1
+    return lines, s.serial.calls, time.perf_counter() - start
+
+
+# python -m benchmarks.bench_readline
+def main(size=1024 * 1024):
+    data = make_stream(size)
+    for name, bench in (('legacy', bench_legacy), ('framer', bench_framer)):
+        lines, calls, elapsed = bench(data)
+        print('{:8} {:8} lines {:9} read calls {:6.2f} calls/line {:8.3f} s'.format(
+            name, lines, calls, calls / lines, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from sim800.manager import SIM800, TimeoutException
+from sim800.commands.command import Command, CombinedCommand
+from sim800.commands.ts27005 import ReadSMSMessageCommand
+from sim800.results.result import ExecutedCommandFinalResult
+from sim800 import pdu
+import sim800.results.unsolicited as unsolicited
+
+from benchmarks.bench_readline import CountingStream, make_stream
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+STREAM_SIZE = 4 * 1024 * 1024  # bytes
+# the results are ns/op relative to the reference benchmark run next to them, so a baseline holds
+# on a faster or slower machine (but not across Python versions): slower than the baseline by more
+# than this is a regression
+TOLERANCE = 0.25
+
+
+# every benchmark returns (operations, seconds)
+
+def bench_reference(n=200000):
+    # plain Python work of the kind the hot paths do, no sim800 code
+    lines = [b'\r\n+CSQ: 20,0\r\n', b'\r\n+CREG: 0,1\r\n', b'\r\nOK\r\n', b'\r\n+CMTI: "SM",1\r\n']
+    codes = {b'OK': 0, b'ERROR': 4}
+    start = time.perf_counter()
+    for i in range(n):
+        line = lines[i % len(lines)].strip(b'\r\n')
+        if line not in codes:
+            line.partition(b': ')[2].split(b',')
+    return n, time.perf_counter() - start
+
+
+def bench_readline(size=STREAM_SIZE):
+    s = SIM800()
+    s.serial = CountingStream(make_stream(size))
+    lines = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            s.readline()
+        except TimeoutException:
+            break
+        lines += 1
+    return lines, time.perf_counter() - start
+
+
+def bench_read_echo_or_result(size=STREAM_SIZE):
+    s = SIM800()
+    s.serial = CountingStream(make_stream(size))
+    events = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            s.read_echo_or_result()
+        except TimeoutException:
+            break
+        events += 1
+    return events, time.perf_counter() - start
+
+
+def bench_final_result(n=200000):
+    lines = [b'OK\r\n', b'ERROR\r\n', b'+CME ERROR: 10\r\n', b'+CMS ERROR: 500\r\n', b'+CSQ: 20,0\r\n']
+    start = time.perf_counter()
+    for i in range(n):
+        ExecutedCommandFinalResult.from_response(lines[i % len(lines)])
+    return n, time.perf_counter() - start
+
+
+def bench_unsolicited(n=20000):
+    response = [b'\r\n+CSQ: 20,0\r\n', b'\r\n+CMTI: "SM",1\r\n', b'\r\n+CREG: 0,1\r\n', b'\r\n+CMTI: "ME",2\r\n']
+    start = time.perf_counter()
+    for i in range(n):
+        unsolicited.from_response(response)
+    return n * len(response), time.perf_counter() - start
+
+
+def bench_extended_write(n=100000):
+    start = time.perf_counter()
+    for i in range(n):
+        bytes(ReadSMSMessageCommand.write(i % 50 + 1, ReadSMSMessageCommand.NOT_CHANGE_STATUS))
+    return n, time.perf_counter() - start
+
+
+def bench_combined_parse(n=500, commands=50):
+    command = CombinedCommand([Command('+C{:03}'.format(i), ['+C{:03}: '.format(i)]) for i in range(commands)])
+    lines = ['\r\n+C{:03}: {}\r\n'.format(i, i).encode('ascii') for i in range(commands)]
+    start = time.perf_counter()
+    for i in range(n):
+        command.parse_response(lines)
+    return n * commands, time.perf_counter() - start
+
+
+def bench_pdu_encode(n=20000):
+    texts = ['Message {} with the GSM 7 bit alphabet: {{€}} @ £ ¥ è é'.format(i) for i in range(100)]
+    messages = [('+8613912345{:03}'.format(i % 10), texts[i % len(texts)]) for i in range(n)]
+    start = time.perf_counter()
+    pdu.encode_submits(messages)
+    return n, time.perf_counter() - start
+
+
+def bench_pdu_decode(n=20000):
+    pdus = ['07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07'] * n
+    start = time.perf_counter()
+    pdu.decode_delivers(pdus)
+    return n, time.perf_counter() - start
+
+
+# name -> (benchmark, size: its first argument)
+BENCHMARKS = {
+    'readline': (bench_readline, STREAM_SIZE),
+    'read_echo_or_result': (bench_read_echo_or_result, STREAM_SIZE),
+    'final_result_from_response': (bench_final_result, 200000),
+    'unsolicited_from_response': (bench_unsolicited, 20000),
+    'extended_command_write': (bench_extended_write, 100000),
+    'combined_command_parse_response': (bench_combined_parse, 500),
+    'pdu_encode_submit': (bench_pdu_encode, 20000),
+    'pdu_decode_deliver': (bench_pdu_decode, 20000),
+}
+REFERENCE_SIZE = 200000
+
+
+def _ns(benchmark, size):
+    operations, seconds = benchmark(size)
+    return seconds * 1e9 / operations
+
+
+def run(names=None, repeat=5, scale=1):
+    # best of repeat runs, as ns/op of the benchmark / ns/op of the reference benchmark;
+    # scale: of the sizes, a smaller one for a quick run
+    results = {}
+    for name in names or BENCHMARKS:
+        benchmark, size = BENCHMARKS[name]
+        best = reference = None
+        for i in range(repeat):
+            # the reference runs next to every run, under the same load and clock speed
+            ns = _ns(benchmark, max(1, int(size * scale)))
+            reference_ns = _ns(bench_reference, max(1, int(REFERENCE_SIZE * scale)))
+            best = ns if best is None else min(best, ns)
+            reference = reference_ns if reference is None else min(reference, reference_ns)
+        results[name] = round(best / reference, 3)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # names of the benchmarks slower than the baseline
+    return [name for name, ratio in results.items()
+            if name in baseline and ratio > baseline[name] * (1 + tolerance)]
+
+
+def python_version():
+    # ratios hold across machines, not across interpreters
+    return '{}.{}'.format(*platform.python_version_tuple()[:2])
+
+
+def load(path=BASELINE):
+    # {'python': major.minor, 'results': {name: ratio}}, or None without a baseline
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# python -m benchmarks.suite [--save] [benchmark ...]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='sim800 hot path benchmarks')
+    parser.add_argument('names', nargs='*', metavar='benchmark', help=', '.join(BENCHMARKS))
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1, help='of the benchmark sizes')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run(args.names, args.repeat, args.scale)
+
+    baseline = {}
+    stored = load(args.baseline)
+    if stored is not None and stored['python'] == python_version():
+        baseline = stored['results']
+    elif stored is not None:
+        print('the baseline is of Python {}, not compared'.format(stored['python']))
+
+    for name, ratio in results.items():
+        line = '{:32} {:8.3f} x reference'.format(name, ratio)
+        if name in baseline:
+            line += ' {:+7.1%}'.format(ratio / baseline[name] - 1)
+        print(line)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': python_version(), 'results': baseline}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if len(regressions) > 0:
+        print('regressions: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import pytest
 
 import io
+import os
+import pty
+import threading
 import serial
 from sim800.manager import SIM800, TimeoutException
 
@@ -14,6 +17,10 @@ class BytesIO(io.BytesIO):
         self.after_write = None
         self.seek_begin = False
 
+    @property
+    def in_waiting(self):
+        return len(self.getbuffer()) - self.tell()
+
     def read_until(self, expected=b'\n', size=None):
         lenterm = len(expected)
         line = bytearray()
@@ -58,3 +65,40 @@ def sim800():
     s.serial = BytesIO()
     return s
 
+
+
+@pytest.fixture
+def pty_port():
+    master, slave = pty.openpty()
+    yield master, os.ttyname(slave)
+    os.close(slave)
+    os.close(master)
+
+
+class FakeModem(threading.Thread):
+    # echoes every command line (ending with b'\r', or b'\x1a' after the "> " prompt)
+    # and writes the next response
+    def __init__(self, master, responses):
+        super().__init__(daemon=True)
+        self.master = master
+        self.responses = list(responses)
+        self.commands = []
+
+    def run(self):
+        received = bytearray()
+        while len(self.responses) > 0:
+            received.extend(os.read(self.master, 1024))
+            while len(self.responses) > 0:
+                ends = [received.find(b) for b in (b'\r', b'\x1a') if b in received]
+                if len(ends) < 1:
+                    break
+                i = min(ends) + 1
+                line = bytes(received[:i])
+                del received[:i]
+                self.commands.append(line)
+                os.write(self.master, line + self.responses.pop(0))
+
+
+@pytest.fixture
+def fake_modem():
+    return FakeModem
@@ -0,0 +1,225 @@
+import asyncio
+import serial
+from sim800 import burst
+from sim800.commands.command import Command, NextLineArgCommand
+from sim800.commands.ts27005 import MoreMessagesToSendCommand
+from sim800.commands.v25ter import SetEchoCommand, SetResultCodeFormatCommand
+from sim800.manager import SIM800, TimeoutException
+from sim800.protocol import ATProtocol, CommandTransaction, Prompt, Unsolicited
+from sim800.subscriptions import UnsolicitedRegistry
+from sim800.timeouts import LatencyEstimator
+
+
+class AsyncSIM800:
+    DEFAULT_TIMEOUT = SIM800.DEFAULT_TIMEOUT  # (float) seconds
+    DEFAULT_WRITE_TIMEOUT = SIM800.DEFAULT_WRITE_TIMEOUT  # (float) seconds
+    IDLE_TIMEOUT = 0.1  # (float) seconds without data after which a pending result is complete
+    PROMPT_TIMEOUT = SIM800.PROMPT_TIMEOUT  # (float) seconds to wait for "> " before the next line argument
+
+    def __init__(self, *args, **kwargs):
+        self.subscriptions = UnsolicitedRegistry(
+            kwargs.pop('unsolicited_maxlen', None), kwargs.pop('unsolicited_overflow', None))
+        self.metrics = kwargs.pop('metrics', None)  # sim800.metrics.Metrics
+        self.timeout = kwargs.pop('timeout', self.DEFAULT_TIMEOUT)
+        self.latency = LatencyEstimator(self.timeout)
+        kwargs['timeout'] = 0  # non-blocking reads, the event loop tells when there is data
+        if 'write_timeout' not in kwargs:
+            kwargs['write_timeout'] = self.DEFAULT_WRITE_TIMEOUT
+        self.serial = serial.Serial(*args, **kwargs)
+        self.unsolicited = self.subscriptions.queue
+        self._unsolicited_received = asyncio.Event()
+        self._protocol = ATProtocol()
+        self._lock = asyncio.Lock()
+        self._loop = None
+        self._idle_handle = None
+        self._transaction = None
+        self._future = None
+        self._prompt = None
+        self._concat_reference = 0
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.recv_unsolicited()
+
+    def on(self, result_type, callback, consume=True):
+        return self.subscriptions.on(result_type, callback, consume)
+
+    def off(self, result_type, callback):
+        self.subscriptions.off(result_type, callback)
+
+    def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.serial.fileno(), self._on_readable)
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self.serial.fileno())
+            if self._idle_handle is not None:
+                self._idle_handle.cancel()
+            self._loop = None
+        self.serial.close()
+        self.subscriptions.close()
+
+    async def enable_fast_mode(self):
+        # see SIM800.enable_fast_mode()
+        self._protocol.numeric = True
+        final, result = await self.send_command(SetResultCodeFormatCommand(verbose=False))
+        if not final.success:
+            self._protocol.numeric = False
+            return final
+        final, result = await self.send_command(SetEchoCommand(enabled=False))
+        return final
+
+    async def send_command(self, command: Command, recv_result=True, timeout=None):
+        self.start()
+
+        async with self._lock:
+            try:
+                if not recv_result:
+                    self._write(bytes(command))
+                    return None
+
+                if timeout is None:
+                    timeout = self.latency.timeout(command)
+                self._transaction = CommandTransaction(command)
+                self._future = self._loop.create_future()
+                start = self._loop.time()
+                if self.metrics is not None:
+                    self.metrics.command_written(command)
+                if isinstance(command, NextLineArgCommand) and command.payload is not None:
+                    if not await self._write_after_prompt(command):
+                        if self.metrics is not None:
+                            self.metrics.command_completed()
+                        return self._future.result()  # e.g. ERROR instead of the prompt
+                else:
+                    self._write(bytes(command))
+                result = await asyncio.wait_for(self._future, timeout)
+                self.latency.observe(command, self._loop.time() - start)
+                if self.metrics is not None:
+                    self.metrics.command_completed()
+                return result
+
+            except (serial.SerialTimeoutException, asyncio.TimeoutError) as e:
+                self.latency.timed_out(command)
+                if self.metrics is not None:
+                    self.metrics.command_timed_out()
+                raise TimeoutException(e)
+            finally:
+                self._transaction = None
+                self._future = None
+                self._prompt = None
+
+    async def send_sms(self, address, text, encoding=None, validity=None, status_report=False, timeout=None):
+        # see SIM800.send_sms()
+        return await self._drive_burst(burst.send_sms(address, text, self._next_concat_reference, encoding, validity,
+                                                      status_report, timeout))
+
+    async def send_sms_burst(self, messages, encoding=None, validity=None, status_report=False, timeout=None,
+                             keep_link=MoreMessagesToSendCommand.KEEP):
+        # see SIM800.send_sms_burst()
+        return await self._drive_burst(burst.send_sms_burst(messages, self._next_concat_reference, encoding, validity,
+                                                            status_report, timeout, keep_link))
+
+    async def _drive_burst(self, steps):
+        # see SIM800._drive_burst()
+        reply = error = None
+        while True:
+            try:
+                command, timeout = steps.send(reply) if error is None else steps.throw(error)
+            except StopIteration as e:
+                return e.value
+            try:
+                reply, error = await self.send_command(command, timeout=timeout), None
+            except Exception as e:
+                reply, error = None, e
+
+    def _next_concat_reference(self):
+        self._concat_reference = (self._concat_reference + 1) % 256
+        return self._concat_reference
+
+    async def _write_after_prompt(self, command):
+        # returns False when the final result came instead of the "> " prompt
+        self._prompt = self._loop.create_future()
+        self._protocol.expect_prompt()
+        self._write(command.header)
+
+        done, pending = await asyncio.wait([self._prompt, self._future], timeout=self.PROMPT_TIMEOUT,
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if self._future in done:
+            return False
+        if self._prompt not in done:
+            if self.metrics is not None:
+                self.metrics.command_timed_out()
+            self._write(command.ESC.encode('ascii'))  # cancel the command
+            raise TimeoutException('no "> " prompt in {} s'.format(self.PROMPT_TIMEOUT))
+
+        self._write(command.payload)
+        return True
+
+    def _write(self, data):
+        self.serial.write(data)
+        if self.metrics is not None:
+            self.metrics.sent(len(data))
+
+    async def recv_unsolicited(self, timeout=None):
+        self.start()
+        try:
+            while len(self.unsolicited) < 1:
+                self._unsolicited_received.clear()
+                await asyncio.wait_for(self._unsolicited_received.wait(), timeout)
+            return self.unsolicited.popleft()
+        except asyncio.TimeoutError as e:
+            raise TimeoutException(e)
+
+    def _on_readable(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except serial.SerialException as e:
+            if self._future is not None and not self._future.done():
+                self._future.set_exception(e)
+            self._loop.remove_reader(self.serial.fileno())
+            return
+
+        if self.metrics is not None and data:
+            self.metrics.received(len(data))
+        self._handle_events(self._protocol.receive_data(data))
+
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = self._loop.call_later(self.IDLE_TIMEOUT, self._on_idle)
+
+    def _on_idle(self):
+        self._idle_handle = None
+        self._handle_events(self._protocol.flush())
+
+    def _handle_events(self, events):
+        if self.metrics is not None and len(events) > 0:
+            self.metrics.events_received(events)
+        for event in events:
+            if isinstance(event, Unsolicited):
+                if self.metrics is not None:
+                    self.metrics.unsolicited_received()
+                self.subscriptions.publish(event.result)
+                self._unsolicited_received.set()
+
+            if isinstance(event, Prompt):
+                if self._prompt is not None and not self._prompt.done():
+                    self._prompt.set_result(event)
+                continue
+
+            transaction = self._transaction
+            if transaction is None or transaction.done:
+                continue  # e.g. echo of a command sent with recv_result=False
+            if transaction.receive(event) and not self._future.done():
+                self._future.set_result(transaction.result())
@@ -0,0 +1,126 @@
+import collections
+import concurrent.futures
+import threading
+from sim800.commands.command import Command, CombinedCommand
+from sim800.results.result import ExecutedCommandFinalResult
+
+
+class QueuedCommand:
+    def __init__(self, command, timeout=None, records=None):
+        self.command = command
+        self.timeout = timeout
+        self.future = concurrent.futures.Future()
+        self.records = records  # queue.Queue of the records of a long response, then None; never combined
+        self.alone = records is not None  # not combined with other commands
+
+
+class CommandBatch:
+    # a combined command line stops at the first command failing: what comes before it is done
+    SUCCEEDED = ExecutedCommandFinalResult(b'\r\nOK\r\n')  # the final result of those commands
+
+    def __init__(self, items, queue=None):
+        self.items = items
+        self.queue = queue  # CommandQueue the commands of a failed batch are sent again from
+        if len(items) == 1:
+            self.command = items[0].command
+        else:
+            self.command = CombinedCommand([i.command for i in items])
+        self.records = items[0].records if len(items) == 1 else None
+
+        timeouts = [i.timeout for i in items if i.timeout is not None]
+        self.timeout = sum(timeouts) if len(timeouts) > 0 else None
+
+    def __len__(self):
+        return len(self.items)
+
+    def set_result(self, transaction):
+        # split the combined response: every command picks its own result from all the lines
+        if len(self.items) > 1 and not transaction.final.success and self.queue is not None:
+            self._set_partial_result(transaction)
+            return
+        for item in self.items:
+            item.future.set_result((transaction.final, item.command.parse_response(transaction.lines)))
+        self._end_records()
+
+    def _set_partial_result(self, transaction):
+        # the modem runs the commands in order: every one up to the last with its result in the lines
+        # succeeded, with a result or not (e.g. +CMGD). The ones after it (the failing one and the ones
+        # the modem didn't run) are sent again one by one for their own final results
+        results = [item.command.parse_response(transaction.lines) for item in self.items]
+        done = max([i + 1 for i, result in enumerate(results) if result is not None], default=0)
+        for item, result in zip(self.items[:done], results):
+            item.future.set_result((self.SUCCEEDED, result))
+        self.queue.retry(self.items[done:])
+
+    def set_exception(self, exception):
+        for item in self.items:
+            item.future.set_exception(exception)
+        self._end_records()
+
+    def _end_records(self):
+        if self.records is not None:
+            self.records.put(None)
+
+
+class CommandQueue:
+    MAX_LINE_LENGTH = 556  # characters, SIM800 command line buffer
+
+    def __init__(self, max_line_length=None):
+        if max_line_length is None:
+            max_line_length = self.MAX_LINE_LENGTH
+        self.max_line_length = max_line_length
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, command: Command, timeout=None, records=None):
+        item = QueuedCommand(command, timeout, records)
+        with self._lock:
+            self._items.append(item)
+        return item.future
+
+    def retry(self, items):
+        # items go back to the head of the queue, each sent alone
+        with self._lock:
+            for item in reversed(items):
+                item.alone = True
+                self._items.appendleft(item)
+
+    def take_batch(self):
+        # returns the next CommandBatch or None: the head of the queue with
+        # as many following combinable commands as fit into one command line
+        with self._lock:
+            items = []
+            length = 0
+            while len(self._items) > 0:
+                item = self._items[0]
+                if item.future.cancelled():
+                    self._items.popleft()
+                    continue
+
+                command = item.command
+                if len(items) > 0:
+                    if not (command.COMBINABLE and items[0].command.COMBINABLE):
+                        break
+                    if item.alone or items[0].alone:
+                        break
+                    if length + 1 + len(command.cmd) > self.max_line_length:  # ";" + cmd
+                        break
+                    length += 1 + len(command.cmd)
+                else:
+                    length = len(bytes(command))
+
+                self._items.popleft()
+                if item.future.running() or item.future.set_running_or_notify_cancel():  # running: retried
+                    items.append(item)
+
+            if len(items) < 1:
+                return None
+            return CommandBatch(items, self)
+
+    def cancel_all(self):
+        with self._lock:
+            while len(self._items) > 0:
+                self._items.popleft().future.cancel()
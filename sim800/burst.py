@@ -0,0 +1,113 @@
+import time
+from sim800 import pdu
+from sim800.commands.ts27005 import SelectSMSMessageFormatCommand, SendSMSMessageCommand, MoreMessagesToSendCommand
+from sim800.protocol import TimeoutException
+
+
+class MessageOutcome:
+    # what happened to one message of SIM800.send_sms_burst()
+    def __init__(self, address, text):
+        self.address = address
+        self.text = text
+        self.results = []  # [(final, result)] of the parts sent
+        self.error = None  # (str) why the message failed
+        self.seconds = 0  # (float) from the first part written to the final result of the last one
+
+    def __repr__(self):
+        return '<{} {} {}>'.format(self.__class__.__name__, self.address, 'sent' if self.success else self.error)
+
+    @property
+    def success(self):
+        return self.error is None and len(self.results) > 0
+
+
+class BurstReport:
+    def __init__(self):
+        self.outcomes = []  # [MessageOutcome] in the order of the messages
+        self.link_kept = False  # +CMMS was accepted
+        self.seconds = 0  # (float) of the whole burst
+
+    def __repr__(self):
+        return '<{} {} sent, {} failed, {:.1f} messages/min>'.format(
+            self.__class__.__name__, self.sent, self.failed, self.throughput * 60)
+
+    @property
+    def sent(self):
+        return sum(1 for outcome in self.outcomes if outcome.success)
+
+    @property
+    def failed(self):
+        return len(self.outcomes) - self.sent
+
+    @property
+    def parts(self):
+        # messages (SMS-SUBMITs) the network accepted, a concatenated message counts all its parts
+        return sum(1 for outcome in self.outcomes for final, result in outcome.results if final.success)
+
+    @property
+    def throughput(self):
+        # (float) messages sent per second
+        if self.seconds <= 0:
+            return 0
+        return self.sent / self.seconds
+
+
+# send_sms() and send_sms_burst() of SIM800 and AsyncSIM800 as generators of (command, timeout) to send:
+# the front end sends every command and sends its (final, result) back, or throws the exception of
+# send_command() into the generator; the generator returns what the method does.
+# next_reference: callable returning the next concatenation reference of the modem
+
+def send_sms(address, text, next_reference, encoding=None, validity=None, status_report=False, timeout=None):
+    final, result = yield SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.PDU), None
+    if not final.success:
+        return [(final, result)]
+    results = []
+    try:
+        yield from send_sms_parts(address, text, next_reference(), encoding, validity, status_report, timeout, results)
+    except TimeoutException as e:
+        e.results = results  # the parts sent before
+        raise
+    return results
+
+
+def send_sms_parts(address, text, reference, encoding, validity, status_report, timeout, results):
+    # PDU mode is set already; (final, result) of every part is appended to results as soon as it comes,
+    # it stops at the first part that fails
+    for data, length in pdu.encode_sms(address, text, reference, encoding, validity, status_report):
+        final, result = yield SendSMSMessageCommand.write(length, pdu=data), timeout
+        results.append((final, result))
+        if not final.success:
+            break
+
+
+def send_sms_burst(messages, next_reference, encoding=None, validity=None, status_report=False, timeout=None,
+                   keep_link=MoreMessagesToSendCommand.KEEP):
+    report = BurstReport()
+    start = time.monotonic()
+    final, result = yield SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.PDU), None
+    if not final.success:
+        raise ValueError('PDU mode is not supported: {}'.format(final.error))
+    final, result = yield MoreMessagesToSendCommand.write(keep_link), None
+    report.link_kept = final.success
+
+    try:
+        for address, text in messages:
+            outcome = MessageOutcome(address, text)
+            report.outcomes.append(outcome)
+            sent = time.monotonic()
+            try:
+                yield from send_sms_parts(address, text, next_reference(), encoding, validity, status_report, timeout,
+                                          outcome.results)
+                final, result = outcome.results[-1]
+                if not final.success:
+                    outcome.error = final.error
+            except ValueError as e:  # e.g. the text is too long
+                outcome.error = str(e)
+            except TimeoutException as e:
+                outcome.error = 'timeout: {}'.format(e)  # outcome.results has the parts sent before
+            outcome.seconds = time.monotonic() - sent
+    finally:
+        if report.link_kept:
+            yield MoreMessagesToSendCommand.write(MoreMessagesToSendCommand.DISABLE), None
+        report.seconds = time.monotonic() - start
+    return report
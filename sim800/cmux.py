@@ -0,0 +1,314 @@
+import threading
+import time
+import serial
+from sim800.commands.ts27007 import MultiplexerControlCommand
+from sim800.manager import SIM800, TimeoutException
+
+
+# GSM 07.10 (3GPP TS 27.010) basic option
+FLAG = 0xF9
+EA = 0x01  # last octet of the field
+CR = 0x02  # command/response
+PF = 0x10  # poll/final
+
+SABM = 0x2F
+UA = 0x63
+DM = 0x0F
+DISC = 0x43
+UIH = 0xEF
+UI = 0x03
+
+# control channel (DLCI 0) message types, the EA and C/R bits are set apart
+CLD = 0xC1  # multiplexer close down
+MSC = 0xE1  # modem status command
+
+MSC_SIGNALS = EA | 0x04 | 0x08  # RTC and RTR on, no flow control
+
+
+def _fcs_table():
+    # CRC-8 with polynomial x^8 + x^2 + x + 1, bits reversed
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xE0 if crc & 1 else crc >> 1
+        table.append(crc)
+    return bytes(table)
+
+
+FCS_TABLE = _fcs_table()
+FCS_GOOD = 0xCF  # crc over the checked octets and the FCS
+
+
+def _crc(data):
+    crc = 0xFF
+    for b in data:
+        crc = FCS_TABLE[crc ^ b]
+    return crc
+
+
+def fcs(data):
+    return 0xFF - _crc(data)
+
+
+class Frame:
+    def __init__(self, dlci, control, data=b'', cr=True):
+        self.dlci = dlci
+        self.control = control  # with the P/F bit
+        self.data = data
+        self.cr = cr
+
+    def __repr__(self):
+        return '<{} dlci={} control=0x{:02X} {!r}>'.format(self.__class__.__name__, self.dlci, self.control, self.data)
+
+    def __eq__(self, other):
+        return (self.dlci, self.control, self.data) == (other.dlci, other.control, other.data)
+
+    @property
+    def type(self):
+        return self.control & ~PF
+
+    def __bytes__(self):
+        header = bytearray([(self.dlci << 2) | (CR if self.cr else 0) | EA, self.control])
+        length = len(self.data)
+        if length < 128:
+            header.append((length << 1) | EA)
+        else:
+            header += bytes([(length << 1) & 0xFE, length >> 7])
+        # UIH frames check the header only
+        checked = header if self.type == UIH else header + self.data
+        return bytes([FLAG]) + bytes(header) + self.data + bytes([fcs(checked), FLAG])
+
+
+class FrameDecoder:
+    # bytes in, frames out; frames with a wrong FCS or format are dropped
+    def __init__(self):
+        self._buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+        buffer = self._buffer
+        while True:
+            start = buffer.find(FLAG)
+            if start < 0:
+                buffer.clear()
+                break
+            while start + 1 < len(buffer) and buffer[start + 1] == FLAG:
+                start += 1  # closing flag of the previous frame, or fill
+            del buffer[:start]
+
+            if len(buffer) < 4:
+                break
+            address, control, length = buffer[1], buffer[2], buffer[3]
+            header_size = 3
+            if not length & EA:
+                if len(buffer) < 5:
+                    break
+                length = (length >> 1) | (buffer[4] << 7)
+                header_size = 4
+            else:
+                length >>= 1
+            end = 1 + header_size + length  # FCS position
+            if len(buffer) < end + 2:
+                break
+
+            header = buffer[1:1 + header_size]
+            data = bytes(buffer[1 + header_size:end])
+            checked = header if control & ~PF == UIH else header + data
+            if not address & EA or buffer[end + 1] != FLAG or _crc(checked + buffer[end:end + 1]) != FCS_GOOD:
+                self.errors += 1
+                del buffer[:1]  # resync at the next flag
+                continue
+
+            frames.append(Frame(address >> 2, control, data, bool(address & CR)))
+            del buffer[:end + 1]  # keep the closing flag, it may open the next frame
+        return frames
+
+
+class Channel:
+    # serial-like transport of one DLCI: SIM800(...).serial can be a Channel
+    def __init__(self, mux, dlci, timeout=None):
+        self.mux = mux
+        self.dlci = dlci
+        self.timeout = timeout
+        self.is_open = True
+        self._buffer = bytearray()
+        self._received = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    def _receive(self, data):
+        with self._received:
+            self._buffer += data
+            self._received.notify_all()
+
+    def read(self, size=1):
+        with self._received:
+            if len(self._buffer) < 1 and self.timeout != 0:
+                self._received.wait(self.timeout)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        if not self.is_open:
+            raise serial.SerialException('channel {} is closed'.format(self.dlci))
+        self.mux.send_data(self.dlci, bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self._received:
+            self._buffer.clear()
+
+    def close(self):
+        if self.is_open:
+            self.mux.close_channel(self.dlci)
+
+
+class CMUX:
+    # splits one port in GSM 07.10 basic option mode into channels (DLCI 1, 2, ...)
+    CONTROL_DLCI = 0
+    FRAME_SIZE = 127  # N1, (int) bytes of data in a frame
+    RESPONSE_TIMEOUT = 1  # (float) seconds to wait for UA
+    READ_TIMEOUT = 0.1  # (float) seconds
+
+    def __init__(self, port, frame_size=None):
+        # port: the serial port, already switched to the multiplexer mode with +CMUX
+        if frame_size is None:
+            frame_size = self.FRAME_SIZE
+        self.serial = port
+        self.frame_size = frame_size
+        self.channels = {}  # DLCI -> Channel
+        self.decoder = FrameDecoder()
+        self._write_lock = threading.Lock()
+        self._responses = {}  # DLCI -> last UA or DM control
+        self._responded = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._port_timeout = None
+
+    @classmethod
+    def enter(cls, manager, frame_size=None):
+        # sends +CMUX over the manager's port and opens the control channel
+        if frame_size is None:
+            frame_size = cls.FRAME_SIZE
+        final, result = manager.send_command(MultiplexerControlCommand.write(
+            MultiplexerControlCommand.BASIC, MultiplexerControlCommand.UIH, None, frame_size))
+        if not final.success:
+            raise serial.SerialException('+CMUX failed: {}'.format(final.error))
+        mux = cls(manager.serial, frame_size)
+        mux.start()
+        return mux
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        self._port_timeout = self.serial.timeout
+        self.serial.timeout = self.READ_TIMEOUT
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='CMUX reader', daemon=True)
+        self._thread.start()
+        self._establish(self.CONTROL_DLCI)
+
+    def open(self, dlci, timeout=None):
+        if dlci in self.channels:
+            return self.channels[dlci]
+        self._establish(dlci)
+        channel = self.channels[dlci] = Channel(self, dlci, timeout)
+        # ready to receive, without it the modem might hold the data back
+        self._send(Frame(self.CONTROL_DLCI, UIH, bytes([MSC | CR | EA, (2 << 1) | EA, (dlci << 2) | CR | EA, MSC_SIGNALS])))
+        return channel
+
+    def manager(self, dlci, manager_class=SIM800, **kwargs):
+        # a manager talking over a channel instead of a port
+        manager = manager_class(**kwargs)
+        manager.serial = self.open(dlci, manager.serial.timeout)
+        return manager
+
+    def close_channel(self, dlci):
+        channel = self.channels.pop(dlci, None)
+        if channel is not None:
+            channel.is_open = False
+        try:
+            self._request(Frame(dlci, DISC | PF))
+        except TimeoutException:
+            pass
+
+    def close(self):
+        if not self._running:
+            return
+        for dlci in list(self.channels):
+            self.close_channel(dlci)
+        # back to the AT command mode
+        self._send(Frame(self.CONTROL_DLCI, UIH, bytes([CLD | CR | EA, EA])))
+        time.sleep(self.READ_TIMEOUT)
+        self._running = False
+        self._thread.join()
+        self._thread = None
+        self.serial.timeout = self._port_timeout
+
+    def send_data(self, dlci, data):
+        for i in range(0, len(data), self.frame_size):
+            self._send(Frame(dlci, UIH, data[i:i + self.frame_size]))
+
+    def _send(self, frame):
+        with self._write_lock:
+            self.serial.write(bytes(frame))
+
+    def _establish(self, dlci):
+        response = self._request(Frame(dlci, SABM | PF))
+        if response & ~PF != UA:
+            raise serial.SerialException('DLCI {} is rejected'.format(dlci))
+
+    def _request(self, frame):
+        # sends SABM or DISC, returns the control of the response
+        with self._responded:
+            self._responses.pop(frame.dlci, None)
+            self._send(frame)
+            deadline = time.monotonic() + self.RESPONSE_TIMEOUT
+            while frame.dlci not in self._responses:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutException('no response on DLCI {}'.format(frame.dlci))
+                self._responded.wait(remaining)
+            return self._responses.pop(frame.dlci)
+
+    def _run(self):
+        while self._running:
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except serial.SerialException:
+                break
+            if data:
+                for frame in self.decoder.feed(data):
+                    self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        if frame.type in (UA, DM):
+            with self._responded:
+                self._responses[frame.dlci] = frame.control
+                self._responded.notify_all()
+        elif frame.type in (UIH, UI):
+            if frame.dlci == self.CONTROL_DLCI:
+                self._control_message(frame.data)
+            elif frame.dlci in self.channels:
+                self.channels[frame.dlci]._receive(frame.data)
+        elif frame.type == DISC:
+            channel = self.channels.pop(frame.dlci, None)
+            if channel is not None:
+                channel.is_open = False
+            self._send(Frame(frame.dlci, UA | PF))
+
+    def _control_message(self, data):
+        if len(data) < 1 or not data[0] & CR:
+            return  # a response
+        # acknowledge commands from the modem (e.g. MSC) with the same content
+        self._send(Frame(self.CONTROL_DLCI, UIH, bytes([data[0] & ~CR]) + data[1:]))
@@ -1,4 +1,5 @@
 import functools
+from sim800.results.prefix import PrefixDispatcher
 from sim800.results.result import Result, CombinedResult
 
 
@@ -6,6 +7,11 @@ class Command:
     PREFIX = "AT"
     SUFFIX = "\r"
 
+    TIMEOUT = None  # (float) seconds until the final result, None: manager's default
+    ADAPTIVE_TIMEOUT = True  # manager may wait less when the command is known to answer fast
+    COMBINABLE = True  # manager may send it in one CombinedCommand with other queued commands
+    STREAM_PREFIX = None  # (bytes) prefix of the records of a long response, see SIM800.iter_command_result()
+
     def __init__(self, cmd_string="", result_prefixes=None):
         self.cmd = cmd_string
         if result_prefixes is None:
@@ -19,13 +25,16 @@ class Command:
         return '<{} "{}">'.format(self.__class__.__name__, self.PREFIX + self.cmd)
 
     def parse_response(self, lines):
+        dispatcher = PrefixDispatcher.for_prefixes(self.result_prefixes)
         for line in lines:
-            s = line.strip()
-            for prefix in self.result_prefixes:
-                if s.startswith(prefix.encode('ascii')):
-                    return Result(line)
+            if dispatcher.match(line) is not None:
+                return Result(line)
         return None
 
+    def parse_record(self, line):
+        # one result of iter_command_result(), None if the line isn't one
+        return self.parse_response([line])
+
 
 class NoResponseCommand(Command):
     def parse_response(self, lines):
@@ -84,6 +93,12 @@ class NextLineArgCommand(ExtendedCommand):
     SUB = "\x1a"  # Ctrl-Z
     ESC = "\x1b"
 
+    COMBINABLE = False
+
+    # write() splits the command for sending the argument after the "> " prompt
+    header = None  # b'AT...=...\r'
+    payload = None  # next line argument + SUB
+
     @classmethod
     def write(cls, *args, next_line_arg=""):
         if cls.WRITE not in cls.COMMANDS:
@@ -97,10 +112,14 @@ class NextLineArgCommand(ExtendedCommand):
 
         cmd = cls(cmd_string, result_prefixes)
         cmd.SUFFIX = ""
+        cmd.header = (cls.PREFIX + cls.BASE_CMD + cmd_string_suffix + "\r").encode('ascii')
+        cmd.payload = (next_line_arg + cls.SUB).encode('ascii')
         return cmd
 
 
 class CombinedCommand(Command):
+    COMBINABLE = False
+
     def __init__(self, commands, *args):
         if len(args) > 0:
             # agruments are passed as arg1, arg2, ...
@@ -119,10 +138,14 @@ class CombinedCommand(Command):
         result_prefixes = functools.reduce(lambda a, b: a + b, result_prefixes, [])
         super().__init__(cmd_string, result_prefixes)
 
+        timeouts = [c.TIMEOUT for c in self.commands if c.TIMEOUT is not None]
+        if len(timeouts) > 0:
+            self.TIMEOUT = sum(timeouts)
+        self.ADAPTIVE_TIMEOUT = all(c.ADAPTIVE_TIMEOUT for c in self.commands)
+
     def parse_response(self, lines):
         results = []
         for line in lines:
-            s = line.strip()
             for cmd in self.commands:
                 result = cmd.parse_response([line])
                 if result is not None:
@@ -2,6 +2,8 @@ from sim800.commands.command import Command, ExtendedCommand
 
 
 class PowerOffCommand(Command):
+    COMBINABLE = False
+
     def __init__(self, normal=True):
         cmd_string = "+CPOWD="
         cmd_string += "1" if normal else "0"
@@ -16,6 +18,7 @@ class TimesRemainedToInputPINPUKCommand(Command):
 class DeleteAllSMSMessagesCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE]
     BASE_CMD = "+CMGDA"
+    TIMEOUT = 25
 
     class _Mode:
         pass
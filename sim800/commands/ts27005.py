@@ -1,10 +1,12 @@
 from sim800.commands.command import Command, NoResponseCommand, ExtendedCommand, NextLineArgCommand
 from sim800.results import Result
+from sim800.results.ts27005 import ListedSMSMessageResult, ReadSMSMessageResult, SentMessageResult
 
 
 class DeleteSMSMessageCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE]
     BASE_CMD = "+CMGD"
+    TIMEOUT = 25
 
     DELETE_SPECIFIED = 0
     DELETE_READ = 1
@@ -46,6 +48,8 @@ class SelectSMSMessageFormatCommand(ExtendedCommand):
 class ListSMSMessagesCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE, ExtendedCommand.EXECUTE]
     BASE_CMD = "+CMGL"
+    TIMEOUT = 20
+    STREAM_PREFIX = ListedSMSMessageResult.PREFIX
 
     class _Mode:
         INT = -1
@@ -95,6 +99,11 @@ class ListSMSMessagesCommand(ExtendedCommand):
             raise ValueError('"{}" is not supported'.format(stat))
         return super().write(stat, mode)
 
+    def parse_record(self, line):
+        if ListedSMSMessageResult.from_response(line) is None:
+            return None
+        return ListedSMSMessageResult(line)
+
 
 class ReadSMSMessageCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE]
@@ -115,10 +124,18 @@ class ReadSMSMessageCommand(ExtendedCommand):
             raise ValueError('"{}" is not supported'.format(mode))
         return super().write(index, mode)
 
+    def parse_response(self, lines):
+        result = super().parse_response(lines)
+        if result is None:
+            return None
+        return ReadSMSMessageResult(result.raw_result)
+
 
 class SendSMSMessageCommand(NextLineArgCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE]
     BASE_CMD = "+CMGS"
+    TIMEOUT = 60
+    ADAPTIVE_TIMEOUT = False  # depends on the network
 
     @classmethod
     def write(cls, *args, text=None, pdu=None):
@@ -133,6 +150,12 @@ class SendSMSMessageCommand(NextLineArgCommand):
 
         return super().write(*args, next_line_arg=next_line_arg)
 
+    def parse_response(self, lines):
+        result = super().parse_response(lines)
+        if result is None:
+            return None
+        return SentMessageResult(result.raw_result)
+
 
 class WriteSMSMessageToMemoryCommand(NextLineArgCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE, ExtendedCommand.EXECUTE]
@@ -183,6 +206,8 @@ class WriteSMSMessageToMemoryCommand(NextLineArgCommand):
 class SendSMSMessageFromStorageCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE]
     BASE_CMD = "+CMSS"
+    TIMEOUT = 60
+    ADAPTIVE_TIMEOUT = False  # depends on the network
 
     @classmethod
     def write(cls, index, da=None, toda=None):
@@ -203,6 +228,12 @@ class SendSMSMessageFromStorageCommand(ExtendedCommand):
 
         return super().write(*args)
 
+    def parse_response(self, lines):
+        result = super().parse_response(lines)
+        if result is None:
+            return None
+        return SentMessageResult(result.raw_result)
+
 
 
 class NewSMSMessageIndicationCommand(ExtendedCommand):
@@ -240,6 +271,27 @@ class NewSMSMessageIndicationCommand(ExtendedCommand):
     BFR = [BUFFER_FLUSHED, BUFFER_CLEARED]
 
 
+class NewMessageAcknowledgementCommand(ExtendedCommand):
+    # acknowledges +CMT (and +CDS) with +CSMS=1, without it in time the network sends the message again;
+    # execute() in text mode, write() in PDU mode
+    COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.WRITE, ExtendedCommand.EXECUTE]
+    BASE_CMD = "+CNMA"
+
+    LIKE_TEXT_MODE = 0
+    ACK = 1  # RP-ACK
+    ERROR = 2  # RP-ERROR, e.g. the message couldn't be handled
+
+    N = [LIKE_TEXT_MODE, ACK, ERROR]
+
+    @classmethod
+    def write(cls, n=None):
+        if n is None:
+            n = cls.ACK
+        if n not in cls.N:
+            raise ValueError('"{}" is not supported'.format(n))
+        return super().write(n)
+
+
 class PreferredSMSMessageStorageCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+CPMS"
@@ -258,3 +310,24 @@ class SMSServiceCenterAddressCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+CSCA"
 
+
+
+class MoreMessagesToSendCommand(ExtendedCommand):
+    COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
+    BASE_CMD = "+CMMS"
+
+    DISABLE = 0
+    # keep the relay link between messages; it's closed when the next +CMGS/+CMSS doesn't come in 1-5 s,
+    # then KEEP_ONCE is switched back to DISABLE, KEEP stays
+    KEEP_ONCE = 1
+    KEEP = 2
+
+    MODE = [DISABLE, KEEP_ONCE, KEEP]
+
+    @classmethod
+    def write(cls, mode=None):
+        if mode is None:
+            mode = cls.DISABLE
+        if mode not in cls.MODE:
+            raise ValueError('"{}" is not supported'.format(mode))
+        return super().write(mode)
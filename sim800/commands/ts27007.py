@@ -64,6 +64,8 @@ class CallingLineIdPresentationCommand(ExtendedCommand):
 class OperationSelectionCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+COPS"
+    TIMEOUT = 120  # network scan of +COPS=? takes tens of seconds
+    ADAPTIVE_TIMEOUT = False
 
 
 class FindPhonebookEntriesCommand(ExtendedCommand):
@@ -183,6 +185,8 @@ class BatteryChargeCommand(ExtendedCommand):
 class USSDCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+CUSD"
+    TIMEOUT = 60
+    ADAPTIVE_TIMEOUT = False  # depends on the network
 
     DISABLE_RESULT = 0
     ENABLE_RESULT = 1
@@ -190,3 +194,31 @@ class USSDCommand(ExtendedCommand):
 
     N = [DISABLE_RESULT, ENABLE_RESULT, CANCEL_SESSION]
 
+
+
+class MultiplexerControlCommand(ExtendedCommand):
+    COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
+    BASE_CMD = "+CMUX"
+    COMBINABLE = False  # the port carries GSM 07.10 frames after the final result
+
+    BASIC = 0
+
+    MODE = [BASIC]  # SIM800 supports the basic option only
+
+    UIH = 0
+    UI = 1
+
+    SUBSET = [UIH, UI]
+
+    @classmethod
+    def write(cls, mode=None, subset=None, port_speed=None, frame_size=None):
+        if mode is None:
+            mode = cls.BASIC
+        if mode not in cls.MODE:
+            raise ValueError('"{}" is not supported'.format(mode))
+        if subset is not None and subset not in cls.SUBSET:
+            raise ValueError('"{}" is not supported'.format(subset))
+        args = [mode, subset, port_speed, frame_size]
+        while args[-1] is None:
+            args.pop()
+        return super().write(*args)
@@ -3,6 +3,8 @@ from sim800.results import Result
 
 
 class ATCommand(NoResponseCommand):
+    COMBINABLE = False
+
     def __init__(self):
         super().__init__("")
 
@@ -13,6 +15,14 @@ class SetEchoCommand(NoResponseCommand):
         super().__init__(cmd_string)
 
 
+class SetResultCodeFormatCommand(NoResponseCommand):
+    COMBINABLE = False  # the format of the final result changes with it
+
+    def __init__(self, verbose=True):
+        cmd_string = "V1" if verbose else "V0"
+        super().__init__(cmd_string)
+
+
 class DisplayProductInfoCommand(Command):
     def __init__(self):
         super().__init__("I", ['SIM'])
@@ -75,8 +85,34 @@ class LocalDataFlowControlCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+IFC"
 
+    NONE = 0
+    SOFTWARE = 1  # XON/XOFF
+    HARDWARE = 2  # RTS/CTS
+
+    FLOW_CONTROL = [NONE, SOFTWARE, HARDWARE]
+
+    @classmethod
+    def write(cls, dce_by_dte, dte_by_dce=None):
+        if dte_by_dce is None:
+            dte_by_dce = dce_by_dte
+        if dce_by_dte not in cls.FLOW_CONTROL:
+            raise ValueError('{} is not supported'.format(dce_by_dte))
+        if dte_by_dce not in cls.FLOW_CONTROL:
+            raise ValueError('{} is not supported'.format(dte_by_dce))
+        return super().write(dce_by_dte, dte_by_dce)
+
 
 class FixedLocalRateCommand(ExtendedCommand):
     COMMANDS = [ExtendedCommand.TEST, ExtendedCommand.READ, ExtendedCommand.WRITE]
     BASE_CMD = "+IPR"
+    COMBINABLE = False  # the rate changes after the final result
+
+    AUTO = 0
+    RATES = [AUTO, 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800]
+
+    @classmethod
+    def write(cls, rate):
+        if rate not in cls.RATES:
+            raise ValueError('{} is not supported'.format(rate))
+        return super().write(rate)
 
@@ -0,0 +1,273 @@
+import collections
+import sqlite3
+import threading
+import time
+from sim800 import pdu
+
+
+class Delivery:
+    # a status report matched to the message part it reports on
+    def __init__(self, key, address, message_reference, sent, reported, status, complete=False):
+        self.key = key  # what DeliveryReportIndex.add() got, e.g. an outbox id
+        self.address = address
+        self.message_reference = message_reference
+        self.sent = sent  # (float) Unix time of +CMGS
+        self.reported = reported  # (float) Unix time the report was matched
+        self.status = status  # (int) TP-ST
+        self.complete = complete  # the final reports of all parts of the message are in
+        self.message_delivered = None  # (bool) when complete: all parts of the message were delivered
+
+    def __repr__(self):
+        return '<{} {} to {} status {:#04x}>'.format(self.__class__.__name__, self.key, self.address, self.status)
+
+    @property
+    def delivered(self):
+        return self.status < pdu.STATUS_TEMPORARY
+
+    @property
+    def final(self):
+        return self.status < pdu.STATUS_TEMPORARY or self.status >= pdu.STATUS_PERMANENT
+
+    @property
+    def latency(self):
+        # (float) seconds from +CMGS to the report
+        return self.reported - self.sent
+
+
+class _Part:
+    def __init__(self, id, reference, address, key, sent):
+        self.id = id
+        self.reference = reference
+        self.address = address
+        self.key = key
+        self.sent = sent
+
+
+class DeliveryReportIndex:
+    # matches status reports (+CDS) to the messages sent by TP-MR and recipient; TP-MR is one octet,
+    # so a modem reuses it every 256 parts: of the parts with the same reference the newest one sent before
+    # the report matches, a part whose report got lost doesn't take the reports of the later ones.
+    # With path the parts waiting for a report survive a restart.
+    TTL = 3 * 24 * 3600  # (float) seconds to wait for the final report of a part
+    # (float) seconds a report of no part known waits for add(): the report of the first part of
+    # a concatenated message may come before send_sms() returns
+    EARLY_REPORT_WAIT = 60
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS parts (
+            id INTEGER PRIMARY KEY,
+            reference INTEGER NOT NULL,
+            address TEXT,
+            key,  -- any of NULL, int, float, str, bytes
+            sent REAL NOT NULL  -- (float) Unix time
+        );
+        CREATE INDEX IF NOT EXISTS parts_sent ON parts (sent);
+        CREATE TABLE IF NOT EXISTS failed (
+            key PRIMARY KEY  -- of a message with a part failed and parts still waiting for a report
+        );
+    '''
+
+    def __init__(self, path=None, ttl=None, reported=None, expired=None, metrics=None):
+        # path: SQLite database file, None: in memory only;
+        # reported: callback(Delivery) of every report matched; expired: callback(key) of a message
+        # with no final reports in ttl; metrics: sim800.metrics.Metrics
+        if ttl is None:
+            ttl = self.TTL
+        self.ttl = ttl
+        self.reported = reported
+        self.expired = expired
+        self.metrics = metrics
+        self._parts = collections.OrderedDict()  # id -> _Part, the oldest first
+        self._by_reference = {}  # TP-MR -> [id], the oldest first
+        self._messages = {}  # key -> [parts without a final report, a part failed]
+        self._early = collections.deque()  # (time, report) matching no part yet, the oldest first
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.executescript(self.SCHEMA)
+            self._load()
+
+    def __len__(self):
+        # (int) parts waiting for a final report
+        return len(self._parts)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+    def _load(self):
+        rows = self.db.execute('SELECT id, reference, address, key, sent FROM parts ORDER BY sent, id').fetchall()
+        for row in rows:
+            self._insert(_Part(*row))
+        if len(rows) > 0:
+            self._next_id = max(row[0] for row in rows) + 1
+        for key, in self.db.execute('SELECT key FROM failed'):
+            message = self._messages.get(key)
+            if message is not None:
+                message[1] = True
+
+    def add(self, address, references, key=None, now=None):
+        # references: TP-MR of the parts of one message sent to address (see SentMessageResult.mr);
+        # key: the message in reported and expired callbacks, by default an id of the index
+        if now is None:
+            now = time.time()
+        with self._lock:
+            expired, unmatched = self._evict(now)
+            if key is None:
+                key = self._next_id
+            parts = [_Part(self._next_id + i, reference, address, key, now) for i, reference in enumerate(references)]
+            self._next_id += len(parts)
+            if self.db is not None:
+                self.db.executemany('INSERT INTO parts (id, reference, address, key, sent) VALUES (?, ?, ?, ?, ?)',
+                                    [(p.id, p.reference, p.address, p.key, p.sent) for p in parts])
+            for part in parts:
+                self._insert(part)
+            deliveries = self._match_early()
+        self._notify(expired, unmatched, deliveries)
+        return key
+
+    def track(self, address, results, key=None, now=None):
+        # results: [(final, result)] of SIM800.send_sms(), the parts sent are added as one message
+        references = [result.mr for final, result in results if final.success and result is not None]
+        if len(references) < 1:
+            return None
+        return self.add(address, references, key, now)
+
+    def _insert(self, part):
+        self._parts[part.id] = part
+        self._by_reference.setdefault(part.reference, []).append(part.id)
+        message = self._messages.setdefault(part.key, [0, False])
+        message[0] += 1
+
+    def match(self, report, now=None):
+        # report: StatusReportResult or sim800.pdu.StatusReport; returns Delivery, or None when no part
+        # matches (yet, see EARLY_REPORT_WAIT). A part stays until its final report,
+        # the message is complete with the final reports of all its parts
+        if now is None:
+            now = time.time()
+        if report.message_reference is None or report.status is None:
+            return None
+        with self._lock:
+            expired, unmatched = self._evict(now)
+            delivery = self._match(report, now)
+            if delivery is None:
+                self._early.append((now, report))
+        self._notify(expired, unmatched, [] if delivery is None else [delivery])
+        return delivery
+
+    def _match(self, report, now, sent_before=None):
+        # called with the lock held; sent_before: the latest part.sent that can match, by default now
+        if sent_before is None:
+            sent_before = now
+        part = self._find(report.message_reference, report.address, sent_before)
+        if part is None:
+            return None
+        # an early report is as late as the part added
+        delivery = Delivery(part.key, part.address, part.reference, part.sent, max(now, part.sent), report.status)
+        if delivery.final:
+            self._remove(part)
+            if self.db is not None:
+                self.db.execute('DELETE FROM parts WHERE id = ?', (part.id,))
+            message = self._messages[part.key]
+            message[0] -= 1
+            failed = not message[1] and not delivery.delivered
+            message[1] = message[1] or not delivery.delivered
+            if message[0] < 1:
+                del self._messages[part.key]
+                delivery.complete = True
+                delivery.message_delivered = not message[1]
+            if self.db is not None:
+                if delivery.complete:
+                    self.db.execute('DELETE FROM failed WHERE key = ?', (part.key,))
+                elif failed:
+                    self.db.execute('INSERT OR IGNORE INTO failed (key) VALUES (?)', (part.key,))
+        return delivery
+
+    def _match_early(self):
+        # called with the lock held
+        deliveries = []
+        early = self._early
+        self._early = collections.deque()
+        for t, report in early:
+            # the part is added after its report came
+            delivery = self._match(report, t, t + self.EARLY_REPORT_WAIT)
+            if delivery is None:
+                self._early.append((t, report))
+            else:
+                deliveries.append(delivery)
+        return deliveries
+
+    def _find(self, reference, address, sent_before):
+        for id in reversed(self._by_reference.get(reference, ())):
+            part = self._parts[id]
+            if part.sent <= sent_before and self._same_address(part.address, address):
+                return part
+        return None
+
+    @staticmethod
+    def _same_address(a, b):
+        # the report may have the national form of the number sent to
+        if a is None or b is None:
+            return True
+        a, b = a.lstrip('+'), b.lstrip('+')
+        return a.endswith(b) or b.endswith(a)
+
+    def _remove(self, part):
+        del self._parts[part.id]
+        ids = self._by_reference[part.reference]
+        ids.remove(part.id)
+        if len(ids) < 1:
+            del self._by_reference[part.reference]
+
+    def evict(self, now=None):
+        # drop the parts with no final report in ttl, returns the keys of their messages
+        if now is None:
+            now = time.time()
+        with self._lock:
+            expired, unmatched = self._evict(now)
+        self._notify(expired, unmatched, [])
+        return expired
+
+    def _evict(self, now):
+        # called with the lock held, returns (keys of the messages expired, reports unmatched)
+        unmatched = 0
+        while len(self._early) > 0 and self._early[0][0] <= now - self.EARLY_REPORT_WAIT:
+            self._early.popleft()
+            unmatched += 1
+
+        deadline = now - self.ttl
+        expired = []
+        evicted = False
+        while len(self._parts) > 0:
+            part = next(iter(self._parts.values()))
+            if part.sent > deadline:
+                break
+            self._remove(part)
+            evicted = True
+            if self._messages.pop(part.key, None) is not None:
+                expired.append(part.key)
+        if self.db is not None and evicted:
+            self.db.execute('DELETE FROM parts WHERE sent <= ?', (deadline,))
+            self.db.executemany('DELETE FROM failed WHERE key = ?', [(key,) for key in expired])
+        return expired, unmatched
+
+    def _notify(self, expired, unmatched, deliveries):
+        # callbacks and metrics out of the lock
+        for key in expired:
+            if self.metrics is not None:
+                self.metrics.delivery_expired()
+            if self.expired is not None:
+                self.expired(key)
+        if self.metrics is not None:
+            for i in range(unmatched):
+                self.metrics.delivery_unmatched()
+        for delivery in deliveries:
+            if delivery.complete and self.metrics is not None:
+                self.metrics.delivery_reported(delivery.latency, delivery.message_delivered)
+            if self.reported is not None:
+                self.reported(delivery)
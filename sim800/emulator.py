@@ -0,0 +1,787 @@
+import datetime
+import os
+import pty
+import re
+import select
+import termios
+import threading
+import time
+import tty
+from sim800 import pdu
+from sim800.cmux import Frame, FrameDecoder, CR, EA, PF, SABM, UA, DISC, UIH, CLD
+
+
+class CommandError(Exception):
+    def __init__(self, code=None, cms=False):
+        super().__init__(code)
+        self.code = code
+        self.cms = cms
+
+
+class StoredMessage:
+    def __init__(self, stat, address, text=None, pdu=None, timestamp=None):
+        self.stat = stat  # text mode <stat>: "REC UNREAD", "REC READ", "STO UNSENT", "STO SENT"
+        self.address = address
+        self.text = text
+        self.pdu = pdu
+        self.timestamp = timestamp
+
+
+class SIM800Emulator:
+    # SIM800 talking AT commands over a pseudo-terminal: SIM800(emulator.port) works unmodified
+
+    STATS = ["REC UNREAD", "REC READ", "STO UNSENT", "STO SENT"]  # <stat> in PDU mode is the index
+
+    IMEI = "862643039999994"
+    IMSI = "460001234567890"
+    OPERATOR = "CHINA MOBILE"
+    MEMORY_SIZE = 50
+    TIME_FORMAT = '%y/%m/%d,%H:%M:%S+00'
+
+    RATES = [1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800]  # +IPR, 0: autobauding
+    TERMIOS_RATES = {getattr(termios, 'B{}'.format(r)): r for r in RATES if hasattr(termios, 'B{}'.format(r))}
+
+    URC_CHANNEL = 1  # DLCI of unsolicited results in the multiplexer mode
+
+    BASIC_COMMAND = re.compile(r'(&?[A-Z])(\d*)', re.IGNORECASE)
+    ARG = re.compile(r'\s*(?:"([^"]*)"|([^,]*))\s*(?:,|$)')
+
+    def __init__(self, latency=None, baudrate=None, echo=True, rate=0, max_rate=None, link_setup=0):
+        self.latency = dict(latency or {})  # command name (e.g. "+CMGS", "E") -> (float) seconds
+        self.default_latency = 0
+        self.link_setup = link_setup  # (float) seconds +CMGS/+CMSS take to set up the relay link, unless +CMMS kept it
+        self._link_kept = False
+        self.baudrate = baudrate  # throttle output to this rate, None: as fast as possible
+        # the modem ignores the host when the port is set to another rate than +IPR (0 matches any),
+        # and above max_rate the line is unstable: everything the modem sends is garbled
+        self.rate = rate
+        self.max_rate = max_rate
+        self._next_rate = None  # +IPR takes effect after OK
+        self.frame_size = 127
+        self._mux = None  # FrameDecoder after +CMUX
+        self._enter_mux = False  # +CMUX takes effect after OK
+        self._channel_input = {}  # DLCI -> received bytearray
+        self._channel = None  # DLCI of the command being handled
+
+        self.echo = echo
+        self.verbose = True  # V1: verbose result codes, V0: numeric
+        self.sms_format = 0  # +CMGF
+        self.settings = {
+            '+CSCS': '"IRA"',
+            '+CSTA': '129',
+            '+CLIP': '0,1',
+            '+CREG': '0,1',
+            '+CNMI': '2,1,0,0,0',
+            '+CSCA': '"+8613800100500",145',
+            '+GSMBUSY': '0',
+            '+ICF': '3,3',
+            '+IFC': '0,0',
+            '+CUSD': '0',
+            '+CPBS': '"SM",0,250',
+            '+CMMS': '0',
+            '+CSMS': '0',
+            '+CSMP': '17,167,0,0',  # text mode <fo>: 49 requests a status report
+        }
+        self.signal = (20, 0)
+        self.battery = (0, 80, 4000)
+        self.memories = ['SM', 'SM', 'SM']  # +CPMS <mem1>, <mem2>, <mem3>
+        self.storage = {'SM': {}, 'ME': {}}  # memory -> {index: StoredMessage}
+        self.phonebook = {}  # index -> (number, type, text)
+        self.sent = []  # StoredMessage for every message sent with +CMGS/+CMSS
+        self.rejected = set()  # destination addresses +CMGS fails for, with +CMS ERROR: 21
+        self.send_errors = []  # +CMS ERROR codes of the next +CMGS commands, one each
+        self.commands = []  # every command line received
+        self.message_reference = 0
+        self.unacknowledged = 0  # +CMT waiting for +CNMA with +CSMS=1
+        self._status_reports = []  # +CDS lines sent after the final result of +CMGS
+
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+        self._write_lock = threading.Lock()
+        self._pending_sms = None  # (handler, args) waiting for the text after the "> " prompt
+
+        self.HANDLERS = {
+            '': self._handle_at,
+            'E': self._handle_echo,
+            'V': self._handle_verbose,
+            'I': lambda mode, args: ['SIM800 R14.18'],
+            '&F': self._handle_ok,
+            '&V': lambda mode, args: ['DEFAULT PROFILE', 'E{}'.format(int(self.echo)) + ' V{}'.format(int(self.verbose))],
+            '&W': self._handle_ok,
+            'Z': self._handle_ok,
+            '+GCAP': lambda mode, args: ['+GCAP: +CGSM'],
+            '+GMI': lambda mode, args: ['SIMCOM_Ltd'],
+            '+GMM': lambda mode, args: ['SIMCOM_SIM800L'],
+            '+GMR': lambda mode, args: ['Revision:1418B04SIM800L24'],
+            '+GOI': lambda mode, args: ['SIM800'],
+            '+GSN': lambda mode, args: [self.IMEI],
+            '+GSV': lambda mode, args: ['SIMCOM_Ltd\r\nSIMCOM_SIM800L\r\nRevision:1418B04SIM800L24'],
+            '+CIMI': lambda mode, args: [self.IMSI],
+            '+CPIN': self._handle_cpin,
+            '+SPIC': lambda mode, args: ['+SPIC: 3,10,0,10'],
+            '+CPOWD': lambda mode, args: ['NORMAL POWER DOWN'],
+            '+CSQ': lambda mode, args: ['+CSQ: {},{}'.format(*self.signal)] if mode == '' else ['+CSQ: (0-31,99),(0-7,99)'],
+            '+CBC': lambda mode, args: ['+CBC: {},{},{}'.format(*self.battery)] if mode == '' else ['+CBC: (0-2),(1-100),(voltage)'],
+            '+COPS': self._handle_cops,
+            '+CCLK': self._handle_cclk,
+            '+CMGF': self._handle_cmgf,
+            '+CPMS': self._handle_cpms,
+            '+CMGL': self._handle_cmgl,
+            '+CMGR': self._handle_cmgr,
+            '+CMGD': self._handle_cmgd,
+            '+CMGDA': self._handle_cmgda,
+            '+CMGS': self._handle_cmgs,
+            '+CMGW': self._handle_cmgw,
+            '+CMSS': self._handle_cmss,
+            '+IPR': self._handle_ipr,
+            '+CMUX': self._handle_cmux,
+            '+CMMS': self._handle_cmms,
+            '+CNMA': self._handle_cnma,
+            '+CPBW': self._handle_cpbw,
+            '+CPBR': self._handle_cpbr,
+            '+CPBF': self._handle_cpbf,
+        }
+
+    @property
+    def port(self):
+        return os.ttyname(self._slave)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='SIM800 emulator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.close(self._slave)
+        os.close(self._master)
+
+    # simulated network events
+
+    def inject_unsolicited(self, lines, interval=0):
+        # lines: e.g. ['+CMTI: "SM",1'] or a single line, written back to back
+        if isinstance(lines, str):
+            lines = [lines]
+        for line in lines:
+            self._send(self._format_info([line]), self.URC_CHANNEL)
+            if interval > 0:
+                time.sleep(interval)
+
+    def receive_sms(self, address, text, memory=None, pdu=None):
+        # stores the message like the network delivered it and indicates it according to +CNMI,
+        # or with +CNMI=<mode>,2 sends it in +CMT (returns None then);
+        # pdu: hex SMS-DELIVER with the SMSC information, for PDU mode
+        if memory is None:
+            memory = self.memories[2]
+        timestamp = datetime.datetime.now().strftime(self.TIME_FORMAT)
+        message = StoredMessage("REC UNREAD", address, text=text, pdu=pdu, timestamp=timestamp)
+        if self._cnmi_mt() == 2:
+            self.inject_unsolicited(self._message_lines(message, '+CMT', stat=False))
+            if self.settings['+CSMS'] == '1':
+                self.unacknowledged += 1
+            return None
+        index = self._store(memory, message)
+        if self._cnmi_mt() != 0:
+            self.inject_unsolicited('+CMTI: "{}",{}'.format(memory, index))
+        return index
+
+    # I/O
+
+    def _host_rate(self):
+        # the rate the host set on the port
+        return self.TERMIOS_RATES.get(termios.tcgetattr(self._slave)[5])
+
+    def _write(self, data):
+        self._send(data, self._channel)
+
+    def _send(self, data, channel=None):
+        if self._mux is not None and channel is not None:
+            data = b''.join(bytes(Frame(channel, UIH, data[i:i + self.frame_size], cr=False))
+                            for i in range(0, len(data), self.frame_size))
+        if self.max_rate is not None and self.rate > self.max_rate:
+            data = bytes(b ^ 0x55 for b in data)
+        with self._write_lock:
+            if self.baudrate is None:
+                os.write(self._master, data)
+                return
+            chunk = 64
+            for i in range(0, len(data), chunk):
+                part = data[i:i + chunk]
+                os.write(self._master, part)
+                time.sleep(len(part) * 10 / self.baudrate)  # 8N1: 10 bits per byte
+
+    def _run(self):
+        received = bytearray()
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                break
+
+            if self._mux is None:
+                received += data
+                self._process(received)
+                if self._mux is None:
+                    continue
+                data = bytes(received)  # switched to the multiplexer mode
+                received.clear()
+            for frame in self._mux.feed(data):
+                self._handle_frame(frame)
+
+    def _handle_frame(self, frame):
+        if frame.type == SABM:
+            self._channel_input[frame.dlci] = bytearray()
+            self._send(bytes(Frame(frame.dlci, UA | PF)))
+        elif frame.type == DISC:
+            self._channel_input.pop(frame.dlci, None)
+            self._send(bytes(Frame(frame.dlci, UA | PF)))
+            if frame.dlci == 0:
+                self._mux = None
+        elif frame.type == UIH and frame.dlci == 0:
+            if len(frame.data) > 0 and frame.data[0] & CR:
+                # acknowledge the control message (MSC, CLD, ...)
+                self._send(bytes(Frame(0, UIH, bytes([frame.data[0] & ~CR]) + frame.data[1:], cr=False)))
+                if frame.data[0] | CR == CLD | CR:
+                    self._mux = None
+                    self._channel_input.clear()
+        elif frame.type == UIH and frame.dlci in self._channel_input:
+            received = self._channel_input[frame.dlci]
+            received += frame.data
+            self._channel = frame.dlci
+            self._process(received)
+            self._channel = None
+
+    def _process(self, received):
+        # handles the complete command lines (and SMS text after the prompt) in received
+        while self._mux is None or self._channel is not None:
+            if self._pending_sms is not None:
+                end = min([i for i in (received.find(b'\x1a'), received.find(b'\x1b')) if i >= 0], default=-1)
+                if end < 0:
+                    break
+                payload = bytes(received[:end])
+                cancelled = received[end] == 0x1b
+                del received[:end + 1]
+                self._finish_sms(payload, cancelled)
+                continue
+
+            end = received.find(b'\r')
+            if end < 0:
+                break
+            line = bytes(received[:end + 1])
+            del received[:end + 1]
+            self._handle_line(line)
+
+    def _handle_line(self, line):
+        if self.rate != 0 and self._host_rate() != self.rate:
+            return  # noise at this rate
+
+        if self.echo:
+            self._write(line)
+
+        text = line.strip(b'\r\n').decode('ascii', 'replace')
+        if len(text) < 1:
+            return
+        self.commands.append(text)
+        if not text[:2].upper() == 'AT':
+            return self._write_final('ERROR')
+
+        info = []
+        try:
+            for command in self._split(text[2:]):
+                name, mode, args = command
+                time.sleep(self.latency.get(name, self.default_latency))
+                handler = self._handler(name.upper())
+                if handler in (self._handle_cmgs, self._handle_cmgw):
+                    # the rest of the line is ignored, the text follows the prompt
+                    self._pending_sms = (handler, args, info)
+                    self._write(b'\r\n> ')
+                    return
+                info += handler(mode, args)
+        except (ValueError, IndexError):  # malformed arguments
+            self._write(self._format_info(info))
+            return self._write_error(CommandError())
+        except CommandError as e:
+            self._write(self._format_info(info))
+            return self._write_error(e)
+
+        self._write(self._format_info(info))
+        self._write_final('OK')
+        if self._next_rate is not None:
+            self.rate = self._next_rate
+            self._next_rate = None
+        if self._enter_mux:
+            self._enter_mux = False
+            self._mux = FrameDecoder()
+
+    def _handler(self, name):
+        if name in self.HANDLERS:
+            return self.HANDLERS[name]
+        if name in self.settings:
+            return lambda mode, args: self._handle_setting(mode, args, name)
+        raise CommandError()
+
+    def _finish_sms(self, payload, cancelled):
+        handler, args, info = self._pending_sms
+        self._pending_sms = None
+        if self.echo:
+            self._write(payload)
+        if cancelled:
+            return self._write_final('OK')
+        try:
+            info += handler('=', args, payload.decode('ascii', 'replace'))
+        except (ValueError, IndexError):  # e.g. a malformed PDU
+            self._write(self._format_info(info))
+            return self._write_error(CommandError(304, cms=True))
+        except CommandError as e:
+            self._write(self._format_info(info))
+            return self._write_error(e)
+        self._write(self._format_info(info))
+        self._write_final('OK')
+        reports, self._status_reports = self._status_reports, []
+        for line in reports:
+            self.inject_unsolicited(line)
+
+    def _split(self, body):
+        # 'E0V1' -> [('E', '=', ['0']), ('V', '=', ['1'])], '+CSQ;+CMGR=1' -> [('+CSQ', '', []), ('+CMGR', '=', ['1'])]
+        commands = []
+        while len(body) > 0:
+            if body[0] == ';':
+                body = body[1:]
+                continue
+            if body[0] == '+':
+                end = self._find_end(body)
+                commands.append(self._parse_extended(body[:end]))
+                body = body[end:]
+                continue
+            m = self.BASIC_COMMAND.match(body)
+            if m is None:
+                raise CommandError()
+            commands.append((m.group(1).upper(), '=', [m.group(2)] if m.group(2) else []))
+            body = body[m.end():]
+        if len(commands) < 1:
+            commands.append(('', '', []))
+        return commands
+
+    @staticmethod
+    def _find_end(body):
+        quoted = False
+        for i, c in enumerate(body):
+            if c == '"':
+                quoted = not quoted
+            elif c == ';' and not quoted:
+                return i
+        return len(body)
+
+    def _parse_extended(self, s):
+        m = re.match(r'(\+[A-Z]+)(=\?|\?|=)?(.*)$', s, re.IGNORECASE)
+        name, mode, rest = m.group(1).upper(), m.group(2) or '', m.group(3)
+        args = []
+        if mode == '=':
+            pos = 0
+            while pos <= len(rest):
+                a = self.ARG.match(rest, pos)
+                args.append(a.group(1) if a.group(1) is not None else a.group(2).strip())
+                if a.end() == pos or a.end() >= len(rest) and not rest[a.end() - 1:a.end()] == ',':
+                    break
+                pos = a.end()
+        return name, mode, args
+
+    # formatting
+
+    def _format_info(self, info):
+        if len(info) < 1:
+            return b''
+        if self.verbose:
+            return b''.join(('\r\n' + i + '\r\n').encode('ascii') for i in info)
+        return b''.join((i + '\r\n').encode('ascii') for i in info)
+
+    def _write_final(self, result):
+        if self.verbose:
+            self._write(('\r\n' + result + '\r\n').encode('ascii'))
+        else:
+            self._write({'OK': b'0\r', 'ERROR': b'4\r'}[result])
+
+    def _write_error(self, error):
+        if error.code is None:
+            return self._write_final('ERROR')
+        line = '+{} ERROR: {}'.format('CMS' if error.cms else 'CME', error.code)
+        self._write(self._format_info([line]))
+
+    # handlers: (mode, args) -> info lines, mode is one of '', '?', '=?', '='
+
+    def _handle_ok(self, mode, args):
+        return []
+
+    def _handle_at(self, mode, args):
+        return []
+
+    def _handle_echo(self, mode, args):
+        self.echo = args != ['0'] and args != []
+        return []
+
+    def _handle_verbose(self, mode, args):
+        self.verbose = args != ['0'] and args != []
+        return []
+
+    def _handle_setting(self, mode, args, name):
+        if mode == '?':
+            return ['{}: {}'.format(name, self.settings[name])]
+        if mode == '=?':
+            return ['{}: (0-2)'.format(name)]
+        if mode == '=':
+            self.settings[name] = ','.join(a if a.isdigit() or a == '' else '"{}"'.format(a) for a in args)
+            return []
+        raise CommandError()
+
+    def _handle_ipr(self, mode, args):
+        if mode == '?':
+            return ['+IPR: {}'.format(self.rate)]
+        if mode == '=?':
+            return ['+IPR: (),(0,{})'.format(','.join(str(r) for r in self.RATES))]
+        if mode == '=':
+            rate = int(args[0]) if len(args) > 0 and args[0] else 0
+            if rate != 0 and rate not in self.RATES:
+                raise CommandError()
+            self._next_rate = rate
+            return []
+        raise CommandError()
+
+    def _handle_cmux(self, mode, args):
+        if mode == '?':
+            return ['+CMUX: 0,0,5,{},10,3,30,10,2'.format(self.frame_size)]
+        if mode == '=?':
+            return ['+CMUX: (0),(0),(1-7),(1-127),(1-255),(0-100),(2-255),(1-255),(1-7)']
+        if mode == '=':
+            if args[0] != '0':
+                raise CommandError()
+            if len(args) > 3 and args[3]:
+                self.frame_size = int(args[3])
+            self._enter_mux = True
+            return []
+        raise CommandError()
+
+    def _handle_cpin(self, mode, args):
+        if mode == '?':
+            return ['+CPIN: READY']
+        return []
+
+    def _handle_cops(self, mode, args):
+        if mode == '?':
+            return ['+COPS: 0,0,"{}"'.format(self.OPERATOR)]
+        if mode == '=?':
+            return ['+COPS: (2,"{0}","{0}","46000"),,(0-4),(0-2)'.format(self.OPERATOR)]
+        return []
+
+    def _handle_cclk(self, mode, args):
+        if mode == '?':
+            return ['+CCLK: "{}"'.format(datetime.datetime.now().strftime(self.TIME_FORMAT))]
+        return []
+
+    def _handle_cmgf(self, mode, args):
+        if mode == '?':
+            return ['+CMGF: {}'.format(self.sms_format)]
+        if mode == '=?':
+            return ['+CMGF: (0,1)']
+        if mode == '=':
+            if args not in (['0'], ['1'], []):
+                raise CommandError()
+            self.sms_format = int(args[0]) if len(args) > 0 else 0
+            return []
+        raise CommandError()
+
+    def _cnmi_mt(self):
+        return int(self.settings['+CNMI'].split(',')[1])
+
+    def _cnmi_ds(self):
+        return int(self.settings['+CNMI'].split(',')[3])
+
+    def _handle_cnma(self, mode, args):
+        if mode == '=?':
+            return ['+CNMA: (0-2)'] if self.sms_format == 0 else []
+        if self.settings['+CSMS'] != '1' or self.unacknowledged < 1:
+            raise CommandError(340, cms=True)  # no +CNMA acknowledgement expected
+        self.unacknowledged -= 1
+        return []
+
+    # SMS storage
+
+    def _store(self, memory, message):
+        messages = self.storage[memory]
+        for index in range(1, self.MEMORY_SIZE + 1):
+            if index not in messages:
+                messages[index] = message
+                return index
+        raise CommandError(322, cms=True)  # memory full
+
+    def _memory_status(self, memory):
+        return '"{}",{},{}'.format(memory, len(self.storage[memory]), self.MEMORY_SIZE)
+
+    def _handle_cpms(self, mode, args):
+        if mode == '?':
+            return ['+CPMS: ' + ','.join(self._memory_status(m) for m in self.memories)]
+        if mode == '=?':
+            return ['+CPMS: ("SM","ME"),("SM","ME"),("SM","ME")']
+        if mode == '=':
+            for i, memory in enumerate(args[:3]):
+                if memory not in self.storage:
+                    raise CommandError(302, cms=True)
+                self.memories[i] = memory
+            return ['+CPMS: ' + ','.join(self._memory_status(m)[len(m) + 3:] for m in self.memories)]
+        raise CommandError()
+
+    def _stat(self, stat):
+        # PDU mode <stat> is the index in STATS
+        if self.sms_format == 0:
+            return str(self.STATS.index(stat))
+        return '"{}"'.format(stat)
+
+    def _parse_stat(self, stat):
+        if self.sms_format == 0:
+            if not stat.isdigit() or int(stat) > 4:
+                raise CommandError(302, cms=True)
+            return None if int(stat) == 4 else self.STATS[int(stat)]
+        if stat == 'ALL':
+            return None
+        if stat not in self.STATS:
+            raise CommandError(302, cms=True)
+        return stat
+
+    def _message_lines(self, message, prefix, index=None, stat=True):
+        if self.sms_format == 0:
+            if message.pdu is None:
+                raise CommandError(304, cms=True)
+            header = [self._stat(message.stat), '', str(len(message.pdu) // 2 - 1)]
+            body = message.pdu
+        else:
+            if message.text is None:
+                raise CommandError(305, cms=True)
+            header = [self._stat(message.stat), '"{}"'.format(message.address), '""']
+            if message.timestamp is not None:
+                header.append('"{}"'.format(message.timestamp))
+            body = message.text
+        if not stat:
+            del header[0]
+        if index is not None:
+            header.insert(0, str(index))
+        return '{}: {}\r\n{}'.format(prefix, ','.join(header), body)
+
+    def _handle_cmgl(self, mode, args):
+        if mode == '=?':
+            return ['+CMGL: (0-4)' if self.sms_format == 0 else '+CMGL: ("REC UNREAD","REC READ","STO UNSENT","STO SENT","ALL")']
+        stat = self._parse_stat(args[0] if len(args) > 0 else ('4' if self.sms_format == 0 else 'ALL'))
+        change_status = len(args) < 2 or args[1] != '1'
+
+        lines = []
+        messages = self.storage[self.memories[0]]
+        for index in sorted(messages):
+            message = messages[index]
+            if stat is None or message.stat == stat:
+                lines.append(self._message_lines(message, '+CMGL', index))
+                if change_status and message.stat == "REC UNREAD":
+                    message.stat = "REC READ"
+        if len(lines) < 1:
+            return []
+        return ['\r\n'.join(lines)]
+
+    def _handle_cmgr(self, mode, args):
+        if mode == '=?':
+            return []
+        if mode != '=' or len(args) < 1 or not args[0].isdigit():
+            raise CommandError()
+        message = self.storage[self.memories[0]].get(int(args[0]))
+        if message is None:
+            raise CommandError(321, cms=True)  # invalid memory index
+        lines = [self._message_lines(message, '+CMGR')]
+        if (len(args) < 2 or args[1] != '1') and message.stat == "REC UNREAD":
+            message.stat = "REC READ"
+        return lines
+
+    def _handle_cmgd(self, mode, args):
+        if mode == '=?':
+            return ['+CMGD: ({}),(0-4)'.format(','.join(str(i) for i in sorted(self.storage[self.memories[0]])))]
+        if mode != '=' or len(args) < 1 or not args[0].isdigit():
+            raise CommandError()
+        messages = self.storage[self.memories[0]]
+        flag = int(args[1]) if len(args) > 1 and args[1] != '' else 0
+        deleted = {
+            0: [],
+            1: ["REC READ"],
+            2: ["REC READ", "STO SENT"],
+            3: ["REC READ", "STO SENT", "STO UNSENT"],
+            4: self.STATS,
+        }.get(flag)
+        if deleted is None:
+            raise CommandError(302, cms=True)
+        if flag == 0:
+            if int(args[0]) not in messages:
+                raise CommandError(321, cms=True)
+            del messages[int(args[0])]
+            return []
+        for index in [i for i, m in messages.items() if m.stat in deleted]:
+            del messages[index]
+        return []
+
+    def _handle_cmgda(self, mode, args):
+        if mode == '=?':
+            return ['+CMGDA: (1-6)']
+        deleted = {
+            '1': ["REC READ"], 'DEL READ': ["REC READ"],
+            '2': ["REC UNREAD"], 'DEL UNREAD': ["REC UNREAD"],
+            '3': ["STO SENT"], 'DEL SENT': ["STO SENT"],
+            '4': ["STO UNSENT"], 'DEL UNSENT': ["STO UNSENT"],
+            '5': ["REC UNREAD", "REC READ"], 'DEL INBOX': ["REC UNREAD", "REC READ"],
+            '6': self.STATS, 'DEL ALL': self.STATS,
+        }.get(args[0] if len(args) > 0 else None)
+        if deleted is None:
+            raise CommandError()
+        messages = self.storage[self.memories[0]]
+        for index in [i for i, m in messages.items() if m.stat in deleted]:
+            del messages[index]
+        return []
+
+    def _next_message_reference(self):
+        self.message_reference = (self.message_reference + 1) % 256
+        return self.message_reference
+
+    def _relay(self):
+        # +CMMS=1 and 2 keep the link to the network for the next message
+        if not self._link_kept:
+            time.sleep(self.link_setup)
+        self._link_kept = self.settings['+CMMS'] != '0'
+
+    def _handle_cmms(self, mode, args):
+        result = self._handle_setting(mode, args, '+CMMS')
+        if self.settings['+CMMS'] == '0':
+            self._link_kept = False
+        return result
+
+    def _handle_cmgs(self, mode, args, payload=None):
+        if self.sms_format == 0:
+            data = bytes.fromhex(payload)
+            address, _, _ = pdu.decode_address(data, 1 + data[0] + 2)  # after the SMSC, first octet and TP-MR
+            message = StoredMessage("STO SENT", address, pdu=payload)
+            status_report = data[1 + data[0]] & pdu.SRR
+        else:
+            message = StoredMessage("STO SENT", args[0] if len(args) > 0 else None, text=payload)
+            status_report = int(self.settings['+CSMP'].split(',')[0]) & pdu.SRR
+        self._relay()
+        if len(self.send_errors) > 0:
+            raise CommandError(self.send_errors.pop(0), cms=True)
+        if message.address in self.rejected:
+            raise CommandError(21, cms=True)
+        self.sent.append(message)
+        reference = self._next_message_reference()
+        if status_report and self._cnmi_ds() == 1:
+            self._status_reports.append(self._status_report_lines(message.address, reference))
+        return ['+CMGS: {}'.format(reference)]
+
+    def _status_report_lines(self, address, reference):
+        # +CDS of a message delivered right away
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self.sms_format == 0:
+            report = (bytes([0, pdu.MTI_STATUS_REPORT, reference]) + pdu.encode_address(address)
+                      + pdu.encode_timestamp(now) * 2 + bytes([pdu.STATUS_DELIVERED]))
+            return '+CDS: {}\r\n{}'.format(len(report) - 1, report.hex().upper())
+        timestamp = now.strftime(self.TIME_FORMAT)
+        return '+CDS: {},{},"{}",{},"{}","{}",{}'.format(
+            pdu.MTI_STATUS_REPORT, reference, address, 145 if address.startswith('+') else 129,
+            timestamp, timestamp, pdu.STATUS_DELIVERED)
+
+    def _handle_cmgw(self, mode, args, payload=None):
+        if self.sms_format == 0:
+            stat = self.STATS[int(args[1])] if len(args) > 1 else "STO UNSENT"
+            message = StoredMessage(stat, None, pdu=payload)
+        else:
+            stat = args[2] if len(args) > 2 else "STO UNSENT"
+            message = StoredMessage(stat, args[0] if len(args) > 0 else None, text=payload)
+        return ['+CMGW: {}'.format(self._store(self.memories[1], message))]
+
+    def _handle_cmss(self, mode, args):
+        if mode == '=?':
+            return []
+        if mode != '=' or len(args) < 1 or not args[0].isdigit():
+            raise CommandError()
+        message = self.storage[self.memories[1]].get(int(args[0]))
+        if message is None:
+            raise CommandError(321, cms=True)
+        message.stat = "STO SENT"
+        self._relay()
+        self.sent.append(message)
+        return ['+CMSS: {}'.format(self._next_message_reference())]
+
+    # phonebook
+
+    def _handle_cpbw(self, mode, args):
+        if mode == '=?':
+            return ['+CPBW: (1-250),40,(129,145,161),14']
+        if mode != '=' or len(args) < 1:
+            raise CommandError()
+        index = int(args[0]) if args[0] else min(set(range(1, 251)) - set(self.phonebook))
+        if len(args) < 2:
+            self.phonebook.pop(index, None)
+        else:
+            self.phonebook[index] = (args[1], args[2] if len(args) > 2 and args[2] else '129', args[3] if len(args) > 3 else '')
+        return []
+
+    def _phonebook_lines(self, indexes):
+        return ['+CPBR: {},"{}",{},"{}"'.format(i, *self.phonebook[i]) for i in indexes]
+
+    def _handle_cpbr(self, mode, args):
+        if mode == '=?':
+            return ['+CPBR: (1-250),40,14']
+        if mode != '=' or len(args) < 1:
+            raise CommandError()
+        first = int(args[0])
+        last = int(args[1]) if len(args) > 1 else first
+        return self._phonebook_lines(i for i in sorted(self.phonebook) if first <= i <= last)
+
+    def _handle_cpbf(self, mode, args):
+        if mode == '=?':
+            return ['+CPBF: 40,14']
+        if mode != '=' or len(args) < 1:
+            raise CommandError()
+        return self._phonebook_lines(i for i in sorted(self.phonebook) if self.phonebook[i][2].startswith(args[0]))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='SIM800 emulator on a pseudo-terminal')
+    parser.add_argument('--baudrate', type=int, default=None)
+    parser.add_argument('--latency', action='append', default=[], metavar='COMMAND=SECONDS',
+                        help='e.g. +CMGS=1.5, can be repeated')
+    args = parser.parse_args()
+
+    latency = {}
+    for item in args.latency:
+        name, seconds = item.split('=')
+        latency[name.upper()] = float(seconds)
+
+    with SIM800Emulator(latency=latency, baudrate=args.baudrate) as emulator:
+        print(emulator.port, flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
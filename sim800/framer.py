@@ -0,0 +1,58 @@
+class LineFramer:
+    CR = 0x0D
+    LF = 0x0A
+
+    COMPACT_THRESHOLD = 4096  # bytes consumed before the buffer is compacted
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._start = 0  # read position in self._buffer
+        self.numeric = False  # ATV0: b'<digit>\r' is a complete result code, no b'\n' follows
+
+    def __len__(self):
+        return len(self._buffer) - self._start
+
+    def feed(self, data):
+        if self._start >= self.COMPACT_THRESHOLD and self._start * 2 >= len(self._buffer):
+            del self._buffer[:self._start]
+            self._start = 0
+        self._buffer += data
+
+    def next_line(self, final=False):
+        # returns the next b'...\r' or b'...\r\n' line, or None if it's not complete yet;
+        # a trailing b'\r' is only returned when final is True (b'\n' might follow)
+        # or it ends a numeric result code
+        buffer = self._buffer
+        i = buffer.find(b'\r', self._start)
+        if i < 0:
+            return None
+
+        end = i + 1
+        if end < len(buffer):
+            if buffer[end] == self.LF:
+                end += 1
+        elif not (final or self.numeric and i == self._start + 1 and 0x30 <= buffer[self._start] <= 0x39):
+            return None
+
+        return self._take(end)
+
+    def take_prefix(self, prefix):
+        # consume prefix if the buffer starts with it (e.g. b'> ' prompt that has no line end)
+        if not self._buffer.startswith(prefix, self._start):
+            return None
+        return self._take(self._start + len(prefix))
+
+    def flush(self):
+        # returns everything buffered, complete line or not
+        return self._take(len(self._buffer))
+
+    def peek(self):
+        return bytes(self._buffer[self._start:])
+
+    def _take(self, end):
+        line = bytes(self._buffer[self._start:end])
+        self._start = end
+        if self._start == len(self._buffer):
+            self._buffer.clear()
+            self._start = 0
+        return line
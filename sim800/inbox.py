@@ -0,0 +1,158 @@
+import collections
+import threading
+from sim800.commands.ts27005 import (
+    ListSMSMessagesCommand, ReadSMSMessageCommand, DeleteSMSMessageCommand, PreferredSMSMessageStorageCommand,
+    SelectSMSMessageFormatCommand, NewMessageAcknowledgementCommand,
+)
+from sim800.manager import TimeoutException
+from sim800.results.unsolicited import NewMessageResult, DeliveredMessageResult
+from sim800.threaded import ThreadedSIM800
+
+
+class InboxError(Exception):
+    pass
+
+
+class InboxSync:
+    # hands every received message to handler once and deletes it: each +CMTI is read with +CMGR and
+    # deleted with +CMGD, the storage is listed with +CMGL only by reconcile() (at start and after a reconnect);
+    # with +CNMI=<mode>,2 the messages come in +CMT with no command at all (but +CNMA with +CSMS=1)
+    MEMORIES = ['SM']  # storages reconcile() lists
+    POLL_INTERVAL = 1  # (float) seconds run() waits for +CMTI with ThreadedSIM800, SIM800 waits its read timeout
+    INVALID_INDEX = 321  # +CMS ERROR: the message is gone, e.g. handled by reconcile() already
+
+    def __init__(self, manager, handler, memories=None, delete=True, acknowledge=False):
+        # manager: SIM800 or ThreadedSIM800;
+        # handler: callback(ListedSMSMessageResult, ReadSMSMessageResult or DeliveredMessageResult),
+        # index and memory are set but for +CMT; a message is deleted only after handler returns;
+        # acknowledge: +CSMS=1 is set, +CMT is acknowledged with +CNMA after handler returns
+        if memories is None:
+            memories = self.MEMORIES
+        self.manager = manager
+        self.handler = handler
+        self.memories = memories
+        self.delete = delete
+        self.acknowledge = acknowledge
+        self.received = 0  # (int) messages handed to handler
+        self.listed = 0  # (int) of them found by reconcile()
+        self._pending = collections.deque()  # (memory, index) of +CMTI not read yet
+        self._delivered = collections.deque()  # DeliveredMessageResult not handled yet
+        self._arrived = threading.Event()
+        self._memory = None  # <mem1> set by the last +CPMS
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self.manager.on(NewMessageResult, self._on_new_message)
+            self.manager.on(DeliveredMessageResult, self._on_delivered)
+            self._started = True
+        self.reconcile()
+
+    def stop(self):
+        if self._started:
+            self.manager.off(NewMessageResult, self._on_new_message)
+            self.manager.off(DeliveredMessageResult, self._on_delivered)
+            self._started = False
+
+    def _on_new_message(self, result):
+        if result.mms:
+            return
+        self._pending.append((result.memory, result.index))
+        self._arrived.set()
+
+    def _on_delivered(self, result):
+        self._delivered.append(result)
+        self._arrived.set()
+
+    def reconcile(self):
+        # list every storage once for the messages that came while nobody listened, returns how many
+        count = 0
+        for memory in self.memories:
+            self._select(memory)
+            messages = self._list()
+            self.manager.subscriptions.join()  # +CMTI that came during the listing are in _pending
+            listed = set((memory, m.index) for m in messages)
+            # +CMTI of these messages needn't be read again
+            for item in [item for item in self._pending if item in listed]:
+                self._pending.remove(item)
+            for message in messages:
+                message.memory = memory
+                self._handle(message)
+            count += len(messages)
+        self.listed += count
+        return count
+
+    def _list(self):
+        final, result = self.manager.send_command(SelectSMSMessageFormatCommand.read())
+        text_mode = final.success and result is not None and result.str_result.endswith('1')
+        stat = ListSMSMessagesCommand.TEXT_MODE.ALL if text_mode else ListSMSMessagesCommand.PDU_MODE.ALL
+        return list(self.manager.iter_command_result(ListSMSMessagesCommand.write(stat)))
+
+    def sync(self):
+        # hand over the messages of +CMT and read and delete the ones +CMTI indicated so far, returns how many
+        count = 0
+        while len(self._delivered) > 0:
+            # when handler fails, the message isn't acknowledged: the network sends it again
+            message = self._delivered.popleft()
+            self.handler(message)
+            self.received += 1
+            count += 1
+            if self.acknowledge:
+                self._acknowledge(message)
+        while len(self._pending) > 0:
+            # when handler fails, the message stays in the storage for the next reconcile()
+            memory, index = self._pending.popleft()
+            self._select(memory)
+            final, result = self.manager.send_command(ReadSMSMessageCommand.write(index))
+            if final.success and result is not None:
+                result.index = index
+                result.memory = memory
+                self._handle(result)
+                count += 1
+            elif not final.success and final.cms_code != self.INVALID_INDEX:
+                raise InboxError('+CMGR={} failed: {}'.format(index, final.error))
+        return count
+
+    def run(self, stop=None):
+        # stop: threading.Event, without it returns when no +CMTI comes in POLL_INTERVAL
+        while stop is None or not stop.is_set():
+            if len(self._pending) + len(self._delivered) < 1:
+                self._wait()
+            if len(self._pending) + len(self._delivered) < 1 and stop is None:
+                return
+            self.sync()
+
+    def _wait(self):
+        self._arrived.clear()
+        if isinstance(self.manager, ThreadedSIM800):
+            self._arrived.wait(self.POLL_INTERVAL)
+            return
+        try:
+            # reading the port publishes +CMTI to _on_new_message
+            self.manager.recv_unsolicited()
+        except TimeoutException:
+            pass
+        self.manager.subscriptions.join()
+
+    def _select(self, memory):
+        if memory == self._memory:
+            return
+        final, result = self.manager.send_command(PreferredSMSMessageStorageCommand.write(memory))
+        if not final.success:
+            raise InboxError('+CPMS="{}" failed: {}'.format(memory, final.error))
+        self._memory = memory
+
+    def _acknowledge(self, message):
+        if message.pdu_mode:
+            command = NewMessageAcknowledgementCommand.write(NewMessageAcknowledgementCommand.ACK)
+        else:
+            command = NewMessageAcknowledgementCommand.execute()
+        final, result = self.manager.send_command(command)
+        if not final.success:
+            raise InboxError('+CNMA failed: {}'.format(final.error))
+
+    def _handle(self, message):
+        self.handler(message)
+        self.received += 1
+        if self.delete:
+            self.manager.send_command(DeleteSMSMessageCommand.write(message.index))
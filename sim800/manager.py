@@ -1,147 +1,435 @@
-import io
+import collections
+import time
 import serial
-from sim800.commands.command import Command
-from sim800.results.result import ExecutedCommandFinalResult
-import sim800.results.unsolicited as unsolicited
-
-
-class TimeoutException(Exception):
-    pass
+from sim800.batching import CommandQueue
+from sim800 import burst
+from sim800.commands.command import Command, NextLineArgCommand
+from sim800.commands.ts27005 import MoreMessagesToSendCommand
+from sim800.commands.v25ter import (
+    ATCommand, SetEchoCommand, SetResultCodeFormatCommand, LocalDataFlowControlCommand, FixedLocalRateCommand,
+)
+from sim800.protocol import ATProtocol, CommandTransaction, FinalResult, Prompt, Response, Unsolicited, TimeoutException
+from sim800.subscriptions import UnsolicitedRegistry
+from sim800.timeouts import LatencyEstimator
+from sim800.trace import TraceRecorder, TracingSerial, ReplaySerial
 
 
 class SIM800:
     DEFAULT_TIMEOUT = 5  # (float) seconds
     DEFAULT_WRITE_TIMEOUT = 5  # (float) seconds
+    PROMPT_TIMEOUT = 2  # (float) seconds to wait for "> " before the next line argument
+
+    # negotiate_speed()
+    RATES = [460800, 230400, 115200, 57600, 38400, 19200, 9600]
+    PROBE_TIMEOUT = 0.3  # (float) seconds to wait for OK to AT at a rate
+    CONFIRMATIONS = 3  # ATs that should succeed in a row at a new rate
+    RATE_SWITCH_DELAY = 0.05  # (float) seconds after +IPR before the modem listens at the new rate
 
     def __init__(self, *args, **kwargs):
+        self.subscriptions = UnsolicitedRegistry(
+            kwargs.pop('unsolicited_maxlen', None), kwargs.pop('unsolicited_overflow', None))
+        self.metrics = kwargs.pop('metrics', None)  # sim800.metrics.Metrics
+        trace = kwargs.pop('trace', None)  # path or binary file to record the bytes written and read to
         if 'timeout' not in kwargs:
             kwargs['timeout'] = self.DEFAULT_TIMEOUT
         if 'write_timeout' not in kwargs:
             kwargs['write_timeout'] = self.DEFAULT_WRITE_TIMEOUT
+        self.timeout = kwargs['timeout']
+        self.latency = LatencyEstimator(self.timeout)
         self.serial = serial.Serial(*args, **kwargs)
-        self.unsolicited = []
-        self.__readline_buffer = b''
-        self.__cached_line = b''
+        if trace is not None:
+            self.serial = TracingSerial(self.serial, TraceRecorder(trace))
+        self._serial_timeout = self._read_timeout = kwargs['timeout']
+        self.unsolicited = self.subscriptions.queue
+        self.queue = CommandQueue()
+        self._protocol = ATProtocol()
+        self._framer = self._protocol.framer
+        self._events = collections.deque()
+        self._concat_reference = 0
+
+    @classmethod
+    def replay(cls, trace, realtime=False, strict=True, **kwargs):
+        # the modem side of a recorded trace is fed back, at the original speed with realtime=True
+        s = cls(**kwargs)
+        s.serial = ReplaySerial(trace, realtime, strict, timeout=s._serial_timeout)
+        return s
 
     def close(self):
         self.serial.close()
-
-    def send_command(self, command: Command, recv_result=True):
+        self.subscriptions.close()
+
+    def enable_fast_mode(self):
+        # ATV0 and ATE0: b'0\r' instead of b'\r\nOK\r\n' and no echo, less to receive for every command;
+        # returns the final result of the failed command or of the last one
+        self._protocol.numeric = True  # the result of ATV0 is already numeric
+        final, result = self.send_command(SetResultCodeFormatCommand(verbose=False))
+        if not final.success:
+            self._protocol.numeric = False
+            return final
+        final, result = self.send_command(SetEchoCommand(enabled=False))
+        return final
+
+    def negotiate_speed(self, rates=None, flow_control=True):
+        # finds the modem's rate, enables RTS/CTS and moves both sides to the fastest rate that
+        # answers CONFIRMATIONS ATs, falling back to the previous one; returns the rate in use
+        if rates is None:
+            rates = self.RATES
+        rates = sorted(rates, reverse=True)
+        current = self._probe_rate(rates)
+
+        if flow_control:
+            final, result = self.send_command(LocalDataFlowControlCommand.write(LocalDataFlowControlCommand.HARDWARE))
+            if final.success:
+                self.serial.rtscts = True
+
+        for rate in rates:
+            if rate <= current:
+                break
+            if self._switch_rate(rate, current):
+                return rate
+            current = self._probe_rate(rates, first=current)
+        return current
+
+    def _probe_rate(self, rates, first=None):
+        if first is None:
+            first = self.serial.baudrate
+        for rate in [first] + [r for r in rates if r != first]:
+            self._set_rate(rate)
+            if self._confirm_rate(1):
+                return rate
+        raise TimeoutException('no answer at {}'.format(', '.join(str(r) for r in rates)))
+
+    def _switch_rate(self, rate, current):
         try:
-            self.serial.write(bytes(command))
+            final, result = self.send_command(FixedLocalRateCommand.write(rate), timeout=self.PROBE_TIMEOUT)
+        except TimeoutException:
+            return False
+        if not final.success:
+            return False
+
+        time.sleep(self.RATE_SWITCH_DELAY)
+        self._set_rate(rate)
+        if self._confirm_rate(self.CONFIRMATIONS):
+            return True
+
+        # unstable: ask for the previous rate, the modem might still understand it
+        try:
+            self.send_command(FixedLocalRateCommand.write(current), timeout=self.PROBE_TIMEOUT)
+        except TimeoutException:
+            pass
+        time.sleep(self.RATE_SWITCH_DELAY)
+        return False
+
+    def _confirm_rate(self, count):
+        for i in range(count):
+            try:
+                final, result = self.send_command(ATCommand(), timeout=self.PROBE_TIMEOUT)
+            except TimeoutException:
+                return False
+            if final is None or not final.success:
+                return False
+        return True
+
+    def _set_rate(self, rate):
+        # whatever was received at the old rate is noise
+        self.serial.baudrate = rate
+        self.serial.reset_input_buffer()
+        numeric = self._protocol.numeric
+        self._protocol = ATProtocol()
+        self._protocol.numeric = numeric
+        self._framer = self._protocol.framer
+        self._events.clear()
+
+    def on(self, result_type, callback, consume=True):
+        return self.subscriptions.on(result_type, callback, consume)
+
+    def off(self, result_type, callback):
+        self.subscriptions.off(result_type, callback)
+
+    def send_command(self, command: Command, recv_result=True, timeout=None):
+        try:
+            transaction = self._write_command(command)
+            if transaction is not None and transaction.done:
+                return transaction.result()  # e.g. ERROR instead of the "> " prompt
 
             if recv_result:
-                return self.recv_command_result(command)
+                return self._recv_transaction(command, timeout, transaction).result()
+            if self.metrics is not None:
+                self.metrics.command_discarded()
 
         except (serial.SerialTimeoutException, TimeoutException) as e:
             raise TimeoutException(e)
 
+    def send_sms(self, address, text, encoding=None, validity=None, status_report=False, timeout=None):
+        # sends in PDU mode, a text too long for one message goes in the parts of a concatenated one back to back;
+        # returns [(final, result)] of the parts sent, it stops at the first part that fails.
+        # On TimeoutException its results attribute has the parts sent before
+        return self._drive_burst(burst.send_sms(address, text, self._next_concat_reference, encoding, validity,
+                                                status_report, timeout))
+
+    def send_sms_burst(self, messages, encoding=None, validity=None, status_report=False, timeout=None,
+                       keep_link=MoreMessagesToSendCommand.KEEP):
+        # sends (address, text) messages back to back with the relay link kept open between them (+CMMS),
+        # a failed message doesn't stop the burst; returns a BurstReport
+        return self._drive_burst(burst.send_sms_burst(messages, self._next_concat_reference, encoding, validity,
+                                                      status_report, timeout, keep_link))
+
+    def _drive_burst(self, steps):
+        # sends the commands of a sim800.burst generator, returns what it returns
+        reply = error = None
+        while True:
+            try:
+                command, timeout = steps.send(reply) if error is None else steps.throw(error)
+            except StopIteration as e:
+                return e.value
+            try:
+                reply, error = self.send_command(command, timeout=timeout), None
+            except Exception as e:
+                reply, error = None, e
+
+    def _next_concat_reference(self):
+        self._concat_reference = (self._concat_reference + 1) % 256
+        return self._concat_reference
+
+    def submit(self, command: Command, timeout=None):
+        # queue the command, it's sent by run_queue(); returns a future of (final, result)
+        future = self.queue.put(command, timeout)
+        if self.metrics is not None:
+            self.metrics.set_queue_depth(len(self.queue))
+        return future
+
+    def _write(self, data):
+        self.serial.write(data)
+        if self.metrics is not None:
+            self.metrics.sent(len(data))
+
+    def _write_command(self, command):
+        # returns the transaction when part of the response is already received
+        if self.metrics is not None:
+            self.metrics.command_written(command)
+        if isinstance(command, NextLineArgCommand) and command.payload is not None:
+            return self._send_after_prompt(command)
+        self._write(bytes(command))
+        return None
+
+    def _send_after_prompt(self, command):
+        # write the command line, wait for "> " and only then write the next line argument
+        transaction = CommandTransaction(command)
+        self._protocol.expect_prompt()
+        self._write(command.header)
+
+        deadline = time.monotonic() + self.PROMPT_TIMEOUT
+        try:
+            event = self._next_event(deadline)
+            while not isinstance(event, Prompt):
+                if transaction.receive(event):
+                    if self.metrics is not None:
+                        self.metrics.command_completed()
+                    return transaction
+                if isinstance(event, Unsolicited):
+                    if self.metrics is not None:
+                        self.metrics.unsolicited_received()
+                    self.subscriptions.publish(event.result)
+                event = self._next_event(deadline)
+        except TimeoutException:
+            if self.metrics is not None:
+                self.metrics.command_timed_out()
+            self._write(command.ESC.encode('ascii'))  # cancel the command
+            raise TimeoutException('no "> " prompt in {} s'.format(self.PROMPT_TIMEOUT))
+
+        self._write(command.payload)
+        return transaction
+
+    def run_queue(self):
+        # send the queued commands, combinable ones are sent together in one command line
+        batch = self.queue.take_batch()
+        while batch is not None:
+            if self.metrics is not None:
+                self.metrics.set_queue_depth(len(self.queue))
+            try:
+                transaction = self._write_command(batch.command)
+                if transaction is None or not transaction.done:
+                    transaction = self._recv_transaction(batch.command, batch.timeout, transaction)
+            except (serial.SerialTimeoutException, TimeoutException) as e:
+                batch.set_exception(TimeoutException(e))
+            else:
+                batch.set_result(transaction)
+            batch = self.queue.take_batch()
+
     def recv_unsolicited(self):
         if len(self.unsolicited) > 0:
-            return self.unsolicited.pop(0)
+            return self.unsolicited.popleft()
 
         try:
-            line = self.read_echo_or_result()
-            results = unsolicited.from_response([line])
-            if len(results) >= 1:
-                return results[0]
+            event = self._next_event()
+            if isinstance(event, Unsolicited):
+                if self.metrics is not None:
+                    self.metrics.unsolicited_received()
+                self.subscriptions.publish(event.result)
+            if len(self.unsolicited) > 0:
+                return self.unsolicited.popleft()
             else:
-                return None
+                return None  # not unsolicited, or handled by a callback
         except (serial.SerialTimeoutException, TimeoutException) as e:
             raise TimeoutException(e)
 
-    def recv_command_result(self, command: Command):
-        lines = []
+    def recv_command_result(self, command: Command, timeout=None):
+        # timeout: (float) seconds until the final result, by default estimated for the command
+        return self._recv_transaction(command, timeout).result()
+
+    def iter_command_result(self, command: Command, timeout=None):
+        # generator of the records of a long response (e.g. +CMGL), parsed as they arrive
+        # instead of after the final result; returns the final result (StopIteration.value).
+        # timeout: (float) seconds between two records, by default estimated for the command
+        if timeout is None:
+            timeout = self.latency.timeout(command)
+        if command.STREAM_PREFIX is not None:
+            self._protocol.stream(command.STREAM_PREFIX)
 
+        start = time.monotonic()
         try:
-            line = self.read_echo_or_result()
-            lines.append(line)
+            transaction = self._write_command(command)
+            if transaction is not None and transaction.done:
+                return transaction.final
 
-            final = ExecutedCommandFinalResult.from_response(line)
+            final = None
             while final is None:
-                line = self.read_echo_or_result()
-                lines.append(line)
+                event = self._next_event(time.monotonic() + timeout)
+                if isinstance(event, FinalResult):
+                    final = event.result
+                elif isinstance(event, Unsolicited):
+                    if self.metrics is not None:
+                        self.metrics.unsolicited_received()
+                    self.subscriptions.publish(event.result)
+                elif isinstance(event, Response):
+                    record = command.parse_record(event.raw)
+                    if record is not None:
+                        yield record
+
+            self.latency.observe(command, time.monotonic() - start)
+            if self.metrics is not None:
+                self.metrics.command_completed()
+            return final
+
+        except GeneratorExit:
+            # closed early: the rest of the response shouldn't be taken for the next command's
+            self._discard_until_final(time.monotonic() + timeout)
+            if self.metrics is not None:
+                self.metrics.command_discarded()
+            raise
+
+        except (serial.SerialTimeoutException, TimeoutException) as e:
+            self._protocol.stream(None)
+            self.latency.timed_out(command)
+            if self.metrics is not None:
+                self.metrics.command_timed_out()
+            raise TimeoutException(e)
 
-                final = ExecutedCommandFinalResult.from_response(line)
+    def _discard_until_final(self, deadline):
+        self._protocol.stream(None)
+        try:
+            event = self._next_event(deadline)
+            while not isinstance(event, FinalResult):
+                event = self._next_event(deadline)
+        except (serial.SerialTimeoutException, TimeoutException):
+            pass
+
+    def _recv_transaction(self, command, timeout=None, transaction=None):
+        if transaction is None:
+            transaction = CommandTransaction(command)
+        unsolicited_results = []
+
+        start = time.monotonic()
+        if timeout is None:
+            timeout = self.latency.timeout(command)
+        deadline = start + timeout
+
+        try:
+            event = self._next_event(deadline)
+            while not transaction.receive(event):
+                if isinstance(event, Unsolicited):
+                    if self.metrics is not None:
+                        self.metrics.unsolicited_received()
+                    unsolicited_results.append(event.result)
+                event = self._next_event(deadline)
+
+            self.latency.observe(command, time.monotonic() - start)
+            if self.metrics is not None:
+                self.metrics.command_completed()
 
             # now, the final result is found but we need to parse previous lines
 
-            unsolicited_results = unsolicited.from_response(lines)
-            self.unsolicited += unsolicited_results
-            return final, command.parse_response(lines)
+            for result in unsolicited_results:
+                self.subscriptions.publish(result)
+            return transaction
 
         except (serial.SerialTimeoutException, TimeoutException) as e:
+            self.latency.timed_out(command)
+            if self.metrics is not None:
+                self.metrics.command_timed_out()
             raise TimeoutException(e)
 
-    def _is_final(self, line):
-        return ExecutedCommandFinalResult.from_response(line) is not None
+    def _read_available(self, deadline=None):
+        # read everything that is already waiting in one call,
+        # block (up to the serial timeout or the deadline) only when nothing is there
+        stream = self.serial
+        waiting = stream.in_waiting
+        if waiting > 0:
+            data = stream.read(waiting)
+        else:
+            read_timeout = self._serial_timeout
+            if deadline is not None:
+                read_timeout = min(read_timeout, deadline - time.monotonic())
+                if read_timeout <= 0:
+                    return b''
+            if read_timeout != self._read_timeout:
+                stream.timeout = read_timeout
+                self._read_timeout = read_timeout
+            data = stream.read(1)
+
+        if self.metrics is not None and data:
+            self.metrics.received(len(data))
+        return data
 
     def readline(self):
-        line = self.__readline_buffer
-        self.__readline_buffer = b''
-
-        stream = self.serial
-        if not line.endswith(b'\r'):
-            line += stream.read_until(b'\r')
+        framer = self._framer
+        line = framer.next_line()
+        while line is None:
+            data = self._read_available()
+            if not data:
+                # timeout: return what's left (e.g. b'...\r' with no b'\n' after it)
+                line = framer.next_line(final=True) or framer.flush()
+                break
+            framer.feed(data)
+            line = framer.next_line()
 
         if len(line) < 1:
             raise TimeoutException('read timeout')
-            #return line  # b''
-        if not line.endswith(b'\r'):
-            return line
-
-        # try to read b'\n'
-        next_b = stream.read(1)
-        if next_b.startswith(b'\n'):
-            line += next_b
-        else:
-            self.__readline_buffer += next_b
-
         return line
 
-    def _readline_or_cached(self):
-        if len(self.__cached_line) > 0:
-            line = self.__cached_line
-            self.__cached_line = b''
-        else:
-            line = self.readline()
-        return line
+    def _next_event(self, deadline=None):
+        events = self._events
+        while len(events) < 1:
+            start = time.monotonic()
+            data = self._read_available(deadline)
+            if data:
+                self._extend_events(self._protocol.receive_data(data))
+                continue
+
+            # timeout: the pending result (if any) is complete; with a deadline, keep reading until it,
+            # unless the read returned at once (a port with timeout 0, in memory), that would only spin
+            self._extend_events(self._protocol.flush())
+            if len(events) < 1:
+                now = time.monotonic()
+                if deadline is None or now >= deadline or now - start < self._read_timeout / 2:
+                    raise TimeoutException('read timeout')
+
+        return events.popleft()
+
+    def _extend_events(self, events):
+        if self.metrics is not None and len(events) > 0:
+            self.metrics.events_received(events)
+        self._events.extend(events)
 
     def read_echo_or_result(self):
-        stream = self.serial
-        line = self._readline_or_cached()
-
-        if line.endswith(b'\r'):
-            return line  # it's command + b'\r'
-        if line == b'\r\n':
-            # it's result start
-            result = io.BytesIO(line)
-            result.seek(0, io.SEEK_END)
-            while True:
-                try:
-                    line = self._readline_or_cached()
-                except TimeoutException:
-                    return result.getvalue()
-
-                if not line.endswith(b'\r\n'):
-                    # something's wrong, result continuation should end with \r\n
-                    # e.g. it's unsolicited before command
-                    self.__cached_line = line
-                    return result.getvalue()
-
-                result.write(line)
-
-                if self._is_final(line):
-                    # it's result end
-                    # no need to check next line (can result in timeout)
-                    return result.getvalue()
-
-                try:
-                    self.__cached_line = self.readline()
-                except TimeoutException:
-                    self.__cached_line = b''
-
-                if len(self.__cached_line) < 1 or self.__cached_line.startswith(b'\r\n'):
-                    # it's result end
-                    return result.getvalue()
-
+        return self._next_event().raw
@@ -0,0 +1,205 @@
+import bisect
+import threading
+import time
+from sim800.protocol import Echo, Unsolicited
+
+
+class Histogram:
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # (float) seconds
+
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = self.BUCKETS
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # [(upper bound, observations <= upper bound)], the last bound is float('inf')
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    # pass metrics=Metrics() to SIM800 (or ThreadedSIM800, AsyncSIM800) to collect them;
+    # without it the manager skips every hook
+    PREFIX = 'sim800'
+    # (float) seconds from +CMGS to the status report of the last part
+    DELIVERY_BUCKETS = (1, 5, 10, 30, 60, 300, 600, 1800, 3600, 6 * 3600, 24 * 3600)
+    DELIVERY_OUTCOMES = ['delivered', 'failed', 'expired', 'unmatched']
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets
+        # command class name -> Histogram of seconds from write to the first result after the echo:
+        # information text, the "> " prompt or the final result
+        self.first_response = {}
+        self.final = {}  # command class name -> Histogram of seconds from write to the final result
+        self.timeouts = {}  # command class name -> count
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.unsolicited = 0
+        self.unsolicited_mid_command = 0  # unsolicited results received while waiting for a final result
+        self.queue_depth = 0
+        self.delivery = Histogram(self.DELIVERY_BUCKETS)  # of the messages delivered
+        self.deliveries = {outcome: 0 for outcome in self.DELIVERY_OUTCOMES}  # outcome -> messages (reports)
+        self._lock = threading.Lock()
+        self._command = None  # command class name waiting for its final result
+        self._written = None  # (float) monotonic time it was written
+        self._responded = False
+
+    # hooks called by the manager
+
+    def command_written(self, command):
+        with self._lock:
+            self._command = type(command).__name__
+            self._written = time.monotonic()
+            self._responded = False
+
+    def command_completed(self):
+        with self._lock:
+            if self._command is None:
+                return
+            self._histogram(self.final, self._command).observe(time.monotonic() - self._written)
+            self._command = None
+
+    def command_timed_out(self):
+        with self._lock:
+            if self._command is None:
+                return
+            self.timeouts[self._command] = self.timeouts.get(self._command, 0) + 1
+            self._command = None
+
+    def command_discarded(self):
+        # the response is not waited for (e.g. send_command(..., recv_result=False))
+        with self._lock:
+            self._command = None
+
+    def sent(self, count):
+        with self._lock:
+            self.bytes_sent += count
+
+    def received(self, count):
+        with self._lock:
+            self.bytes_received += count
+
+    def events_received(self, events):
+        # sim800.protocol events parsed from the data received
+        if self._command is None or self._responded:
+            return
+        if any(not isinstance(event, (Echo, Unsolicited)) for event in events):
+            with self._lock:
+                if self._command is not None and not self._responded:
+                    self._responded = True
+                    self._histogram(self.first_response, self._command).observe(time.monotonic() - self._written)
+
+    def unsolicited_received(self):
+        with self._lock:
+            self.unsolicited += 1
+            if self._command is not None:
+                self.unsolicited_mid_command += 1
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+
+    # hooks called by DeliveryReportIndex
+
+    def delivery_reported(self, seconds, delivered):
+        # the final status reports of all parts of a message are in
+        with self._lock:
+            if delivered:
+                self.delivery.observe(seconds)
+            self.deliveries['delivered' if delivered else 'failed'] += 1
+
+    def delivery_expired(self):
+        # no final report in the index's TTL
+        with self._lock:
+            self.deliveries['expired'] += 1
+
+    def delivery_unmatched(self):
+        # a report of no message the index knows
+        with self._lock:
+            self.deliveries['unmatched'] += 1
+
+    def _histogram(self, histograms, name):
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram(self.buckets)
+        return histogram
+
+    # exporters
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'timeouts': dict(self.timeouts),
+                'unsolicited': self.unsolicited,
+                'unsolicited_mid_command': self.unsolicited_mid_command,
+                'queue_depth': self.queue_depth,
+                'first_response_seconds': self._snapshot_histograms(self.first_response),
+                'final_result_seconds': self._snapshot_histograms(self.final),
+                'delivery_seconds': self._snapshot_histogram(self.delivery),
+                'deliveries': dict(self.deliveries),
+            }
+
+    @staticmethod
+    def _snapshot_histogram(h):
+        return {'buckets': h.cumulative(), 'sum': h.sum, 'count': h.count}
+
+    @classmethod
+    def _snapshot_histograms(cls, histograms):
+        return {name: cls._snapshot_histogram(h) for name, h in histograms.items()}
+
+    def prometheus(self):
+        # Prometheus text exposition format
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, metric_type, samples):
+            name = self.PREFIX + '_' + name
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+            for suffix, labels, value in samples:
+                label_string = ','.join('{}="{}"'.format(k, v) for k, v in labels)
+                if label_string:
+                    label_string = '{' + label_string + '}'
+                lines.append('{}{}{} {}'.format(name, suffix, label_string, value))
+
+        metric('bytes_sent_total', 'counter', [('', [], snapshot['bytes_sent'])])
+        metric('bytes_received_total', 'counter', [('', [], snapshot['bytes_received'])])
+        metric('command_timeouts_total', 'counter',
+               [('', [('command', name)], count) for name, count in sorted(snapshot['timeouts'].items())])
+        metric('unsolicited_total', 'counter', [('', [], snapshot['unsolicited'])])
+        metric('unsolicited_mid_command_total', 'counter', [('', [], snapshot['unsolicited_mid_command'])])
+        metric('queue_depth', 'gauge', [('', [], snapshot['queue_depth'])])
+
+        for name, key in (('command_first_response_seconds', 'first_response_seconds'),
+                          ('command_final_result_seconds', 'final_result_seconds')):
+            samples = []
+            for command, h in sorted(snapshot[key].items()):
+                for bound, count in h['buckets']:
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    samples.append(('_bucket', [('command', command), ('le', le)], count))
+                samples.append(('_sum', [('command', command)], h['sum']))
+                samples.append(('_count', [('command', command)], h['count']))
+            metric(name, 'histogram', samples)
+
+        metric('deliveries_total', 'counter',
+               [('', [('outcome', outcome)], count) for outcome, count in sorted(snapshot['deliveries'].items())])
+        h = snapshot['delivery_seconds']
+        samples = [('_bucket', [('le', '+Inf' if bound == float('inf') else repr(float(bound)))], count)
+                   for bound, count in h['buckets']]
+        samples += [('_sum', [], h['sum']), ('_count', [], h['count'])]
+        metric('delivery_seconds', 'histogram', samples)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,301 @@
+import collections
+import sqlite3
+import threading
+import time
+from sim800 import pdu
+from sim800.manager import TimeoutException
+
+
+class Outbox:
+    # durable queue of outgoing messages in SQLite (WAL mode), shared by the schedulers of several modems
+    QUEUED = 'queued'
+    SENDING = 'sending'  # taken by a scheduler, the modem may be sending it
+    SENT = 'sent'
+    FAILED = 'failed'
+    UNKNOWN = 'unknown'  # the process stopped or the modem timed out while sending: it may have been sent
+
+    STATES = [QUEUED, SENDING, SENT, FAILED, UNKNOWN]
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            address TEXT NOT NULL,
+            text TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            not_before REAL NOT NULL,  -- (float) Unix time it may be sent at
+            created REAL NOT NULL,
+            updated REAL NOT NULL,
+            error TEXT,
+            message_references TEXT  -- TP-MR of the parts, "1,2"
+        );
+        CREATE INDEX IF NOT EXISTS messages_ready ON messages (state, not_before, id);
+        CREATE TABLE IF NOT EXISTS sends (
+            sim TEXT NOT NULL,
+            sent REAL NOT NULL  -- (float) Unix time an SMS (a part of a message) was sent at
+        );
+        CREATE INDEX IF NOT EXISTS sends_sim ON sends (sim, sent);
+    '''
+    SENDS_KEPT = 3600  # (float) seconds the times of the SMS sent are kept for
+
+    def __init__(self, path):
+        # path: database file (":memory:" isn't durable, but works);
+        # other processes may be sending from it: call recover() once at start, when none is
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def recover(self):
+        # messages being sent when the process stopped are not sent again: a send can't be undone,
+        # it's up to the caller to requeue() them; returns how many there were
+        with self._lock:
+            return self.db.execute('UPDATE messages SET state = ?, updated = ? WHERE state = ?',
+                                   (self.UNKNOWN, time.time(), self.SENDING)).rowcount
+
+    def put(self, address, text, not_before=None):
+        # returns the id of the message
+        return self.put_many([(address, text)], not_before)[0]
+
+    def put_many(self, messages, not_before=None):
+        # (address, text) messages in one transaction, returns their ids
+        now = time.time()
+        if not_before is None:
+            not_before = now
+        with self._lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                ids = [self.db.execute(
+                    'INSERT INTO messages (address, text, state, not_before, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                    (address, text, self.QUEUED, not_before, now, now)).lastrowid for address, text in messages]
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+        return ids
+
+    def take(self, now=None):
+        # the oldest message due, marked SENDING: (id, address, text, attempts) or None
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self.db.execute('BEGIN IMMEDIATE')  # other processes can't take the same message
+            try:
+                row = self.db.execute(
+                    'SELECT id, address, text, attempts FROM messages WHERE state = ? AND not_before <= ? '
+                    'ORDER BY not_before, id LIMIT 1', (self.QUEUED, now)).fetchone()
+                if row is not None:
+                    self.db.execute('UPDATE messages SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?',
+                                    (self.SENDING, now, row[0]))
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+        return row
+
+    def add_sends(self, sim, times):
+        # (float) Unix times SMS were sent at through sim, e.g. an ICCID, see OutboxScheduler
+        with self._lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.execute('DELETE FROM sends WHERE sent <= ?', (time.time() - self.SENDS_KEPT,))
+                self.db.executemany('INSERT INTO sends (sim, sent) VALUES (?, ?)', [(sim, t) for t in times])
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+    def sends(self, sim, since):
+        # (float) Unix times SMS were sent at through sim after since, the oldest first
+        with self._lock:
+            rows = self.db.execute('SELECT sent FROM sends WHERE sim = ? AND sent > ? ORDER BY sent',
+                                   (sim, since)).fetchall()
+        return [row[0] for row in rows]
+
+    def next_due(self):
+        # (float) Unix time the next queued message is due at, None when nothing is queued
+        with self._lock:
+            return self.db.execute('SELECT MIN(not_before) FROM messages WHERE state = ?', (self.QUEUED,)).fetchone()[0]
+
+    def mark_sent(self, id, references=()):
+        self._update(id, self.SENT, None, ','.join(str(r) for r in references))
+
+    def mark_failed(self, id, error):
+        self._update(id, self.FAILED, error)
+
+    def mark_unknown(self, id, error, references=()):
+        # references: TP-MR of the parts known to be sent
+        self._update(id, self.UNKNOWN, error, ','.join(str(r) for r in references))
+
+    def release(self, id):
+        # back to the queue untried, the attempt doesn't count
+        with self._lock:
+            self.db.execute('UPDATE messages SET state = ?, attempts = attempts - 1, updated = ? WHERE id = ?',
+                            (self.QUEUED, time.time(), id))
+
+    def retry(self, id, not_before, error):
+        with self._lock:
+            self.db.execute('UPDATE messages SET state = ?, not_before = ?, error = ?, updated = ? WHERE id = ?',
+                            (self.QUEUED, not_before, error, time.time(), id))
+
+    def requeue(self, state=UNKNOWN):
+        # queue the messages in state (e.g. UNKNOWN, FAILED) again, returns how many
+        with self._lock:
+            now = time.time()
+            return self.db.execute('UPDATE messages SET state = ?, not_before = ?, updated = ? WHERE state = ?',
+                                   (self.QUEUED, now, now, state)).rowcount
+
+    def get(self, id):
+        # {column: value} or None
+        with self._lock:
+            cursor = self.db.execute('SELECT * FROM messages WHERE id = ?', (id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def counts(self):
+        # {state: messages}
+        with self._lock:
+            counts = dict(self.db.execute('SELECT state, COUNT(*) FROM messages GROUP BY state').fetchall())
+        return {state: counts.get(state, 0) for state in self.STATES}
+
+    def _update(self, id, state, error, references=None):
+        with self._lock:
+            self.db.execute('UPDATE messages SET state = ?, error = ?, message_references = ?, updated = ? WHERE id = ?',
+                            (state, error, references, time.time(), id))
+
+
+class OutboxScheduler:
+    # drains an Outbox through one modem (SIM800 or ThreadedSIM800) under its messages-per-minute cap;
+    # the SMS sent are kept in the outbox, the cap holds over a restart
+    RATE = 10  # (int) SMS per minute, a concatenated message counts all its parts
+    RETRIES = 3  # (int) attempts after the first one on a transient error
+    RETRY_DELAY = 30  # (float) seconds before the first retry, doubled for every next one
+    POLL_INTERVAL = 1  # (float) seconds between the checks of an empty outbox in run()
+
+    # +CMS ERROR codes the network or the modem may not return on the next attempt
+    TRANSIENT_CMS_ERRORS = {
+        38,  # network out of order
+        41,  # temporary failure
+        42,  # congestion
+        47,  # resources unavailable
+        331,  # no network service
+        332,  # network timeout
+        500,  # unknown error
+    }
+
+    def __init__(self, outbox, manager, rate=None, retries=None, retry_delay=None, reports=None, sim=None):
+        # reports: sim800.delivery.DeliveryReportIndex the messages sent are added to by their outbox id,
+        # they're sent with a status report request then;
+        # sim: (str) what the cap is per in the outbox, e.g. the ICCID, by default the port of the modem
+        if rate is None:
+            rate = self.RATE
+        if retries is None:
+            retries = self.RETRIES
+        if retry_delay is None:
+            retry_delay = self.RETRY_DELAY
+        self.outbox = outbox
+        self.manager = manager
+        self.rate = rate
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.reports = reports
+        if sim is None:
+            sim = getattr(getattr(manager, 'serial', None), 'port', None) or ''
+        self.sim = sim
+        # Unix times the SMS of the last minute were sent at
+        self._sent = collections.deque(outbox.sends(sim, time.time() - 60))
+
+    def wait_time(self, parts=1, now=None):
+        # (float) seconds until parts more SMS fit the cap
+        if now is None:
+            now = time.time()
+        sent = self._sent
+        while len(sent) > 0 and sent[0] <= now - 60:
+            sent.popleft()
+        over = len(sent) + parts - max(self.rate, parts)
+        if over <= 0:
+            return 0
+        return sent[over - 1] + 60 - now
+
+    def run_once(self):
+        # sends the next message due; returns 0 when one is handled,
+        # else (float) seconds to wait for the cap or the next message due, None when the outbox is empty
+        wait = self.wait_time()
+        if wait > 0:
+            return wait if self.outbox.next_due() is not None else None
+        message = self.outbox.take()
+        if message is None:
+            due = self.outbox.next_due()
+            return None if due is None else max(0, due - time.time())
+
+        id, address, text, attempts = message
+        try:
+            encoding, parts = pdu.split_text(text)
+        except ValueError as e:
+            self.outbox.mark_failed(id, str(e))
+            return 0
+        wait = self.wait_time(len(parts))
+        if wait > 0:
+            self.outbox.release(id)
+            return wait
+
+        self._send(id, address, text, attempts + 1, len(parts))
+        return 0
+
+    def _send(self, id, address, text, attempt, parts):
+        try:
+            results = self.manager.send_sms(address, text, status_report=self.reports is not None)
+        except TimeoutException as e:
+            # the parts accepted before the timeout count toward the cap and may get a report
+            results = getattr(e, 'results', [])
+            sent = self._add_sends(results)
+            self.outbox.mark_unknown(id, 'timeout: {}'.format(e), [r.mr for r in sent if r is not None])
+            if self.reports is not None:
+                self.reports.track(address, results, key=id)
+            return
+        except ValueError as e:  # e.g. an invalid address
+            self.outbox.mark_failed(id, str(e))
+            return
+
+        sent = self._add_sends(results)
+        final, result = results[-1]
+        if final.success:
+            self.outbox.mark_sent(id, [r.mr for r in sent if r is not None])
+            if self.reports is not None:
+                self.reports.track(address, results, key=id)
+        elif len(sent) > 0:
+            # a retry would send the first parts again
+            self.outbox.mark_failed(id, 'part {} of {}: {}'.format(len(sent) + 1, parts, final.error))
+        elif final.cms_code in self.TRANSIENT_CMS_ERRORS and attempt <= self.retries:
+            delay = self.retry_delay * 2 ** (attempt - 1)
+            self.outbox.retry(id, time.time() + delay, final.error)
+        else:
+            self.outbox.mark_failed(id, final.error)
+
+    def _add_sends(self, results):
+        # returns the results of the parts sent
+        now = time.time()
+        sent = [result for final, result in results if final.success]
+        self._sent.extend([now] * len(sent))
+        self.outbox.add_sends(self.sim, [now] * len(sent))
+        return sent
+
+    def run(self, stop=None):
+        # stop: threading.Event to stop at; without it returns when the outbox is empty
+        while stop is None or not stop.is_set():
+            wait = self.run_once()
+            if wait is None:
+                if stop is None:
+                    return
+                wait = self.POLL_INTERVAL
+            if wait > 0:
+                if stop is None:
+                    time.sleep(wait)
+                else:
+                    stop.wait(wait)
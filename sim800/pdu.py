@@ -0,0 +1,476 @@
+import datetime
+
+
+# 3GPP TS 23.038 GSM 7 bit default alphabet, the index is the septet
+GSM7_BASIC = (
+    '@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?'
+    '¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà'
+)
+GSM7_ESCAPE = 0x1B
+# extension table: septet after the escape -> character
+GSM7_EXTENSION = {
+    0x0A: '\x0c',
+    0x14: '^',
+    0x28: '{',
+    0x29: '}',
+    0x2F: '\\',
+    0x3C: '[',
+    0x3D: '~',
+    0x3E: ']',
+    0x40: '|',
+    0x65: '€',
+}
+
+# TP-DCS alphabets (general data coding group, no message class)
+GSM7 = 0x00
+DATA = 0x04  # 8 bit data
+UCS2 = 0x08
+
+MAX_SEPTETS = 160
+MAX_OCTETS = 140  # of the user data
+CONCAT_HEADER_SIZE = 6  # octets of a user data header with an 8 bit reference concatenation element
+MAX_PARTS = 255
+
+# type of address
+INTERNATIONAL = 0x91
+NATIONAL = 0x81
+ALPHANUMERIC = 0xD0
+
+# first octet
+MTI_DELIVER = 0x00
+MTI_SUBMIT = 0x01
+MTI_STATUS_REPORT = 0x02
+MMS = 0x04  # DELIVER, STATUS-REPORT: no more messages are waiting
+VPF_RELATIVE = 0x10
+SRR = 0x20  # SUBMIT: status report request
+SRI = 0x20  # DELIVER: status report indication
+UDHI = 0x40  # user data starts with a header
+
+# TP-ST of a status report
+STATUS_DELIVERED = 0x00  # received by the SME, 0x01 and 0x02 are successful too
+STATUS_TEMPORARY = 0x20  # 0x20-0x3F: still trying to deliver
+STATUS_PERMANENT = 0x40  # 0x40-0x5F: failed, 0x60-0x7F: temporary error, the SC stopped trying
+
+# information elements of the user data header
+IEI_CONCAT_8 = 0x00
+IEI_CONCAT_16 = 0x08
+
+
+def _tables():
+    unsupported = '\uffff'  # any non-ASCII character, it's detected after str.translate()
+    encode = {i: unsupported for i in range(128)}
+    for septet, char in enumerate(GSM7_BASIC):
+        if septet != GSM7_ESCAPE:
+            encode[ord(char)] = chr(septet)
+    for septet, char in GSM7_EXTENSION.items():
+        encode[ord(char)] = chr(GSM7_ESCAPE) + chr(septet)
+
+    decode = {i: char for i, char in enumerate(GSM7_BASIC) if i != GSM7_ESCAPE}
+    return encode, decode
+
+
+# str.translate() tables: character -> septet(s) as a character, septet -> character
+_ENCODE, _DECODE = _tables()
+
+
+def gsm7_septets(text):
+    # bytes of septets (extension characters take two), None if the text isn't GSM 7 bit
+    septets = text.translate(_ENCODE)
+    if not septets.isascii():
+        return None
+    return septets.encode('ascii')
+
+
+def septets_to_text(septets):
+    s = bytes(septets).decode('ascii').split(chr(GSM7_ESCAPE))
+    parts = [s[0].translate(_DECODE)]
+    for part in s[1:]:
+        if len(part) > 0:
+            # unknown extension characters are shown from the basic table
+            parts.append(GSM7_EXTENSION.get(ord(part[0])) or part[0].translate(_DECODE))
+            parts.append(part[1:].translate(_DECODE))
+    return ''.join(parts)
+
+
+# masks of 64 bit lanes, 8 septets each, to move the septets together (packing) or apart (unpacking):
+# 7 bits in every 8 -> 14 in every 16 -> 28 in every 32 -> 56 in every 64
+_LANE_MASKS = (
+    (0x007F007F007F007F, 0x7F007F007F007F00, 1),
+    (0x00003FFF00003FFF, 0x3FFF00003FFF0000, 2),
+    (0x000000000FFFFFFF, 0x0FFFFFFF00000000, 4),
+)
+_masks_cache = {}
+
+
+def _masks(lanes):
+    masks = _masks_cache.get(lanes)
+    if masks is None:
+        masks = _masks_cache[lanes] = [
+            (int.from_bytes(low.to_bytes(8, 'little') * lanes, 'little'),
+             int.from_bytes(high.to_bytes(8, 'little') * lanes, 'little'), shift)
+            for low, high, shift in _LANE_MASKS]
+    return masks
+
+
+def pack_septets(septets, padding=0):
+    # 8 septets -> 7 octets, the first septet in the lowest bits;
+    # padding: (int) fill bits before the first septet (after a user data header)
+    lanes = (len(septets) + 7) // 8
+    value = int.from_bytes(septets, 'little')
+    for low, high, shift in _masks(lanes):
+        value = (value & low) | ((value & high) >> shift)
+    packed = bytearray(value.to_bytes(lanes * 8, 'little'))
+    del packed[7::8]  # the empty octet of every lane
+
+    size = (len(septets) * 7 + padding + 7) // 8
+    if padding > 0:
+        return (int.from_bytes(packed, 'little') << padding).to_bytes(size + 1, 'little')[:size]
+    return bytes(packed[:size])
+
+
+def unpack_septets(data, count, padding=0):
+    # count: (int) septets to take
+    if padding > 0:
+        data = (int.from_bytes(data, 'little') >> padding).to_bytes(len(data), 'little')
+    lanes = (len(data) + 6) // 7
+    data = bytes(data) + bytes(lanes * 7 - len(data))
+    spread = bytearray(lanes * 8)
+    for i in range(7):
+        spread[i::8] = data[i::7]
+    value = int.from_bytes(spread, 'little')
+    for low, high, shift in reversed(_masks(lanes)):
+        value = (value & low) | ((value << shift) & high)
+    return value.to_bytes(lanes * 8, 'little')[:count]
+
+
+def encoded_length(text, encoding=None):
+    # (encoding, septets for GSM7 or octets for UCS2) of the text, encoding=None picks the alphabet
+    if encoding is None or encoding == GSM7:
+        septets = gsm7_septets(text)
+        if septets is not None:
+            return GSM7, len(septets)
+        if encoding == GSM7:
+            raise ValueError('text contains characters out of the GSM 7 bit alphabet')
+    if encoding is None or encoding == UCS2:
+        return UCS2, len(text.encode('utf-16-be'))
+    raise ValueError('"{}" is not supported'.format(encoding))
+
+
+# swapped BCD octet -> its two digits, e.g. 0x21 -> '12', 0xF5 -> '5F'
+_SEMI_OCTETS = ['{:X}{:X}'.format(b & 0x0F, b >> 4) for b in range(256)]
+_BCD = [(b & 0x0F) * 10 + (b >> 4) for b in range(256)]
+
+
+def _swap_digits(digits):
+    # '12345' -> '2143F5'
+    if len(digits) % 2 != 0:
+        digits += 'F'
+    return ''.join(digits[i + 1] + digits[i] for i in range(0, len(digits), 2))
+
+
+def encode_address(address):
+    # TP-DA: number of digits, type of address, swapped BCD digits
+    toa = NATIONAL
+    if address.startswith('+'):
+        toa = INTERNATIONAL
+        address = address[1:]
+    if not address.isdigit():
+        raise ValueError('"{}" is not a phone number'.format(address))
+    return bytes([len(address), toa]) + bytes.fromhex(_swap_digits(address))
+
+
+def decode_address(data, offset):
+    # returns (address, type of address, offset after it)
+    digits, toa = data[offset], data[offset + 1]
+    octets = (digits + 1) // 2
+    value = data[offset + 2:offset + 2 + octets]
+    if toa & 0x70 == ALPHANUMERIC & 0x70:
+        address = septets_to_text(unpack_septets(value, digits * 4 // 7))
+    else:
+        address = ''.join(map(_SEMI_OCTETS.__getitem__, value))[:digits].rstrip('F')
+        if toa & 0x70 == INTERNATIONAL & 0x70:
+            address = '+' + address
+    return address, toa, offset + 2 + octets
+
+
+def encode_smsc(smsc):
+    # SMSC information before the TPDU, b'\x00' uses the number stored in the modem (+CSCA)
+    if smsc is None:
+        return b'\x00'
+    address = encode_address(smsc)[1:]
+    return bytes([len(address)]) + address
+
+
+def decode_timestamp(data):
+    # TP-SCTS: swapped BCD YY MM DD hh mm ss, time zone in quarters of an hour
+    digits = [_BCD[b] for b in data[:6]]
+    tz = data[6]
+    quarters = (tz & 0x07) * 10 + (tz >> 4)
+    if tz & 0x08:
+        quarters = -quarters
+    return datetime.datetime(2000 + digits[0], *digits[1:], tzinfo=datetime.timezone(
+        datetime.timedelta(minutes=15 * quarters)))
+
+
+def encode_timestamp(t):
+    # t: aware datetime.datetime -> 7 octets of TP-SCTS
+    offset = t.utcoffset() or datetime.timedelta(0)
+    quarters = int(offset.total_seconds()) // (15 * 60)
+    digits = [t.year % 100, t.month, t.day, t.hour, t.minute, t.second, abs(quarters)]
+    data = bytes((d % 10) << 4 | d // 10 for d in digits)
+    if quarters < 0:
+        data = data[:6] + bytes([data[6] | 0x08])
+    return data
+
+
+def encode_validity(seconds):
+    # relative TP-VP, rounded up to the next value it can express
+    minutes = (seconds + 59) // 60
+    if minutes <= 12 * 60:
+        return max(0, (minutes + 4) // 5 - 1)
+    if minutes <= 24 * 60:
+        return 143 + (minutes - 12 * 60 + 29) // 30
+    days = (minutes + 24 * 60 - 1) // (24 * 60)
+    if days <= 30:
+        return 166 + days
+    return min(255, 192 + (days + 6) // 7)
+
+
+def concat_header(reference, total, number):
+    # user data header of one part of a concatenated message; reference: (int) 0-255, the parts are
+    # sized for this CONCAT_HEADER_SIZE header (the 16 bit reference element is only decoded)
+    if not 0 <= reference < 256:
+        raise ValueError('concatenation reference {} is not 0-255'.format(reference))
+    return bytes([IEI_CONCAT_8, 3, reference, total, number])
+
+
+def parse_header(udh):
+    # [(information element identifier, data)]
+    elements = []
+    i = 0
+    while i + 1 < len(udh):
+        length = udh[i + 1]
+        elements.append((udh[i], bytes(udh[i + 2:i + 2 + length])))
+        i += 2 + length
+    return elements
+
+
+def encode_user_data(text, encoding=None, udh=b''):
+    # returns (TP-DCS, TP-UDL, TP-UD); udh: user data header without its length octet
+    header = bytes([len(udh)]) + udh if len(udh) > 0 else b''
+    if encoding is None or encoding == GSM7:
+        septets = gsm7_septets(text)
+        if septets is not None:
+            header_septets = (len(header) * 8 + 6) // 7
+            length = header_septets + len(septets)
+            if length > MAX_SEPTETS:
+                raise ValueError('text is too long: {} septets'.format(length))
+            padding = header_septets * 7 - len(header) * 8
+            return GSM7, length, header + pack_septets(septets, padding)
+        if encoding == GSM7:
+            raise ValueError('text contains characters out of the GSM 7 bit alphabet')
+
+    if encoding is None or encoding == UCS2:
+        data = header + text.encode('utf-16-be')
+    elif encoding == DATA:
+        data = header + bytes(text)
+    else:
+        raise ValueError('"{}" is not supported'.format(encoding))
+    if len(data) > MAX_OCTETS:
+        raise ValueError('text is too long: {} octets'.format(len(data)))
+    return encoding if encoding is not None else UCS2, len(data), data
+
+
+def split_text(text, encoding=None):
+    # returns (encoding, [text of every part]): one part when the text fits one message,
+    # else parts that fit next to a concatenation header; GSM 7 bit escapes and UTF-16 surrogates aren't split
+    encoding, length = encoded_length(text, encoding)
+    if encoding == GSM7:
+        limit = MAX_SEPTETS
+        part_limit = MAX_SEPTETS - (CONCAT_HEADER_SIZE * 8 + 6) // 7
+        costs = [len(c.translate(_ENCODE)) for c in text] if length != len(text) else None
+    else:
+        limit = MAX_OCTETS
+        part_limit = MAX_OCTETS - CONCAT_HEADER_SIZE
+        costs = [2 if c <= '\uffff' else 4 for c in text] if length != len(text) * 2 else None
+    if length <= limit:
+        return encoding, [text]
+
+    if costs is None:
+        # every character takes the same space
+        step = part_limit if encoding == GSM7 else part_limit // 2
+        parts = [text[i:i + step] for i in range(0, len(text), step)]
+    else:
+        parts = []
+        start = used = 0
+        for i, cost in enumerate(costs):
+            if used + cost > part_limit:
+                parts.append(text[start:i])
+                start, used = i, 0
+            used += cost
+        parts.append(text[start:])
+    if len(parts) > MAX_PARTS:
+        raise ValueError('text is too long: {} parts'.format(len(parts)))
+    return encoding, parts
+
+
+def encode_submit(address, text, encoding=None, udh=b'', reference=0, validity=None, status_report=False,
+                  smsc=None):
+    # SMS-SUBMIT for +CMGS and +CMGW in PDU mode, returns (hex PDU, TPDU length);
+    # encoding: GSM7, UCS2, DATA (text is bytes) or None for GSM7 when the text fits it, else UCS2;
+    # validity: (float) seconds
+    return _SubmitEncoder(encoding, reference, validity, status_report, smsc).encode(address, text, udh)
+
+
+def encode_submits(messages, encoding=None, validity=None, status_report=False, smsc=None):
+    # many SMS-SUBMITs: messages are (address, text) or (address, text, udh),
+    # returns [(hex PDU, TPDU length)]; the same recipients are encoded once
+    encoder = _SubmitEncoder(encoding, 0, validity, status_report, smsc)
+    return [encoder.encode(*message) for message in messages]
+
+
+def encode_sms(address, text, concat_reference=0, encoding=None, validity=None, status_report=False, smsc=None):
+    # [(hex PDU, TPDU length)]: one SMS-SUBMIT, or the parts of a concatenated message when the text is too long;
+    # concat_reference: (int) 0-255, the same for all parts, different from the other recent long messages
+    encoding, parts = split_text(text, encoding)
+    encoder = _SubmitEncoder(encoding, 0, validity, status_report, smsc)
+    if len(parts) == 1:
+        return [encoder.encode(address, text)]
+    return [encoder.encode(address, part, concat_header(concat_reference, len(parts), number))
+            for number, part in enumerate(parts, 1)]
+
+
+class _SubmitEncoder:
+    def __init__(self, encoding, reference, validity, status_report, smsc):
+        self.encoding = encoding
+        self.reference = reference
+        self.first_octet = MTI_SUBMIT
+        self.validity = b''
+        if validity is not None:
+            self.first_octet |= VPF_RELATIVE
+            self.validity = bytes([encode_validity(validity)])
+        if status_report:
+            self.first_octet |= SRR
+        self.smsc = encode_smsc(smsc)
+        self._addresses = {}
+
+    def encode(self, address, text, udh=b''):
+        destination = self._addresses.get(address)
+        if destination is None:
+            destination = self._addresses[address] = encode_address(address)
+        dcs, length, data = encode_user_data(text, self.encoding, udh)
+
+        first_octet = self.first_octet | UDHI if len(udh) > 0 else self.first_octet
+        tpdu = b''.join((bytes([first_octet, self.reference & 0xFF]), destination, bytes([0, dcs]),
+                         self.validity, bytes([length]), data))
+        return (self.smsc + tpdu).hex().upper(), len(tpdu)
+
+
+class Deliver:
+    # SMS-DELIVER, e.g. from +CMGR or +CMGL in PDU mode
+    def __init__(self, pdu):
+        # pdu: hex string or bytes, with the SMSC information
+        if isinstance(pdu, str):
+            pdu = bytes.fromhex(pdu.strip())
+        self.pdu = pdu
+
+        smsc_length = pdu[0]
+        self.smsc = None
+        if smsc_length > 0:
+            self.smsc, _, _ = decode_address(bytes([(smsc_length - 1) * 2]) + pdu[1:1 + smsc_length], 0)
+        i = 1 + smsc_length
+
+        first_octet = pdu[i]
+        if first_octet & 0x03 != MTI_DELIVER:
+            raise ValueError('not an SMS-DELIVER PDU')
+        self.more_messages = not first_octet & MMS
+        self.status_report = bool(first_octet & SRI)
+        self.address, self.address_type, i = decode_address(pdu, i + 1)
+        self.pid = pdu[i]
+        self.dcs = pdu[i + 1]
+        self.timestamp = decode_timestamp(pdu[i + 2:i + 9])
+        length = pdu[i + 9]
+        data = pdu[i + 10:]
+
+        self.encoding = alphabet(self.dcs)
+        self.udh = []
+        header_length = 0
+        if first_octet & UDHI:
+            header_length = data[0] + 1
+            self.udh = parse_header(data[1:header_length])
+
+        self.text = None
+        self.data = None
+        if self.encoding == GSM7:
+            header_septets = (header_length * 8 + 6) // 7
+            padding = header_septets * 7 - header_length * 8
+            septets = unpack_septets(data[header_length:], length - header_septets, padding)
+            self.text = septets_to_text(septets)
+        elif self.encoding == UCS2:
+            self.text = data[header_length:length].decode('utf-16-be', errors='replace')
+        else:
+            self.data = bytes(data[header_length:length])
+
+    def __repr__(self):
+        return '<{} from {} {!r}>'.format(self.__class__.__name__, self.address, self.text)
+
+    @property
+    def concat(self):
+        # (reference, total, number) of a part of a concatenated message, or None
+        for iei, data in self.udh:
+            if iei == IEI_CONCAT_8 and len(data) == 3:
+                return data[0], data[1], data[2]
+            if iei == IEI_CONCAT_16 and len(data) == 4:
+                return (data[0] << 8) | data[1], data[2], data[3]
+        return None
+
+
+def alphabet(dcs):
+    # GSM7, DATA or UCS2 of a TP-DCS
+    if dcs & 0xC0 == 0x00:  # general data coding
+        return dcs & 0x0C if dcs & 0x0C != 0x0C else GSM7
+    if dcs & 0xF0 == 0xF0:  # data coding / message class
+        return DATA if dcs & 0x04 else GSM7
+    if dcs & 0xF0 == 0xE0:  # message waiting, UCS2
+        return UCS2
+    return GSM7
+
+
+def decode_deliver(pdu):
+    return Deliver(pdu)
+
+
+def decode_delivers(pdus):
+    return [Deliver(pdu) for pdu in pdus]
+
+
+class StatusReport:
+    # SMS-STATUS-REPORT, e.g. from +CDS in PDU mode
+    def __init__(self, pdu):
+        # pdu: hex string or bytes, with the SMSC information
+        if isinstance(pdu, str):
+            pdu = bytes.fromhex(pdu.strip())
+        self.pdu = pdu
+
+        i = 1 + pdu[0]
+        first_octet = pdu[i]
+        if first_octet & 0x03 != MTI_STATUS_REPORT:
+            raise ValueError('not an SMS-STATUS-REPORT PDU')
+        self.message_reference = pdu[i + 1]  # TP-MR of the SMS-SUBMIT
+        self.address, self.address_type, i = decode_address(pdu, i + 2)
+        self.timestamp = decode_timestamp(pdu[i:i + 7])  # the SC received the message
+        self.discharge_time = decode_timestamp(pdu[i + 7:i + 14])  # delivered, or the last attempt
+        self.status = pdu[i + 14]
+
+    def __repr__(self):
+        return '<{} {} to {} status {:#04x}>'.format(
+            self.__class__.__name__, self.message_reference, self.address, self.status)
+
+    @property
+    def delivered(self):
+        return self.status < STATUS_TEMPORARY
+
+    @property
+    def final(self):
+        # the SC won't send another report for the message
+        return self.status < STATUS_TEMPORARY or self.status >= STATUS_PERMANENT
@@ -0,0 +1,256 @@
+import collections
+import concurrent.futures
+import threading
+import time
+import serial
+from sim800 import pdu
+from sim800.commands.ts27007 import SignalQualityReportCommand
+from sim800.commands.v25ter import ATCommand
+from sim800.manager import SIM800, TimeoutException
+
+
+class _Job:
+    def __init__(self, address, text, parts, timeout):
+        self.address = address
+        self.text = text
+        self.parts = parts  # (int) SMS the message takes
+        self.timeout = timeout
+        self.future = concurrent.futures.Future()
+
+
+class PoolModem:
+    # one modem of a ModemPool, its jobs are sent by its own thread
+    def __init__(self, manager, quota=None):
+        self.manager = manager
+        self.quota = quota  # (int) SMS per ModemPool.QUOTA_PERIOD, None: no limit
+        self.healthy = False  # until the first health check
+        self.signal = None  # rssi of +CSQ at the last health check
+        self.error = None  # why it's not healthy
+        self.queue = collections.deque()  # _Job assigned to it
+        self.outstanding = 0  # (int) SMS queued and being sent
+        self.used = 0  # (int) SMS of the quota period, including the outstanding ones
+        self.sent = 0  # (int) messages
+        self.failed = 0  # (int) messages
+        self.send_failures = 0  # (int) messages failed in a row with no part sent, e.g. +CMS ERROR for each
+        self._period_start = time.monotonic()
+        self._next_check = 0  # (float) monotonic time of the next health check
+        self._thread = None
+
+    def __repr__(self):
+        return '<{} {} {}, {} outstanding>'.format(
+            self.__class__.__name__, getattr(self.manager.serial, 'port', None),
+            'healthy' if self.healthy else 'unhealthy', self.outstanding)
+
+    def quota_left(self, period, now):
+        if self.quota is None:
+            return float('inf')
+        if now - self._period_start >= period:
+            self._period_start = now
+            self.used = self.outstanding
+        return self.quota - self.used
+
+
+class ModemPool:
+    # sends SMS through several modems, each message by the healthy modem with the least outstanding SMS
+    # and quota left; the work queued for a modem that fails a health check or times out goes to the others
+    HEALTH_INTERVAL = 30  # (float) seconds between the health checks of a healthy modem
+    RECHECK_INTERVAL = 5  # (float) seconds between the health checks of an unhealthy one
+    QUOTA_PERIOD = 24 * 3600  # (float) seconds
+    MIN_SIGNAL = 5  # +CSQ rssi below it (or 99, not known) is unhealthy
+    MAX_SEND_FAILURES = 3  # messages failing in a row make a modem unhealthy, even if it answers AT and +CSQ
+
+    def __init__(self, ports=(), quota=None, manager_class=SIM800, **kwargs):
+        # ports: serial ports to open manager_class(port, **kwargs) on; quota: (int) SMS per QUOTA_PERIOD of every SIM
+        self.modems = []
+        self.backlog = collections.deque()  # _Job no modem can take now
+        self._condition = threading.Condition()
+        self._running = False
+        for port in ports:
+            self.add(manager_class(port, **kwargs), quota)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, manager, quota=None):
+        # manager: an opened SIM800 (e.g. on a CMUX channel), the pool owns it from now on
+        modem = PoolModem(manager, quota)
+        with self._condition:
+            self.modems.append(modem)
+            if self._running:
+                self._start(modem)
+        return modem
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            for modem in self.modems:
+                self._start(modem)
+
+    def _start(self, modem):
+        modem._thread = threading.Thread(target=self._work, args=(modem,), name='SIM800 pool worker', daemon=True)
+        modem._thread.start()
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for modem in self.modems:
+            if modem._thread is not None:
+                modem._thread.join()
+                modem._thread = None
+            modem.manager.close()
+
+        with self._condition:
+            jobs = list(self.backlog)
+            self.backlog.clear()
+            for modem in self.modems:
+                jobs += modem.queue
+                modem.queue.clear()
+        for job in jobs:
+            job.future.set_exception(TimeoutException('closed'))
+
+    def send_sms(self, address, text, timeout=None):
+        # returns a future of [(final, result)] of the parts, see SIM800.send_sms();
+        # it's TimeoutException when the modem timed out: the message may have been sent, so it isn't sent again
+        encoding, parts = pdu.split_text(text)
+        job = _Job(address, text, len(parts), timeout)
+        with self._condition:
+            self.backlog.append(job)
+            self._dispatch()
+        return job.future
+
+    def check_health(self):
+        # check all the modems now
+        with self._condition:
+            for modem in self.modems:
+                modem._next_check = 0
+            self._condition.notify_all()
+
+    @property
+    def healthy(self):
+        return [modem for modem in self.modems if modem.healthy]
+
+    @property
+    def outstanding(self):
+        # (int) SMS not sent yet
+        with self._condition:
+            return sum(job.parts for job in self.backlog) + sum(modem.outstanding for modem in self.modems)
+
+    def _dispatch(self):
+        # assign the backlog in order, called with the lock held; a job no modem has the quota for
+        # stays in the backlog, the ones after it may still fit
+        now = time.monotonic()
+        backlog = collections.deque()
+        for job in self.backlog:
+            candidates = [m for m in self.modems if m.healthy and m.quota_left(self.QUOTA_PERIOD, now) >= job.parts]
+            if len(candidates) < 1:
+                backlog.append(job)
+                continue
+            modem = min(candidates, key=lambda m: m.outstanding)
+            modem.queue.append(job)
+            modem.outstanding += job.parts
+            modem.used += job.parts
+        self.backlog = backlog
+        self._condition.notify_all()
+
+    def _fail_over(self, modem, error):
+        # called with the lock held
+        modem.healthy = False
+        modem.error = error
+        modem._next_check = time.monotonic() + self.RECHECK_INTERVAL
+        jobs = list(modem.queue)
+        modem.queue.clear()
+        for job in jobs:
+            modem.outstanding -= job.parts
+            modem.used -= job.parts
+        self.backlog.extendleft(reversed(jobs))
+        self._dispatch()
+
+    def _work(self, modem):
+        while True:
+            with self._condition:
+                while self._running and not (modem.healthy and len(modem.queue) > 0):
+                    wait = modem._next_check - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                if not self._running:
+                    return
+                job = None
+                if modem._next_check > time.monotonic() and modem.healthy and len(modem.queue) > 0:
+                    job = modem.queue.popleft()
+
+            if job is None:
+                self._check(modem)
+            else:
+                self._send(modem, job)
+
+    def _check(self, modem):
+        manager = modem.manager
+        signal = error = None
+        try:
+            final, result = manager.send_command(ATCommand())
+            if final.success:
+                final, result = manager.send_command(SignalQualityReportCommand.execute())
+            if not final.success:
+                error = final.error
+            elif result is None:
+                error = 'no signal quality'
+            else:
+                signal = int(result.str_result[len('+CSQ: '):].split(',')[0])
+                if signal == 99 or signal < self.MIN_SIGNAL:
+                    error = 'signal {}'.format(signal)
+        except (TimeoutException, serial.SerialException, ValueError) as e:
+            error = str(e) or type(e).__name__
+
+        with self._condition:
+            modem.signal = signal
+            if error is not None:
+                self._fail_over(modem, error)
+                return
+            modem.healthy = True
+            modem.error = None
+            modem._next_check = time.monotonic() + self.HEALTH_INTERVAL
+            self._dispatch()
+
+    def _send(self, modem, job):
+        try:
+            results = modem.manager.send_sms(job.address, job.text, timeout=job.timeout)
+        except (TimeoutException, serial.SerialException) as e:
+            with self._condition:
+                modem.outstanding -= job.parts
+                modem.failed += 1
+                self._fail_over(modem, str(e) or type(e).__name__)
+            job.future.set_exception(TimeoutException(e))
+            return
+        except Exception as e:  # e.g. ValueError of an invalid address
+            with self._condition:
+                modem.outstanding -= job.parts
+                modem.used -= job.parts
+                modem.failed += 1
+                self._dispatch()
+            job.future.set_exception(e)
+            return
+
+        sent = sum(1 for final, result in results if final.success)
+        with self._condition:
+            modem.outstanding -= job.parts
+            modem.used -= job.parts - sent
+            if sent == job.parts:
+                modem.sent += 1
+            else:
+                modem.failed += 1
+            modem.send_failures = modem.send_failures + 1 if sent == 0 else 0
+            if modem.send_failures >= self.MAX_SEND_FAILURES:
+                final, result = results[-1]
+                modem.send_failures = 0
+                self._fail_over(modem, '{} messages failed in a row: {}'.format(self.MAX_SEND_FAILURES, final.error))
+            else:
+                self._dispatch()
+        job.future.set_result(results)
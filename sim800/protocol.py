@@ -0,0 +1,270 @@
+from sim800.framer import LineFramer
+from sim800.results.prefix import PrefixDispatcher
+from sim800.results.result import ExecutedCommandFinalResult
+import sim800.results.unsolicited as unsolicited
+
+
+# classifies a line as final result, one of unsolicited results or anything else in one match
+LINE_DISPATCHER = PrefixDispatcher.for_results([ExecutedCommandFinalResult] + unsolicited.RESULTS)
+
+
+class TimeoutException(Exception):
+    # no (final) result in time, raised by the front ends (sim800.manager and the others)
+    pass
+
+
+class Event:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.raw)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.raw == other.raw
+
+
+class Echo(Event):
+    pass
+
+
+class Response(Event):
+    pass
+
+
+class FinalResult(Event):
+    def __init__(self, raw, result=None):
+        super().__init__(raw)
+        if result is None:
+            result = ExecutedCommandFinalResult(raw)
+        self.result = result
+
+
+class Unsolicited(Event):
+    def __init__(self, raw, result):
+        super().__init__(raw)
+        self.result = result
+
+
+class Prompt(Event):
+    pass
+
+
+class ATProtocol:
+    CRLF = b'\r\n'
+    PROMPT = b'> '
+    NUMERIC_FINALS = [(code + '\r').encode('ascii') for code in ExecutedCommandFinalResult.NUMERIC_CODES]
+
+    def __init__(self):
+        self.framer = LineFramer()
+        self._block = None  # b'\r\n' + lines of the result being received
+        self._expect_prompt = False
+        self._stream_prefix = None
+        self._body = None  # (result class, header line, body start in _block) of the unsolicited result in _block, e.g. +CMT
+        self._verbose_final = False  # numeric: b'OK\r\n' or b'ERROR\r\n' is the final result of ATV0, not text
+
+    def stream(self, prefix):
+        # until the final result, every line starting with prefix (e.g. b'+CMGL: ') ends the result
+        # before it: the records of a long response are emitted one by one
+        self._stream_prefix = prefix
+
+    def _streams(self, line):
+        block = self._block
+        return (self._stream_prefix is not None and line.startswith(self._stream_prefix)
+                and len(block.strip()) > 0)
+
+    @property
+    def numeric(self):
+        return self.framer.numeric
+
+    @numeric.setter
+    def numeric(self, enabled):
+        # ATV0: result codes are b'<digit>\r' and information text is b'<text>\r\n' with no b'\r\n' before it;
+        # +CME ERROR and +CMS ERROR are still final, OK and ERROR only until the first final result (ATV0's)
+        self.framer.numeric = enabled
+        self._verbose_final = enabled
+
+    def expect_prompt(self):
+        # the next command waits for "> " before its next line argument (e.g. +CMGS)
+        self._expect_prompt = True
+
+    def receive_data(self, data):
+        self.framer.feed(data)
+        events = []
+        line = self.framer.next_line()
+        while line is not None:
+            events += self.receive_line(line)
+            line = self.framer.next_line()
+        if self._expect_prompt:
+            events += self._receive_prompt()
+        return events
+
+    def _receive_prompt(self):
+        prompt = self.framer.take_prefix(self.PROMPT)
+        if prompt is None:
+            return []
+
+        self._expect_prompt = False
+        if self._block == self.CRLF:
+            # the prompt is "\r\n> ", there's no result to end
+            self._block = None
+            prompt = self.CRLF + prompt
+        return [Prompt(prompt)]
+
+    def flush(self):
+        # no more data is coming for now (read timeout): emit everything pending
+        events = []
+        if self._expect_prompt:
+            events += self._receive_prompt()
+        line = self.framer.next_line(final=True)
+        while line is not None:
+            events += self.receive_line(line)
+            line = self.framer.next_line(final=True)
+
+        rest = self.framer.flush()
+        if len(rest) > 0:
+            events += self.receive_line(rest)
+
+        if self._block is not None:
+            events.append(self._end_block())
+        return events
+
+    def receive_line(self, line):
+        if self.numeric:
+            return self._receive_numeric_line(line)
+
+        events = []
+        block = self._block
+        if block is not None:
+            if self._body is not None:
+                return self._receive_body_line(line)
+            if self._streams(line):
+                events.append(self._end_block())
+                self._block = bytearray(self.CRLF) + line
+                return events
+            if line.endswith(self.CRLF) and not (line == self.CRLF and len(block) > len(self.CRLF)):
+                # result continuation
+                header = len(block) == len(self.CRLF)
+                block += line
+                result_class = LINE_DISPATCHER.match(line)
+                if result_class is ExecutedCommandFinalResult:
+                    # it's result end, no need to wait for the next line
+                    events.append(self._end_block())
+                elif header and result_class is not None and result_class.body_lines(line) > 0:
+                    self._body = (result_class, line, len(block))
+                return events
+
+            # result continuation should end with \r\n, and b'\r\n' starts the next result
+            events.append(self._end_block())
+
+        if line.endswith(b'\r'):
+            events.append(Echo(line))  # it's command + b'\r'
+        elif line == self.CRLF:
+            self._block = bytearray(line)  # it's result start
+        else:
+            events.append(self._classify(line))
+        return events
+
+    def _receive_body_line(self, line):
+        # the line belongs to the unsolicited result even if it looks like a final result
+        self._block += line
+        result_class, header, start = self._body
+        if not result_class.body_complete(header, bytes(self._block[start:])):
+            return []
+        return [self._end_block()]
+
+    def _receive_numeric_line(self, line):
+        if self._body is not None:
+            return self._receive_body_line(line)
+        events = []
+        if line in self.NUMERIC_FINALS:
+            if self._block is not None:
+                events.append(self._end_block())
+            self._expect_prompt = False
+            self._stream_prefix = None
+            self._verbose_final = False
+            events.append(FinalResult(line))
+            return events
+
+        if line == unsolicited.RingResult.NUMERIC_CODE:
+            if self._block is not None:
+                events.append(self._end_block())
+            events.append(Unsolicited(line, unsolicited.RingResult(line)))
+            return events
+
+        if line == self.CRLF:
+            return events  # e.g. before "> " or a verbose result
+
+        result_class = LINE_DISPATCHER.match(line)
+        if result_class is ExecutedCommandFinalResult and not line.startswith(b'+') and not self._verbose_final:
+            result_class = None  # e.g. the SMS text "OK" of +CMGR
+        if line.endswith(self.CRLF) and result_class is None:
+            if self._block is not None and self._continues_block(line) and not self._streams(line):
+                self._block += line
+                return events
+            if self._block is not None:
+                events.append(self._end_block())
+            self._block = bytearray(line)  # the next line might continue it
+            return events
+
+        if self._block is not None:
+            events.append(self._end_block())
+        if line.endswith(b'\r'):
+            events.append(Echo(line))
+        elif result_class not in (None, ExecutedCommandFinalResult) and result_class.body_lines(line) > 0:
+            self._block = bytearray(line)
+            self._body = (result_class, line, len(line))
+        elif result_class is None:
+            events.append(Response(line))  # text of no result, e.g. "OK" with no line before it
+        else:
+            events.append(self._classify(line))
+        return events
+
+    def _continues_block(self, line):
+        # without b'\r\n' between results a new one starts with "+..." (e.g. "+CREG: " after "+CSQ: ");
+        # other lines (e.g. SMS text after "+CMGR: ") and lines of the same result ("+CMGL: ") continue it
+        if not line.startswith(b'+'):
+            return True
+        block = self._block
+        if not block.startswith(b'+'):
+            return False
+        return line.startswith(bytes(block[:block.find(b':') + 1]))
+
+    def _end_block(self):
+        raw = bytes(self._block)
+        self._block = None
+        self._body = None
+        return self._classify(raw)
+
+    def _classify(self, raw):
+        result_class = LINE_DISPATCHER.match(raw)
+        if result_class is None:
+            return Response(raw)
+        if result_class is ExecutedCommandFinalResult:
+            self._expect_prompt = False  # e.g. ERROR instead of the prompt
+            self._stream_prefix = None
+            self._verbose_final = False
+            return FinalResult(raw, ExecutedCommandFinalResult(raw))
+        return Unsolicited(raw, result_class(raw))
+
+
+class CommandTransaction:
+    def __init__(self, command):
+        self.command = command
+        self.lines = []
+        self.final = None
+
+    @property
+    def done(self):
+        return self.final is not None
+
+    def receive(self, event):
+        # returns True when the final result is received
+        self.lines.append(event.raw)
+        if isinstance(event, FinalResult):
+            self.final = event.result
+            return True
+        return False
+
+    def result(self):
+        return self.final, self.command.parse_response(self.lines)
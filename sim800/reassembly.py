@@ -0,0 +1,75 @@
+import collections
+import time
+
+
+class Message:
+    # a received message: one SMS-DELIVER, or all parts of a concatenated one in order
+    def __init__(self, parts):
+        self.parts = parts  # [sim800.pdu.Deliver]
+        self.address = parts[0].address
+        self.timestamp = parts[0].timestamp
+        self.text = ''.join(part.text or '' for part in parts)
+
+    def __repr__(self):
+        return '<{} from {} ({} parts) {!r}>'.format(self.__class__.__name__, self.address, len(self.parts), self.text)
+
+
+class ReassemblyIndex:
+    # collects the parts of concatenated messages by (originator, reference),
+    # a message is released as soon as its last part arrives
+    TIMEOUT = 3600  # (float) seconds to wait for the missing parts after the first one
+
+    def __init__(self, timeout=None, expired=None):
+        if timeout is None:
+            timeout = self.TIMEOUT
+        self.timeout = timeout
+        self.expired = expired  # callback([Deliver]) with the parts of a message evicted incomplete
+        # (originator, reference) -> [first part time, total, {number: Deliver}], the oldest first
+        self._pending = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, deliver, now=None):
+        # deliver: sim800.pdu.Deliver; returns the complete Message or None
+        if now is None:
+            now = time.monotonic()
+        self.evict(now)
+
+        concat = deliver.concat
+        if concat is None or concat[1] < 2:
+            return Message([deliver])
+        reference, total, number = concat
+        if not 1 <= number <= total:
+            return None
+
+        key = (deliver.address, reference)
+        entry = self._pending.get(key)
+        if entry is None or entry[1] != total:
+            # a new message, or the reference is reused for another one
+            self._pending.pop(key, None)
+            entry = self._pending[key] = [now, total, {}]
+        parts = entry[2]
+        parts[number] = deliver  # a repeated part replaces the previous one
+        if len(parts) < total:
+            return None
+
+        del self._pending[key]
+        return Message([parts[i] for i in range(1, total + 1)])
+
+    def evict(self, now=None):
+        # drop the messages still incomplete after the timeout, returns [[Deliver]] of them
+        if now is None:
+            now = time.monotonic()
+        deadline = now - self.timeout
+        evicted = []
+        while len(self._pending) > 0:
+            key, (first, total, parts) = next(iter(self._pending.items()))
+            if first > deadline:
+                break
+            del self._pending[key]
+            parts = [parts[number] for number in sorted(parts)]
+            evicted.append(parts)
+            if self.expired is not None:
+                self.expired(parts)
+        return evicted
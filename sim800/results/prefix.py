@@ -0,0 +1,50 @@
+import re
+
+
+class PrefixDispatcher:
+    # one precompiled regex instead of `line.strip().startswith(prefix)` for every prefix
+    _cache = {}
+    CACHE_SIZE = 1024
+
+    def __init__(self, prefixes):
+        # prefixes: iterable of (prefix, value), the first value for a prefix wins
+        self.values = {}
+        for prefix, value in prefixes:
+            if isinstance(prefix, str):
+                prefix = prefix.encode('ascii')
+            self.values.setdefault(prefix, value)
+
+        alternatives = []
+        for prefix in sorted(self.values, key=len, reverse=True):
+            pattern = re.escape(prefix)
+            if prefix[-1:].isspace():
+                # the stripped line should go on after the prefix's trailing whitespace
+                pattern += rb'(?=\s*\S)'
+            alternatives.append(pattern)
+
+        self._match = None
+        if len(alternatives) > 0:
+            self._match = re.compile(rb'\s*(' + b'|'.join(alternatives) + rb')').match
+
+    @classmethod
+    def for_prefixes(cls, prefixes, value=True):
+        key = (tuple(prefixes), value)
+        dispatcher = cls._cache.get(key)
+        if dispatcher is None:
+            dispatcher = cls((p, value) for p in prefixes)
+            if len(cls._cache) >= cls.CACHE_SIZE:
+                cls._cache.clear()
+            cls._cache[key] = dispatcher
+        return dispatcher
+
+    @classmethod
+    def for_results(cls, result_classes):
+        return cls((p, c) for c in result_classes for p in c.PREFIXES)
+
+    def match(self, line):
+        if self._match is None:
+            return None
+        m = self._match(line)
+        if m is None:
+            return None
+        return self.values[m.group(1)]
@@ -1,3 +1,6 @@
+from sim800.results.prefix import PrefixDispatcher
+
+
 class Result:
     PREFIXES = []
 
@@ -16,11 +19,13 @@ class Result:
 
     @classmethod
     def from_response(cls, response):
-        s = response.strip()
-        for prefix in cls.PREFIXES:
-            if s.startswith(prefix):
-                return cls(response)
-        return None
+        dispatcher = cls.__dict__.get('_prefix_dispatcher')
+        if dispatcher is None:
+            dispatcher = PrefixDispatcher.for_prefixes(cls.PREFIXES)
+            cls._prefix_dispatcher = dispatcher
+        if dispatcher.match(response) is None:
+            return None
+        return cls(response)
 
 
 class ExecutedCommandFinalResult(Result):
@@ -30,6 +35,26 @@ class ExecutedCommandFinalResult(Result):
     CMS_ERROR_PREFIX = "+CMS ERROR: "
     PREFIXES = [x.encode('ascii') for x in (OK_PREFIX, ERROR_PREFIX, CME_ERROR_PREFIX, CMS_ERROR_PREFIX)]
 
+    # results of ATD and ATA, final only in the numeric format: in the verbose one they'd be
+    # taken for the SMS text lines looking like them
+    CONNECT = "CONNECT"
+    NO_CARRIER = "NO CARRIER"
+    NO_DIALTONE = "NO DIALTONE"
+    BUSY = "BUSY"
+    NO_ANSWER = "NO ANSWER"
+    CALL_FAILURES = [NO_CARRIER, NO_DIALTONE, BUSY, NO_ANSWER]
+
+    # ATV0 result codes, sent as b'0\r'; 2 (RING) is unsolicited, see sim800.results.unsolicited.RingResult
+    NUMERIC_CODES = {
+        '0': OK_PREFIX,
+        '1': CONNECT,
+        '3': NO_CARRIER,
+        '4': ERROR_PREFIX,
+        '6': NO_DIALTONE,
+        '7': BUSY,
+        '8': NO_ANSWER,
+    }
+
     CME_CODE_TO_MEANING = {
         0: 'phone failure',
         10: 'SIM not inserted',
@@ -37,6 +62,15 @@ class ExecutedCommandFinalResult(Result):
         # add other CME ERROR codes from SIM800 Series command manual
     }
     CMS_CODE_TO_MEANING = {
+        21: 'short message transfer rejected',
+        38: 'network out of order',
+        41: 'temporary failure',
+        42: 'congestion',
+        47: 'resources unavailable',
+        304: 'invalid PDU mode parameter',
+        330: 'SMSC address unknown',
+        331: 'no network service',
+        332: 'network timeout',
         500: 'Unknown',
         # add CMS ERROR codes from SIM800 Series command manual
     }
@@ -44,8 +78,11 @@ class ExecutedCommandFinalResult(Result):
     def __init__(self, raw_result):
         super().__init__(raw_result)
         self.error = None
+        self.cme_code = None  # (int) of +CME ERROR: <err> in the numeric format
+        self.cms_code = None  # (int) of +CMS ERROR: <err> in the numeric format
 
         s = self.str_result
+        s = self.NUMERIC_CODES.get(s, s)
 
         if s.startswith(self.ERROR_PREFIX):
             self.error = 'ERROR'
@@ -54,6 +91,7 @@ class ExecutedCommandFinalResult(Result):
             err = s[len(self.CME_ERROR_PREFIX):]
 
             if err.isdigit():
+                self.cme_code = int(err)
                 self.error = self.decode_cme_error_code(err)
             else:
                 self.error = err
@@ -62,11 +100,15 @@ class ExecutedCommandFinalResult(Result):
             err = s[len(self.CMS_ERROR_PREFIX):]
 
             if err.isdigit():
+                self.cms_code = int(err)
                 self.error = self.decode_cms_error_code(err)
             else:
                 self.error = err
 
-        elif not s.startswith(self.OK_PREFIX):
+        elif s in self.CALL_FAILURES:
+            self.error = s
+
+        elif not (s.startswith(self.OK_PREFIX) or s.startswith(self.CONNECT)):
             self.error = 'Unknown response prefix: "{}"'.format(s)
 
     @property
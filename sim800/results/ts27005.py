@@ -0,0 +1,97 @@
+import re
+from sim800 import pdu
+from sim800.results.result import Result
+
+
+PARAM = re.compile(r'\s*(?:"([^"]*)"|([^,]*?))\s*(,|$)')
+
+
+def split_params(s):
+    # '1,"REC READ","+999","","24/10/18,10:00:00+32"' -> ['1', 'REC READ', '+999', '', '24/10/18,10:00:00+32']
+    params = []
+    pos = 0
+    while True:
+        m = PARAM.match(s, pos)
+        params.append(m.group(1) if m.group(1) is not None else m.group(2))
+        if m.group(3) != ',':
+            return params
+        pos = m.end()
+
+
+class SMSMessageResult(Result):
+    # a message read from the storage, text or PDU mode
+    PREFIX = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = None  # storage index
+        self.memory = None  # storage, e.g. "SM", if known
+        header, _, data = self.str_result.partition('\r\n')
+        self._parse(split_params(header[len(self.PREFIX):]), data)
+
+    def _parse(self, params, data):
+        # params: <stat>,... without the index
+        assert len(params) >= 2
+        self.address = None
+        self.timestamp = None
+        self.text = None
+        self.pdu = None
+
+        if params[0].isdigit():
+            # <stat>,[<alpha>],<length>
+            self.pdu_mode = True
+            self.stat = int(params[0])
+            self.alpha = params[1] or None
+            self.length = int(params[2]) if len(params) > 2 else None
+            self.pdu = data
+        else:
+            # <stat>,<oa/da>,[<alpha>],[<scts>][,...,<length>]
+            self.pdu_mode = False
+            self.stat = params[0]
+            self.address = params[1]
+            self.alpha = (params[2] or None) if len(params) > 2 else None
+            self.timestamp = (params[3] or None) if len(params) > 3 else None
+            self.length = int(params[-1]) if len(params) > 5 and params[-1] else None
+            self.text = data
+
+    @property
+    def deliver(self):
+        # sim800.pdu.Deliver of a received message in PDU mode
+        if not self.pdu_mode:
+            return None
+        return pdu.Deliver(self.pdu)
+
+
+class ListedSMSMessageResult(SMSMessageResult):
+    # one message of +CMGL, text mode:
+    #   +CMGL: <index>,<stat>,<oa/da>,[<alpha>],[<scts>][,<tooa/toda>,<length>]\r\n<data>
+    # PDU mode:
+    #   +CMGL: <index>,<stat>,[<alpha>],<length>\r\n<pdu>
+    PREFIX = b'+CMGL: '
+    PREFIXES = [PREFIX]
+
+    def _parse(self, params, data):
+        assert len(params) >= 3
+        self.index = int(params[0])
+        super()._parse(params[1:], data)
+
+
+class ReadSMSMessageResult(SMSMessageResult):
+    # +CMGR, text mode:
+    #   +CMGR: <stat>,<oa>,[<alpha>],<scts>[,<tooa>,<fo>,<pid>,<dcs>,<sca>,<tosca>,<length>]\r\n<data>
+    # PDU mode:
+    #   +CMGR: <stat>,[<alpha>],<length>\r\n<pdu>
+    PREFIX = b'+CMGR: '
+    PREFIXES = [PREFIX]
+
+
+class SentMessageResult(Result):
+    # +CMGS: <mr>[,<ackpdu>] or +CMSS: <mr>[,<ackpdu>]
+    PREFIX = b'+CMGS: '
+    PREFIXES = [PREFIX, b'+CMSS: ']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        params = split_params(self.str_result.partition(': ')[2])
+        self.mr = int(params[0])  # TP-MR, a status report of the message carries it
+        self.ack_pdu = params[1] if len(params) > 1 and params[1] else None
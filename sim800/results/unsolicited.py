@@ -1,7 +1,18 @@
+from sim800 import pdu
+from sim800.results.prefix import PrefixDispatcher
 from sim800.results.result import Result
+from sim800.results.ts27005 import SMSMessageResult, split_params
 
 class UnsolicitedResult(Result):
-    pass
+    @classmethod
+    def body_lines(cls, header):
+        # (int) lines after the header line that belong to the result whatever they look like, e.g. SMS text
+        return 0
+
+    @classmethod
+    def body_complete(cls, header, body):
+        # (bool) body, the lines after the header received so far, is all of the result
+        return body.count(b'\r\n') >= cls.body_lines(header)
 
 
 class NewMessageResult(UnsolicitedResult):
@@ -20,17 +31,126 @@ class NewMessageResult(UnsolicitedResult):
             self.mms = mms_push == "MMS PUSH"
 
 
-FACTORIES = [
-    NewMessageResult.from_response
+class RingResult(UnsolicitedResult):
+    # an incoming call, b'RING' or b'2\r' in the numeric format (ATV0)
+    PREFIX = b'RING'
+    PREFIXES = [PREFIX]
+    NUMERIC_CODE = b'2\r'
+
+
+class DeliveredMessageResult(SMSMessageResult, UnsolicitedResult):
+    # a message routed to TE by +CNMI=<mode>,2 instead of the storage, text mode:
+    #   +CMT: <oa>,[<alpha>],<scts>[,<tooa>,<fo>,<pid>,<dcs>,<sca>,<tosca>,<length>]\r\n<data>
+    # PDU mode:
+    #   +CMT: [<alpha>],<length>\r\n<pdu>
+    # with +CSMS=1 it should be acknowledged with +CNMA; the text may have line breaks of its own:
+    # with <length> (+CSDH=1) the lines up to its characters are the text, without it only one line
+    PREFIX = b'+CMT: '
+    PREFIXES = [PREFIX]
+
+    @classmethod
+    def body_lines(cls, header):
+        return 1
+
+    @classmethod
+    def body_complete(cls, header, body):
+        length = cls._text_length(header)
+        if length is None:
+            return super().body_complete(header, body)
+        text = body[:-2].decode('ascii', 'replace')  # but the CRLF ending the result
+        septets = pdu.gsm7_septets(text)
+        return (len(text) if septets is None else len(septets)) >= length
+
+    @classmethod
+    def _text_length(cls, header):
+        # (int) <length> in septets of a GSM 7 bit text mode header, None when the text is a single line:
+        # PDU mode, no <length>, or 8 bit and UCS2 data shown in hex
+        params = split_params(header.strip()[len(cls.PREFIX):].decode('ascii', 'replace'))
+        if len(params) < 10 or not params[-1].isdigit() or not params[6].isdigit():
+            return None
+        if pdu.alphabet(int(params[6])) != pdu.GSM7:
+            return None
+        return int(params[-1])
+
+    def _parse(self, params, data):
+        # like +CMGR with no <stat>
+        pdu_mode = len(params) == 2 and params[1].isdigit()
+        super()._parse(['0' if pdu_mode else 'REC UNREAD'] + params, data)
+        self.stat = None
+
+
+class StatusReportResult(UnsolicitedResult):
+    # a status report routed to TE by +CNMI=<mode>,<mt>,<bm>,1, text mode:
+    #   +CDS: <fo>,<mr>,[<ra>],[<tora>],<scts>,<dt>,<st>
+    # PDU mode:
+    #   +CDS: <length>\r\n<pdu>
+    PREFIX = b'+CDS: '
+    PREFIXES = [PREFIX]
+
+    @classmethod
+    def body_lines(cls, header):
+        return 0 if b',' in header else 1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        header, _, data = self.str_result.partition('\r\n')
+        params = split_params(header[len(self.PREFIX):])
+        self.message_reference = None  # (int) TP-MR of the SMS-SUBMIT, see +CMGS
+        self.address = None
+        self.status = None  # (int) TP-ST
+        self.pdu = None
+        self.pdu_mode = len(params) == 1
+        if self.pdu_mode:
+            self.length = int(params[0])
+            self.pdu = data
+            try:
+                report = self.report
+            except (ValueError, IndexError):
+                return  # garbled
+            self.message_reference = report.message_reference
+            self.address = report.address
+            self.status = report.status
+        else:
+            assert len(params) >= 7
+            self.length = None
+            self.message_reference = int(params[1])
+            self.address = params[2] or None
+            self.status = int(params[6])
+
+    @property
+    def report(self):
+        # sim800.pdu.StatusReport in PDU mode
+        if not self.pdu_mode:
+            return None
+        return pdu.StatusReport(self.pdu)
+
+    @property
+    def delivered(self):
+        return self.status is not None and self.status < pdu.STATUS_TEMPORARY
+
+    @property
+    def final(self):
+        # no other report is coming for the message
+        return self.status is not None and (self.status < pdu.STATUS_TEMPORARY or self.status >= pdu.STATUS_PERMANENT)
+
+
+RESULTS = [
+    NewMessageResult,
+    RingResult,
+    DeliveredMessageResult,
+    StatusReportResult,
 ]
 
+FACTORIES = [r.from_response for r in RESULTS]
+
+DISPATCHER = PrefixDispatcher.for_results(RESULTS)
+
 def from_response(response):
     results = []
     for line in response:
-        for factory in FACTORIES:
-            r = factory(line)
-            if r is not None:
-                results.append(r)
-                break  # factories loop
+        result_class = DISPATCHER.match(line)
+        if result_class is not None:
+            results.append(result_class(line))
     return results
 
+
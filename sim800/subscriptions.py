@@ -0,0 +1,164 @@
+import collections
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueueEmpty(Exception):
+    pass
+
+
+class UnsolicitedRegistry:
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+    OVERFLOW = [DROP_OLDEST, DROP_NEWEST]
+
+    DEFAULT_MAXLEN = 1024
+
+    def __init__(self, maxlen=None, overflow=None):
+        if maxlen is None:
+            maxlen = self.DEFAULT_MAXLEN
+        if overflow is None:
+            overflow = self.DROP_OLDEST
+        if overflow not in self.OVERFLOW:
+            raise ValueError('"{}" is not supported'.format(overflow))
+        self.maxlen = maxlen
+        self.overflow = overflow
+
+        # results nobody subscribed to, waiting for recv_unsolicited()
+        self.queue = collections.deque()
+        self._condition = threading.Condition()
+
+        self._callbacks = {}  # result type -> [(callback, consume), ...]
+        self._dispatch_cache = {}  # result type -> callbacks for it and its base classes
+
+        # (result, [callback]) waiting for the dispatcher thread: publish() never runs a callback,
+        # a slow one doesn't stall the reader
+        self._dispatching = collections.deque()
+        self._dispatch_condition = threading.Condition()
+        self._dispatcher = None
+        self._busy = False  # the dispatcher is running callbacks
+        self._closed = False
+
+        self.received = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.callback_errors = 0
+
+    def on(self, result_type, callback, consume=True):
+        # consume=False: the results still wait for recv_unsolicited(), callback only watches them
+        self._callbacks.setdefault(result_type, []).append((callback, consume))
+        self._dispatch_cache.clear()
+        return callback
+
+    def off(self, result_type, callback):
+        callbacks = self._callbacks[result_type]
+        for item in callbacks:
+            if item[0] == callback:
+                callbacks.remove(item)
+                break
+        else:
+            raise ValueError('callback is not subscribed')
+        self._dispatch_cache.clear()
+
+    def counters(self):
+        return {
+            'received': self.received,
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'callback_errors': self.callback_errors,
+            'queued': len(self.queue),
+            'pending': len(self._dispatching),
+        }
+
+    def publish(self, result):
+        self.received += 1
+
+        callbacks = self._dispatch_cache.get(type(result))
+        if callbacks is None:
+            callbacks = self._collect_callbacks(type(result))
+
+        if not any(consume for callback, consume in callbacks):
+            self._enqueue(result)
+        if len(callbacks) > 0:
+            self._schedule(result, [callback for callback, consume in callbacks])
+
+    def join(self, timeout=None):
+        # waits for the callbacks of the results published so far, False on timeout
+        if threading.current_thread() is self._dispatcher:
+            return True  # called by a callback
+        with self._dispatch_condition:
+            return self._dispatch_condition.wait_for(lambda: len(self._dispatching) < 1 and not self._busy, timeout)
+
+    def close(self):
+        # stops the dispatcher thread once the callbacks pending have run
+        with self._dispatch_condition:
+            dispatcher = self._dispatcher
+            if dispatcher is None:
+                return
+            self._closed = True
+            self._dispatch_condition.notify_all()
+        if dispatcher is not None and dispatcher is not threading.current_thread():
+            dispatcher.join()
+
+    def get(self, timeout=None):
+        # timeout=None waits forever, timeout=0 doesn't wait
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self.queue) > 0, timeout):
+                raise QueueEmpty()
+            return self.queue.popleft()
+
+    def _collect_callbacks(self, result_type):
+        callbacks = []
+        for t in result_type.__mro__:
+            callbacks += self._callbacks.get(t, [])
+        self._dispatch_cache[result_type] = callbacks
+        return callbacks
+
+    def _schedule(self, result, callbacks):
+        with self._dispatch_condition:
+            if len(self._dispatching) >= self.maxlen:
+                self.dropped += 1
+                if self.overflow == self.DROP_NEWEST:
+                    return
+                self._dispatching.popleft()
+            self._dispatching.append((result, callbacks))
+            self.dispatched += 1
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='sim800-unsolicited', daemon=True)
+                self._dispatcher.start()
+            self._dispatch_condition.notify_all()
+
+    def _dispatch(self):
+        condition = self._dispatch_condition
+        while True:
+            with condition:
+                condition.wait_for(lambda: len(self._dispatching) > 0 or self._closed)
+                if len(self._dispatching) < 1:
+                    self._dispatcher = None  # the next publish() starts another one
+                    self._closed = False
+                    return
+                result, callbacks = self._dispatching.popleft()
+                self._busy = True
+            for callback in callbacks:
+                try:
+                    callback(result)
+                except Exception:
+                    self.callback_errors += 1
+                    logger.exception('unsolicited result callback failed')
+            with condition:
+                self._busy = False
+                condition.notify_all()
+
+    def _enqueue(self, result):
+        with self._condition:
+            if len(self.queue) >= self.maxlen:
+                self.dropped += 1
+                if self.overflow == self.DROP_NEWEST:
+                    return
+                self.queue.popleft()
+            self.queue.append(result)
+            self._condition.notify()
@@ -0,0 +1,261 @@
+import collections
+import concurrent.futures
+import queue
+import threading
+import time
+import serial
+from sim800.commands.command import Command, NextLineArgCommand
+from sim800.manager import SIM800, TimeoutException
+from sim800.protocol import CommandTransaction, Prompt, Response, Unsolicited
+from sim800.results.unsolicited import UnsolicitedResult
+from sim800.subscriptions import QueueEmpty
+
+
+class _InFlight:
+    def __init__(self, batch, timeout):
+        self.batch = batch
+        self.transaction = CommandTransaction(batch.command)
+        self.timeout = timeout
+        self.start = time.monotonic()
+        self.deadline = self.start + timeout
+        self.awaiting_prompt = False
+
+
+class ThreadedSIM800(SIM800):
+    READ_TIMEOUT = 0.1  # (float) seconds without data after which a pending result is complete
+    BATCH_WINDOW = 0.01  # (float) seconds to wait for more commands to send them in one command line
+    MAX_UNCLAIMED = 64  # futures of send_command(..., recv_result=False) kept for recv_command_result()
+
+    def __init__(self, *args, **kwargs):
+        timeout = kwargs.get('timeout', self.DEFAULT_TIMEOUT)
+        kwargs['timeout'] = self.READ_TIMEOUT
+        super().__init__(*args, **kwargs)
+        self.timeout = self.latency.default_timeout = timeout
+        self._in_flight = None
+        self._batch_timer = None
+        self._unclaimed = collections.deque(maxlen=self.MAX_UNCLAIMED)  # (command, future), the oldest first
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # nothing in flight or queued
+        self._thread = None
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        # the reader thread enforces the deadlines, the first command starts it if start() wasn't called
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='SIM800 reader', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+            self.queue.cancel_all()
+        self._fail_all(TimeoutException('closed'))
+        super().close()
+
+    def subscribe(self, callback):
+        # callback sees every result, they are still available from recv_unsolicited()
+        return self.on(UnsolicitedResult, callback, consume=False)
+
+    def unsubscribe(self, callback):
+        self.off(UnsolicitedResult, callback)
+
+    def submit(self, command: Command, timeout=None):
+        # returns a future of (final, result); commands queued within BATCH_WINDOW
+        # are sent together, one command line at a time
+        return self._submit(command, timeout)
+
+    def _submit(self, command, timeout=None, records=None):
+        self.start()
+        future = self.queue.put(command, timeout, records)
+        if self.metrics is not None:
+            self.metrics.set_queue_depth(len(self.queue))
+        with self._lock:
+            if self._in_flight is None and self._batch_timer is None:
+                if self.BATCH_WINDOW > 0:
+                    self._batch_timer = threading.Timer(self.BATCH_WINDOW, self._on_batch_window)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+                else:
+                    self._write_batch()
+        return future
+
+    def run_queue(self):
+        # sends the queued commands now instead of after BATCH_WINDOW and waits until they're done
+        with self._lock:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+                self._batch_timer = None
+            if self._in_flight is None:
+                self._write_batch()
+            self._idle.wait_for(lambda: self._in_flight is None and len(self.queue) < 1)
+
+    def send_command(self, command: Command, recv_result=True, timeout=None):
+        future = self.submit(command, timeout)
+        if not recv_result:
+            # the reader still collects the result, for recv_command_result()
+            self._unclaimed.append((command, future))
+            return None
+        return future.result()
+
+    def recv_unsolicited(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            return self.subscriptions.get(timeout)
+        except QueueEmpty as e:
+            raise TimeoutException(e)
+
+    def recv_command_result(self, command: Command, timeout=None):
+        # the result of a command sent with recv_result=False;
+        # timeout: (float) seconds to wait for it, by default until the reader gives up on the command
+        for item in self._unclaimed:
+            if item[0] is command:
+                break
+        else:
+            raise ValueError('"{}" was not sent with recv_result=False'.format(command))
+        self._unclaimed.remove(item)
+        try:
+            return item[1].result(timeout)
+        except concurrent.futures.TimeoutError as e:
+            raise TimeoutException(e)
+
+    def iter_command_result(self, command: Command, timeout=None):
+        # see SIM800.iter_command_result(): the reader thread hands over every record as it's parsed
+        records = queue.Queue()
+        future = self._submit(command, timeout, records)
+        record = records.get()
+        while record is not None:
+            yield record
+            record = records.get()
+        final, result = future.result()
+        return final
+
+    def _on_batch_window(self):
+        with self._lock:
+            self._batch_timer = None
+            if self._in_flight is None:
+                self._write_batch()
+
+    def _write_batch(self):
+        # self._lock should be held
+        batch = self.queue.take_batch()
+        while batch is not None:
+            timeout = batch.timeout
+            if timeout is None:
+                timeout = self.latency.timeout(batch.command)
+            # the response can be dispatched before write() returns
+            in_flight = self._in_flight = _InFlight(batch, timeout)
+            command = batch.command
+            if self.metrics is not None:
+                self.metrics.set_queue_depth(len(self.queue))
+                self.metrics.command_written(command)
+            try:
+                if isinstance(command, NextLineArgCommand) and command.payload is not None:
+                    in_flight.awaiting_prompt = True
+                    in_flight.deadline = in_flight.start + self.PROMPT_TIMEOUT
+                    self._protocol.expect_prompt()
+                    self._write(command.header)
+                else:
+                    if batch.records is not None and command.STREAM_PREFIX is not None:
+                        self._protocol.stream(command.STREAM_PREFIX)
+                    self._write(bytes(command))
+                return
+            except serial.SerialException as e:
+                self._in_flight = None
+                if self.metrics is not None:
+                    self.metrics.command_discarded()
+                batch.set_exception(TimeoutException(e) if isinstance(e, serial.SerialTimeoutException) else e)
+            batch = self.queue.take_batch()
+        self._idle.notify_all()
+
+    def _complete_in_flight(self, exception=None):
+        with self._lock:
+            in_flight = self._in_flight
+            self._in_flight = None
+            if exception is not None:
+                in_flight.batch.set_exception(exception)
+            else:
+                in_flight.batch.set_result(in_flight.transaction)
+            self._write_batch()
+
+    def _fail_all(self, exception):
+        with self._lock:
+            if self._in_flight is not None:
+                self._in_flight.batch.set_exception(exception)
+                self._in_flight = None
+            batch = self.queue.take_batch()
+            while batch is not None:
+                batch.set_exception(exception)
+                batch = self.queue.take_batch()
+            self._idle.notify_all()
+
+    def _run(self):
+        while self._running:
+            try:
+                data = self._read_available()
+            except serial.SerialException as e:
+                self._fail_all(e)
+                break
+
+            if data:
+                events = self._protocol.receive_data(data)
+            else:
+                events = self._protocol.flush()
+            if self.metrics is not None and len(events) > 0:
+                self.metrics.events_received(events)
+            for event in events:
+                self._dispatch(event)
+
+            in_flight = self._in_flight
+            if in_flight is not None and time.monotonic() > in_flight.deadline:
+                if self.metrics is not None:
+                    self.metrics.command_timed_out()
+                if in_flight.awaiting_prompt:
+                    self._write(NextLineArgCommand.ESC.encode('ascii'))  # cancel the command
+                    self._complete_in_flight(exception=TimeoutException('no "> " prompt in {} s'.format(self.PROMPT_TIMEOUT)))
+                    continue
+                self.latency.timed_out(in_flight.transaction.command)
+                self._complete_in_flight(exception=TimeoutException('no final result in {} s'.format(in_flight.timeout)))
+
+    def _dispatch(self, event):
+        if isinstance(event, Unsolicited):
+            if self.metrics is not None:
+                self.metrics.unsolicited_received()
+            self.subscriptions.publish(event.result)
+
+        in_flight = self._in_flight
+        if in_flight is None:
+            return  # not a response to a queued command
+        if isinstance(event, Prompt):
+            if in_flight.awaiting_prompt:
+                with self._lock:
+                    in_flight.awaiting_prompt = False
+                    in_flight.deadline = time.monotonic() + in_flight.timeout
+                    self._write(in_flight.transaction.command.payload)
+            return
+        records = in_flight.batch.records
+        if records is not None and isinstance(event, Response):
+            record = in_flight.transaction.command.parse_record(event.raw)
+            if record is not None:
+                records.put(record)
+                in_flight.deadline = time.monotonic() + in_flight.timeout  # the timeout is between two records
+        if in_flight.transaction.receive(event):
+            self.latency.observe(in_flight.transaction.command, time.monotonic() - in_flight.start)
+            if self.metrics is not None:
+                self.metrics.command_completed()
+            self._complete_in_flight()
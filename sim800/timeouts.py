@@ -0,0 +1,69 @@
+from sim800.commands.command import ExtendedCommand, CombinedCommand
+
+
+class LatencyEstimator:
+    # smoothed latency and its variation per command type, the same way TCP estimates RTT (RFC 6298)
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    MIN_SAMPLES = 3  # observations before the estimate is used
+    MIN_TIMEOUT = 0.5  # (float) seconds
+
+    def __init__(self, default_timeout):
+        self.default_timeout = default_timeout
+        self._stats = {}  # key -> [samples, smoothed latency, latency variation]
+
+    @classmethod
+    def key(cls, command):
+        if isinstance(command, CombinedCommand):
+            return tuple(cls.key(c) for c in command.commands)
+        if isinstance(command, ExtendedCommand):
+            # test, read, write and execute of the same command take different time
+            suffix = command.cmd[len(command.BASE_CMD):]
+            for mode in ('=?', '?', '='):
+                if suffix.startswith(mode):
+                    return type(command), mode
+            return type(command), ''
+        return type(command), command.cmd
+
+    def limit(self, command):
+        if command.TIMEOUT is not None:
+            return command.TIMEOUT
+        return self.default_timeout
+
+    def timeout(self, command):
+        limit = self.limit(command)
+        if not command.ADAPTIVE_TIMEOUT:
+            return limit
+
+        stats = self._stats.get(self.key(command))
+        if stats is None or stats[0] < self.MIN_SAMPLES:
+            return limit
+
+        samples, latency, variation = stats
+        return min(limit, max(self.MIN_TIMEOUT, latency + self.K * variation))
+
+    def estimate(self, command):
+        # (smoothed latency, latency variation) or None
+        stats = self._stats.get(self.key(command))
+        if stats is None:
+            return None
+        return stats[1], stats[2]
+
+    def observe(self, command, seconds):
+        key = self.key(command)
+        stats = self._stats.get(key)
+        if stats is None:
+            self._stats[key] = [1, seconds, seconds / 2]
+            return
+
+        stats[0] += 1
+        stats[2] += self.BETA * (abs(stats[1] - seconds) - stats[2])
+        stats[1] += self.ALPHA * (seconds - stats[1])
+
+    def timed_out(self, command):
+        # back off: the command might have become slower
+        stats = self._stats.get(self.key(command))
+        if stats is not None:
+            stats[2] = max(2 * stats[2], self.MIN_TIMEOUT / self.K)
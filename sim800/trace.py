@@ -0,0 +1,175 @@
+import struct
+import threading
+import time
+
+
+# trace file: MAGIC, then records of RECORD + data
+MAGIC = b'SIM800TRACE\x01'
+RECORD = struct.Struct('<cdI')  # direction, (float) monotonic seconds since the start, length
+READ = b'<'  # modem -> host
+WRITE = b'>'  # host -> modem
+
+
+class TraceMismatch(Exception):
+    pass
+
+
+class TraceRecorder:
+    def __init__(self, file):
+        # file: path or binary file object
+        if isinstance(file, str):
+            file = open(file, 'wb')
+        self.file = file
+        self.file.write(MAGIC)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, direction, data):
+        if not data:
+            return
+        with self._lock:
+            self.file.write(RECORD.pack(direction, time.monotonic() - self._start, len(data)))
+            self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(file):
+    # yields (timestamp, direction, data)
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            yield from read_trace(f)
+        return
+
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a SIM800 trace')
+    while True:
+        header = file.read(RECORD.size)
+        if len(header) < RECORD.size:
+            return
+        direction, timestamp, length = RECORD.unpack(header)
+        yield timestamp, direction, file.read(length)
+
+
+class TracingSerial:
+    # records everything read from and written to a serial port
+    def __init__(self, serial, recorder):
+        self.serial = serial
+        self.recorder = recorder
+
+    OWN = ('serial', 'recorder')
+
+    def __getattr__(self, name):
+        return getattr(self.serial, name)
+
+    def __setattr__(self, name, value):
+        # port settings (timeout, baudrate, rtscts...) go to the port traced
+        if name in self.OWN:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.serial, name, value)
+
+    def read(self, size=1):
+        data = self.serial.read(size)
+        self.recorder.record(READ, data)
+        return data
+
+    def write(self, data):
+        result = self.serial.write(data)
+        self.recorder.record(WRITE, bytes(data))
+        return result
+
+    def close(self):
+        self.serial.close()
+        self.recorder.close()
+
+
+class ReplaySerial:
+    # serial port that answers from a trace: the modem data recorded after a write is
+    # available only once the same bytes are written again;
+    # realtime=True keeps the recorded delays, otherwise the data comes as fast as possible
+    def __init__(self, file, realtime=False, strict=True, timeout=None):
+        self.records = list(read_trace(file))
+        self.realtime = realtime
+        self.strict = strict  # raise TraceMismatch when written bytes differ from the trace
+        self.timeout = timeout
+        self._index = 0  # next record
+        self._data = b''  # unread part of the current READ record
+        self._written = bytearray()  # written bytes not matched to WRITE records yet
+        self._clock = (time.monotonic(), 0)  # (monotonic time, trace timestamp) of the last sync
+
+    @property
+    def in_waiting(self):
+        self._advance()
+        return len(self._data)
+
+    @property
+    def done(self):
+        return self._index >= len(self.records) and len(self._data) < 1
+
+    def _due(self, timestamp):
+        # (float) seconds until a record with timestamp is due
+        if not self.realtime:
+            return 0
+        now, trace_time = self._clock
+        return timestamp - trace_time - (time.monotonic() - now)
+
+    def _advance(self):
+        # move the next READ record into self._data when it's due
+        while len(self._data) < 1 and self._index < len(self.records):
+            timestamp, direction, data = self.records[self._index]
+            if direction != READ or self._due(timestamp) > 0:
+                return
+            self._data = data
+            self._index += 1
+
+    def read(self, size=1):
+        self._advance()
+        if len(self._data) < 1 and self._index < len(self.records):
+            # wait (up to the timeout) for a READ record recorded later
+            timestamp, direction, data = self.records[self._index]
+            if direction == READ:
+                wait = self._due(timestamp)
+                if self.timeout is not None:
+                    wait = min(wait, self.timeout)
+                if wait > 0:
+                    time.sleep(wait)
+
+        result = bytearray()
+        while len(result) < size:
+            self._advance()
+            if len(self._data) < 1:
+                break
+            part = self._data[:size - len(result)]
+            result += part
+            self._data = self._data[len(part):]
+        return bytes(result)
+
+    def write(self, data):
+        self._written += data
+        while self._index < len(self.records):
+            timestamp, direction, recorded = self.records[self._index]
+            if direction != WRITE or len(self._written) < len(recorded):
+                break
+            if self.strict and self._written[:len(recorded)] != recorded:
+                raise TraceMismatch('written {!r}, the trace has {!r}'.format(bytes(self._written), recorded))
+            del self._written[:len(recorded)]
+            self._index += 1
+            self._clock = (time.monotonic(), timestamp)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+# python -m sim800.trace <trace file>
+def main():
+    import sys
+
+    for timestamp, direction, data in read_trace(sys.argv[1]):
+        print('{:12.6f} {} {!r}'.format(timestamp, direction.decode('ascii'), data))
+
+
+if __name__ == '__main__':
+    main()
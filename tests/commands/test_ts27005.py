@@ -93,6 +93,12 @@ def test_send_sms_message_command_write():
 
     c = cmd.write(24, pdu="001100039199F90000FF10D4F29C0E9A36A7A076793E0F9FCB")
     assert bytes(c) == b'AT+CMGS=24\r001100039199F90000FF10D4F29C0E9A36A7A076793E0F9FCB\x1a'
+    assert c.header == b'AT+CMGS=24\r'
+    assert c.payload == b'001100039199F90000FF10D4F29C0E9A36A7A076793E0F9FCB\x1a'
+
+    r = c.parse_response([b'AT+CMGS=24\r', b'\r\n+CMGS: 12\r\n', b'\r\nOK\r\n'])
+    assert type(r) is SentMessageResult
+    assert r.mr == 12
 
 
 def test_write_sms_message_to_memory_command_write():
@@ -132,3 +138,26 @@ def test_cnd_sms_message_from_storage_command_write():
     with pytest.raises(ValueError):
         c = cmd.write(9,"+999","145")
 
+
+
+def test_more_messages_to_send_command_write():
+    cmd = MoreMessagesToSendCommand
+
+    c = cmd.write()
+    assert bytes(c) == b'AT+CMMS=0\r'
+
+    c = cmd.write(cmd.KEEP)
+    assert bytes(c) == b'AT+CMMS=2\r'
+
+    with pytest.raises(ValueError):
+        c = cmd.write(3)
+
+def test_new_message_acknowledgement_command():
+    cmd = NewMessageAcknowledgementCommand
+
+    assert bytes(cmd.execute()) == b'AT+CNMA\r'
+    assert bytes(cmd.write()) == b'AT+CNMA=1\r'
+    assert bytes(cmd.write(cmd.ERROR)) == b'AT+CNMA=2\r'
+
+    with pytest.raises(ValueError):
+        c = cmd.write(3)
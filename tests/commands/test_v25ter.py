@@ -0,0 +1,25 @@
+import pytest
+
+from sim800.commands.v25ter import (
+    SetEchoCommand, SetResultCodeFormatCommand, LocalDataFlowControlCommand, FixedLocalRateCommand,
+)
+
+
+def test_set_echo_command():
+    assert bytes(SetEchoCommand()) == b'ATE1\r'
+    assert bytes(SetEchoCommand(enabled=False)) == b'ATE0\r'
+
+def test_set_result_code_format_command():
+    assert bytes(SetResultCodeFormatCommand()) == b'ATV1\r'
+    assert bytes(SetResultCodeFormatCommand(verbose=False)) == b'ATV0\r'
+    assert SetResultCodeFormatCommand().parse_response([b'0\r']) is None
+
+def test_local_data_flow_control_command():
+    assert bytes(LocalDataFlowControlCommand.write(LocalDataFlowControlCommand.HARDWARE)) == b'AT+IFC=2,2\r'
+    with pytest.raises(ValueError):
+        LocalDataFlowControlCommand.write(3)
+
+def test_fixed_local_rate_command():
+    assert bytes(FixedLocalRateCommand.write(115200)) == b'AT+IPR=115200\r'
+    with pytest.raises(ValueError):
+        FixedLocalRateCommand.write(100000)
@@ -0,0 +1,9 @@
+import pytest
+
+from sim800.emulator import SIM800Emulator
+
+
+@pytest.fixture
+def emulator():
+    with SIM800Emulator() as e:
+        yield e
@@ -0,0 +1,42 @@
+import itertools
+
+from sim800.results.prefix import PrefixDispatcher
+
+
+def naive_match(prefixes, line):
+    s = line.strip()
+    for prefix in prefixes:
+        if s.startswith(prefix):
+            return prefix
+    return None
+
+
+def test_prefix_dispatcher_values():
+    d = PrefixDispatcher([(b'+CMT: ', 'cmt'), (b'+CMTI: ', 'cmti'), (b'OK', 'ok')])
+
+    assert d.match(b'\r\n+CMTI: "SM",1\r\n') == 'cmti'
+    assert d.match(b'\r\n+CMT: "+999","","24/10/18,10:00:00+32"\r\n') == 'cmt'
+    assert d.match(b'\r\nOK\r\n') == 'ok'
+    assert d.match(b'\r\nERROR\r\n') is None
+    assert d.match(b'') is None
+
+def test_prefix_dispatcher_first_value_wins():
+    d = PrefixDispatcher([(b'OK', 1), (b'OK', 2)])
+    assert d.match(b'OK\r\n') == 1
+
+def test_prefix_dispatcher_empty():
+    assert PrefixDispatcher([]).match(b'\r\nOK\r\n') is None
+    assert PrefixDispatcher.for_prefixes(['']).match(b'') is True
+
+def test_prefix_dispatcher_same_as_strip_startswith():
+    prefixes = [b'+CME ERROR: ', b'OK', b'+COPS: ', b'SIM', b'Revision:', b'']
+    lines = [
+        b'', b'\r\n', b'OK', b'\r\nOK\r\n', b' OK ', b'\r\n+CME ERROR: \r\n', b'\r\n+CME ERROR: 10\r\n',
+        b'+COPS: 0\r\n', b'\r\n+COPS:\r\n', b'\r\n+COPS: \r\n', b'SIMCOM_Ltd\r\n', b'Revision:1418B04\r\n',
+        b'AT+COPS?\r', b'\r\nERROR\r\n',
+    ]
+    for n in range(len(prefixes) + 1):
+        for subset in itertools.combinations(prefixes, n):
+            d = PrefixDispatcher.for_prefixes(subset)
+            for line in lines:
+                assert (d.match(line) is not None) == (naive_match(subset, line) is not None), (subset, line)
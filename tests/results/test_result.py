@@ -37,6 +37,20 @@ def test_executed_command_final_result_error():
     assert r.error == 'ERROR'
     assert repr(r) == '<ExecutedCommandFinalResult "ERROR">'
 
+def test_executed_command_final_result_numeric():
+    r = ExecutedCommandFinalResult(b'0\r')
+    assert r.success
+
+    r = ExecutedCommandFinalResult(b'4\r')
+    assert not r.success
+    assert r.error == 'ERROR'
+
+    assert ExecutedCommandFinalResult(b'1\r').success  # CONNECT
+    for code, error in [(b'3\r', 'NO CARRIER'), (b'6\r', 'NO DIALTONE'), (b'7\r', 'BUSY'), (b'8\r', 'NO ANSWER')]:
+        r = ExecutedCommandFinalResult(code)
+        assert not r.success
+        assert r.error == error
+
 def test_executed_command_final_result_cme():
     response = b'\r\n+CME ERROR: SIM not inserted\r\n'
     r = ExecutedCommandFinalResult.from_response(response)
@@ -51,6 +65,8 @@ def test_executed_command_final_result_cme_code():
 
     assert not r.success
     assert r.error == 'SIM not inserted'
+    assert r.cme_code == 10
+    assert r.cms_code is None
     assert repr(r) == '<ExecutedCommandFinalResult "+CME ERROR: 10">'
 
 def test_executed_command_final_result_cms():
@@ -67,6 +83,7 @@ def test_executed_command_final_result_cms_code():
 
     assert not r.success
     assert r.error == 'Unknown'
+    assert r.cms_code == 500
     assert repr(r) == '<ExecutedCommandFinalResult "+CMS ERROR: 500">'
 
 def test_combined_result():
@@ -0,0 +1,50 @@
+from sim800.results.ts27005 import split_params, ListedSMSMessageResult, ReadSMSMessageResult, SentMessageResult
+
+
+def test_split_params():
+    assert split_params('1,"REC READ","+999","","24/10/18,10:00:00+32"') == [
+        '1', 'REC READ', '+999', '', '24/10/18,10:00:00+32']
+    assert split_params('2,1,,24') == ['2', '1', '', '24']
+
+def test_listed_sms_message_result_text_mode():
+    r = ListedSMSMessageResult(b'\r\n+CMGL: 1,"REC READ","+8613912345678","","24/10/18,10:00:00+32",145,5\r\nHello\r\n')
+    assert not r.pdu_mode
+    assert r.index == 1
+    assert r.stat == 'REC READ'
+    assert r.address == '+8613912345678'
+    assert r.alpha is None
+    assert r.timestamp == '24/10/18,10:00:00+32'
+    assert r.length == 5
+    assert r.text == 'Hello'
+
+def test_listed_sms_message_result_pdu_mode():
+    r = ListedSMSMessageResult(b'\r\n+CMGL: 2,1,,3\r\n010203\r\n')
+    assert r.pdu_mode
+    assert r.index == 2
+    assert r.stat == 1
+    assert r.length == 3
+    assert r.pdu == '010203'
+    assert r.text is None
+
+def test_read_sms_message_result():
+    r = ReadSMSMessageResult(b'\r\n+CMGR: "REC UNREAD","+8613912345678","","24/10/18,10:00:00+32"\r\nHello\r\n')
+    assert not r.pdu_mode
+    assert r.index is None
+    assert r.stat == 'REC UNREAD'
+    assert r.address == '+8613912345678'
+    assert r.length is None
+    assert r.text == 'Hello'
+
+    r = ReadSMSMessageResult(b'\r\n+CMGR: 0,,3\r\n010203\r\n')
+    assert r.pdu_mode
+    assert r.stat == 0
+    assert r.pdu == '010203'
+
+def test_sent_message_result():
+    r = SentMessageResult(b'\r\n+CMGS: 42\r\n')
+    assert r.mr == 42
+    assert r.ack_pdu is None
+
+    r = SentMessageResult(b'\r\n+CMSS: 7,"0001"\r\n')
+    assert r.mr == 7
+    assert r.ack_pdu == '0001'
@@ -1,4 +1,4 @@
-from sim800.results.unsolicited import from_response, NewMessageResult
+from sim800.results.unsolicited import from_response, NewMessageResult, DeliveredMessageResult, StatusReportResult
 
 
 def test_no_unsolicited():
@@ -36,3 +36,39 @@ def test_cmti_mms():
     assert result.mms
     assert type(result.index) is int
 
+def test_cmt():
+    r = [
+        b'\r\n+CMT: "+8613912345678","","24/10/18,10:00:00+32"\r\nHello\r\n'
+    ]
+    results = from_response(r)
+    assert len(results) == 1
+
+    result = results[0]
+    assert type(result) is DeliveredMessageResult
+    assert not result.pdu_mode
+    assert result.address == '+8613912345678'
+    assert result.timestamp == '24/10/18,10:00:00+32'
+    assert result.text == 'Hello'
+    assert result.stat is None and result.index is None
+
+def test_cmt_pdu():
+    result = DeliveredMessageResult(b'\r\n+CMT: ,36\r\n07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07\r\n')
+    assert result.pdu_mode
+    assert result.length == 36
+    assert result.deliver.text == 'How are you?'
+
+def test_cds():
+    result = StatusReportResult(b'\r\n+CDS: 6,42,"+8613912345678",145,"24/10/18,10:00:00+32","24/10/18,10:00:05+32",0\r\n')
+    assert not result.pdu_mode
+    assert result.message_reference == 42
+    assert result.address == '+8613912345678'
+    assert result.delivered and result.final
+
+def test_cds_pdu():
+    result = StatusReportResult(b'\r\n+CDS: 25\r\n00062A0B911326880736F4428021510000804280215100058046\r\n')
+    assert result.pdu_mode
+    assert result.message_reference == 42
+    assert result.address == '+31628870634'
+    assert result.status == 0x46
+    assert not result.delivered and result.final
+    assert StatusReportResult(b'\r\n+CDS: 25\r\n0006\r\n').message_reference is None  # garbled
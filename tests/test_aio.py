@@ -0,0 +1,151 @@
+import asyncio
+import os
+
+import pytest
+import serial
+
+from sim800.aio import AsyncSIM800
+from sim800.manager import TimeoutException
+from sim800.commands.command import Command
+from sim800.results.result import Result
+import sim800.results.unsolicited as unsolicited
+
+
+def async_sim800(port):
+    s = AsyncSIM800(timeout=1)
+    s.serial = serial.Serial(port, timeout=0)
+    return s
+
+
+def reply_to_commands(master, responses):
+    # fake modem: echo every command line and write the next response
+    loop = asyncio.get_running_loop()
+    responses = list(responses)
+    received = bytearray()
+
+    def on_readable():
+        received.extend(os.read(master, 1024))
+        while b'\r' in received and len(responses) > 0:
+            i = received.index(b'\r') + 1
+            line = bytes(received[:i])
+            del received[:i]
+            os.write(master, line + responses.pop(0))
+
+    loop.add_reader(master, on_readable)
+    return lambda: loop.remove_reader(master)
+
+
+def test_async_sim800_send_command(pty_port):
+    master, port = pty_port
+
+    async def main():
+        stop = reply_to_commands(master, [b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n\r\nOK\r\n'])
+        async with async_sim800(port) as s:
+            f, r = await s.send_command(Command('+COPS?', ['+COPS: ']))
+        stop()
+        return f, r
+
+    f, r = asyncio.run(main())
+    assert f.success
+    assert type(r) is Result
+    assert r.raw_result == b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n'
+
+def test_async_sim800_send_command_timeout(pty_port):
+    master, port = pty_port
+
+    async def main():
+        async with async_sim800(port) as s:
+            await s.send_command(Command(''), timeout=0.2)
+
+    with pytest.raises(TimeoutException):
+        asyncio.run(main())
+
+def test_async_sim800_unsolicited(pty_port):
+    master, port = pty_port
+
+    async def main():
+        stop = reply_to_commands(master, [b'\r\n+CMTI: "SM",3\r\n\r\nOK\r\n'])
+        async with async_sim800(port) as s:
+            f, r = await s.send_command(Command(''))
+            os.write(master, b'\r\n+CMTI: "ME",4\r\n')
+
+            results = []
+            async for u in s:
+                results.append(u)
+                if len(results) == 2:
+                    break
+        stop()
+        return f, results
+
+    f, results = asyncio.run(main())
+    assert f.success
+    assert [type(u) for u in results] == [unsolicited.NewMessageResult] * 2
+    assert [(u.memory, u.index) for u in results] == [('SM', 3), ('ME', 4)]
+
+def test_async_sim800_many_ports():
+    import pty
+
+    ports = [pty.openpty() for _ in range(8)]
+
+    async def main():
+        stops = [reply_to_commands(master, [b'\r\nOK\r\n']) for master, slave in ports]
+        modems = [async_sim800(os.ttyname(slave)) for master, slave in ports]
+        for s in modems:
+            s.start()
+        results = await asyncio.gather(*[s.send_command(Command('')) for s in modems])
+        for s in modems:
+            s.close()
+        for stop in stops:
+            stop()
+        return results
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        for master, slave in ports:
+            os.close(master)
+            os.close(slave)
+    assert all(f.success for f, r in results)
+
+def test_async_sim800_on_unsolicited(pty_port):
+    master, port = pty_port
+
+    async def main():
+        results = []
+        async with async_sim800(port) as s:
+            s.on(unsolicited.NewMessageResult, results.append)
+            os.write(master, b'\r\n+CMTI: "SM",5\r\n')
+            with pytest.raises(TimeoutException):
+                await s.recv_unsolicited(timeout=0.3)
+        return results
+
+    results = asyncio.run(main())
+    assert [u.index for u in results] == [5]
+
+def test_async_sim800_send_command_after_prompt(pty_port):
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+
+    master, port = pty_port
+    received = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+
+        def on_readable():
+            data = os.read(master, 1024)
+            received.append(data)
+            if data.endswith(b'\r'):
+                os.write(master, data + b'\r\n> ')
+            elif data.endswith(b'\x1a'):
+                os.write(master, data + b'\r\n+CMGS: 12\r\n\r\nOK\r\n')
+
+        loop.add_reader(master, on_readable)
+        async with async_sim800(port) as s:
+            result = await s.send_command(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+        loop.remove_reader(master)
+        return result
+
+    f, r = asyncio.run(main())
+    assert received == [b'AT+CMGS="+999"\r', b'Test SMS message\x1a']
+    assert f.success
+    assert r.str_result == '+CMGS: 12'
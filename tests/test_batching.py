@@ -0,0 +1,115 @@
+from sim800.batching import CommandBatch, CommandQueue
+from sim800.commands.command import Command, CombinedCommand
+from sim800.commands.v25ter import ATCommand, SetResultCodeFormatCommand
+from sim800.commands.ts27005 import SendSMSMessageCommand
+from sim800.protocol import CommandTransaction, Response, FinalResult
+
+
+def test_command_queue_batch():
+    q = CommandQueue()
+    q.put(Command('+CSQ', ['+CSQ: ']))
+    q.put(Command('+CREG?', ['+CREG: ']))
+    q.put(Command('+CBC', ['+CBC: ']))
+
+    batch = q.take_batch()
+    assert len(batch) == 3
+    assert type(batch.command) is CombinedCommand
+    assert bytes(batch.command) == b'AT+CSQ;+CREG?;+CBC\r'
+    assert len(q) == 0
+    assert q.take_batch() is None
+
+def test_command_queue_not_combinable():
+    q = CommandQueue()
+    q.put(ATCommand())
+    q.put(Command('+CSQ', ['+CSQ: ']))
+    q.put(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+    q.put(Command('+CBC', ['+CBC: ']))
+
+    assert [bytes(q.take_batch().command) for _ in range(4)] == [
+        b'AT\r',
+        b'AT+CSQ\r',
+        b'AT+CMGS="+999"\rTest SMS message\x1a',
+        b'AT+CBC\r',
+    ]
+
+def test_command_queue_max_line_length():
+    q = CommandQueue(max_line_length=len(b'AT+CSQ;+CSQ\r'))
+    for _ in range(3):
+        q.put(Command('+CSQ', ['+CSQ: ']))
+
+    assert len(q.take_batch()) == 2
+    assert len(q.take_batch()) == 1
+
+def test_command_queue_cancelled():
+    q = CommandQueue()
+    f = q.put(Command('+CSQ', ['+CSQ: ']))
+    q.put(Command('+CBC', ['+CBC: ']))
+    f.cancel()
+
+    batch = q.take_batch()
+    assert bytes(batch.command) == b'AT+CBC\r'
+
+def test_command_batch_set_result():
+    q = CommandQueue()
+    csq = q.put(Command('+CSQ', ['+CSQ: ']))
+    cbc = q.put(Command('+CBC', ['+CBC: ']))
+    batch = q.take_batch()
+
+    transaction = CommandTransaction(batch.command)
+    transaction.receive(Response(b'\r\n+CSQ: 20,0\r\n'))
+    transaction.receive(Response(b'\r\n+CBC: 0,80,4000\r\n'))
+    transaction.receive(FinalResult(b'\r\nOK\r\n'))
+    batch.set_result(transaction)
+
+    f, r = csq.result(0)
+    assert f.success
+    assert r.str_result == '+CSQ: 20,0'
+    f, r = cbc.result(0)
+    assert f.success
+    assert r.str_result == '+CBC: 0,80,4000'
+
+def test_command_batch_partial_failure():
+    q = CommandQueue()
+    csq = q.put(Command('+CSQ', ['+CSQ: ']))
+    creg = q.put(Command('+CREG?', ['+CREG: ']))
+    cbc = q.put(Command('+CBC', ['+CBC: ']))
+    batch = q.take_batch()
+
+    # the modem stops at +CREG? and +CBC is never run
+    transaction = CommandTransaction(batch.command)
+    transaction.receive(Response(b'\r\n+CSQ: 20,0\r\n'))
+    transaction.receive(FinalResult(b'\r\nERROR\r\n'))
+    batch.set_result(transaction)
+
+    f, r = csq.result(0)
+    assert f.success
+    assert r.str_result == '+CSQ: 20,0'
+    assert not creg.done() and not cbc.done()
+    assert [bytes(q.take_batch().command) for _ in range(2)] == [b'AT+CREG?\r', b'AT+CBC\r']
+
+def test_command_batch_partial_failure_no_result():
+    q = CommandQueue()
+    cmgd = q.put(Command('+CMGD=1'))
+    csq = q.put(Command('+CSQ', ['+CSQ: ']))
+    cnmi = q.put(Command('+CNMI=2,1'))
+    creg = q.put(Command('+CREG?', ['+CREG: ']))
+    batch = q.take_batch()
+
+    # +CMGD=1 ran before +CSQ, it isn't sent again; +CNMI=2,1 or +CREG? failed
+    transaction = CommandTransaction(batch.command)
+    transaction.receive(Response(b'\r\n+CSQ: 20,0\r\n'))
+    transaction.receive(FinalResult(b'\r\nERROR\r\n'))
+    batch.set_result(transaction)
+
+    assert cmgd.result(0) == (CommandBatch.SUCCEEDED, None)
+    assert csq.result(0)[1].str_result == '+CSQ: 20,0'
+    assert not cnmi.done() and not creg.done()
+    assert [bytes(q.take_batch().command) for _ in range(2)] == [b'AT+CNMI=2,1\r', b'AT+CREG?\r']
+    assert q.take_batch() is None
+
+def test_command_queue_result_code_format_not_combinable():
+    q = CommandQueue()
+    q.put(SetResultCodeFormatCommand(verbose=False))
+    q.put(Command('+CSQ', ['+CSQ: ']))
+
+    assert len(q.take_batch()) == 1
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from benchmarks import suite
+
+TOLERANCE = 1  # the ratios move a little between machines, a hot path twice as slow doesn't
+# wall clock timing depends on the load of the machine: SIM800_BENCHMARKS=1 python -m pytest
+RUN = os.environ.get('SIM800_BENCHMARKS', '') not in ('', '0')
+
+
+def test_benchmarks_compare():
+    baseline = {'readline': 3.0, 'pdu_decode_deliver': 40.0}
+    results = {'readline': 3.5, 'pdu_decode_deliver': 60.0, 'pdu_encode_submit': 99.0}
+
+    assert suite.compare(results, baseline) == ['pdu_decode_deliver']
+    assert suite.compare(results, baseline, tolerance=1) == []
+
+def test_benchmarks_baseline_complete():
+    assert set(suite.load()['results']) == set(suite.BENCHMARKS)
+
+@pytest.mark.skipif(not RUN, reason='set SIM800_BENCHMARKS=1 to run the benchmarks')
+def test_benchmarks_baseline():
+    baseline = suite.load()
+    if baseline['python'] != suite.python_version():
+        pytest.skip('the baseline is of Python {}'.format(baseline['python']))
+
+    results = suite.run(repeat=3, scale=0.05)
+    assert suite.compare(results, baseline['results'], TOLERANCE) == []
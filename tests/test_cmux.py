@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from sim800.cmux import CMUX, Frame, FrameDecoder, FCS_TABLE, fcs, SABM, UA, UIH, PF
+from sim800.emulator import SIM800Emulator
+from sim800.manager import SIM800
+from sim800.commands.command import Command
+from sim800.commands.ts27007 import MultiplexerControlCommand
+from sim800.results.unsolicited import NewMessageResult
+
+
+def test_fcs_table():
+    assert FCS_TABLE[:8] == bytes([0x00, 0x91, 0xE3, 0x72, 0x07, 0x96, 0xE4, 0x75])
+    assert fcs(b'\x03\x3f\x01') == 0x1C
+
+def test_frame_bytes():
+    assert bytes(Frame(0, SABM | PF)) == b'\xf9\x03\x3f\x01\x1c\xf9'
+
+def test_frame_decoder():
+    frames = [Frame(0, UA | PF), Frame(1, UIH, b'AT\r'), Frame(2, UIH, b'x' * 200)]
+    data = b''.join(bytes(f) for f in frames)
+
+    d = FrameDecoder()
+    received = []
+    for i in range(0, len(data), 7):
+        received += d.feed(data[i:i + 7])
+    assert received == frames
+    assert d.errors == 0
+
+def test_frame_decoder_bad_fcs():
+    bad = bytearray(bytes(Frame(1, UIH, b'AT\r')))
+    bad[-2] ^= 0xFF
+
+    d = FrameDecoder()
+    assert d.feed(bytes(bad) + bytes(Frame(2, UIH, b'OK'))) == [Frame(2, UIH, b'OK')]
+    assert d.errors > 0
+
+def test_multiplexer_control_command():
+    assert bytes(MultiplexerControlCommand.write()) == b'AT+CMUX=0\r'
+    assert bytes(MultiplexerControlCommand.write(0, 0, None, 127)) == b'AT+CMUX=0,0,,127\r'
+    with pytest.raises(ValueError):
+        MultiplexerControlCommand.write(1)
+
+def test_cmux_channels():
+    with SIM800Emulator() as emulator:
+        s = SIM800(emulator.port, timeout=1)
+        mux = CMUX.enter(s)
+
+        sms = mux.manager(1, timeout=1)
+        status = mux.manager(2, timeout=1)
+        results = {}
+
+        def poll():
+            results['csq'] = [status.send_command(Command('+CSQ', ['+CSQ: ']))[1].str_result for i in range(10)]
+
+        thread = threading.Thread(target=poll)
+        thread.start()
+        results['cpms'] = [sms.send_command(Command('+CPMS?', ['+CPMS: ']))[0].success for i in range(10)]
+        thread.join()
+
+        emulator.receive_sms("+8613912345678", "Hello")
+        r = sms.recv_unsolicited()
+
+        mux.close()
+        f, _ = s.send_command(Command())
+        s.close()
+
+    assert results['csq'] == ['+CSQ: 20,0'] * 10
+    assert results['cpms'] == [True] * 10
+    assert type(r) is NewMessageResult
+    assert f.success
@@ -0,0 +1,131 @@
+from sim800.delivery import DeliveryReportIndex
+from sim800.manager import SIM800
+from sim800.metrics import Metrics
+from sim800.outbox import Outbox, OutboxScheduler
+from sim800.results.unsolicited import StatusReportResult
+
+
+def report(mr, status=0, address='+8613912345678'):
+    return StatusReportResult('\r\n+CDS: 6,{},"{}",145,"24/10/18,10:00:00+32","24/10/18,10:00:05+32",{}\r\n'.format(
+        mr, address, status).encode('ascii'))
+
+
+def test_delivery_report_index():
+    metrics = Metrics()
+    reported = []
+    index = DeliveryReportIndex(reported=reported.append, metrics=metrics)
+    assert index.add('+8613912345678', [7], key='a', now=100) == 'a'
+    index.add('+8613912345678', [8, 9], key='b', now=100)
+    assert len(index) == 3
+
+    d = index.match(report(7), now=112.5)
+    assert d.key == 'a'
+    assert d.delivered and d.final and d.complete
+    assert d.latency == 12.5
+    assert index.match(report(7), now=113) is None  # matched already
+
+    d = index.match(report(8, status=0x30), now=120)  # still trying
+    assert not d.final and not d.complete
+    d = index.match(report(9, address='13912345678'), now=121)  # national number
+    assert not d.complete
+    d = index.match(report(8, status=0x41), now=130)
+    assert d.complete and not d.delivered
+    assert len(index) == 0
+    assert len(reported) == 4
+
+    index.evict(now=200)  # the report of 7 waited for its part long enough
+    snapshot = metrics.snapshot()
+    assert snapshot['deliveries'] == {'delivered': 1, 'failed': 1, 'expired': 0, 'unmatched': 1}
+    assert snapshot['delivery_seconds']['count'] == 1
+    assert snapshot['delivery_seconds']['sum'] == 12.5
+
+def test_delivery_report_index_early_report():
+    reported = []
+    index = DeliveryReportIndex(reported=reported.append)
+    assert index.match(report(1), now=100) is None
+    assert index.match(report(2, address='+8613900000000'), now=100) is None
+    key = index.add('+8613912345678', [1, 3], now=101)
+
+    assert [(d.key, d.latency) for d in reported] == [(key, 0)]
+    assert index.match(report(3), now=105).complete
+    assert index.add('+8613900000000', [2], now=161) is not None
+    assert len(reported) == 2  # report of 2 is gone after EARLY_REPORT_WAIT
+
+def test_delivery_report_index_reused_reference():
+    index = DeliveryReportIndex()
+    first = index.add('+8613900000001', [1], now=100)
+    second = index.add('+8613900000002', [1], now=200)
+    third = index.add('+8613900000001', [1], now=300)
+
+    assert index.match(report(1, address='+8613900000001'), now=250).key == first  # third isn't sent yet
+    assert index.match(report(1, address='+8613900000002'), now=400).key == second
+
+    # the report of fourth got lost: the report after fifth is sent is of fifth
+    fourth = index.add('+8613900000001', [2], now=500)
+    fifth = index.add('+8613900000001', [2], now=600)
+    assert index.match(report(2, address='+8613900000001'), now=610).key == fifth
+    assert index.match(report(1, address='+8613900000001'), now=610).key == third
+    assert index.match(report(2, address='+8613900000001'), now=610).key == fourth
+
+def test_delivery_report_index_ttl():
+    metrics = Metrics()
+    expired = []
+    index = DeliveryReportIndex(ttl=60, expired=expired.append, metrics=metrics)
+    index.add('+8613912345678', [1, 2], key='a', now=100)
+    index.add('+8613912345678', [3], key='b', now=150)
+
+    assert index.evict(now=170) == ['a']
+    assert expired == ['a']
+    assert index.match(report(1), now=170) is None
+    assert index.match(report(3), now=170).complete
+    assert metrics.snapshot()['deliveries']['expired'] == 1
+
+def test_delivery_report_index_restart(tmp_path):
+    path = str(tmp_path / 'reports.db')
+    index = DeliveryReportIndex(path)
+    index.add('+8613912345678', [1], key=42, now=100)
+    index.add('+8613912345678', [2, 3], key='b', now=100)
+    index.match(report(2), now=110)
+    index.close()
+
+    index = DeliveryReportIndex(path)
+    assert len(index) == 2
+    assert index.match(report(1), now=120).key == 42
+    d = index.match(report(3), now=120)
+    assert d.key == 'b' and d.complete
+    assert index.add('+8613912345678', [4], now=130) > 3  # ids aren't reused
+    index.close()
+
+def test_delivery_report_index_restart_failed_part(tmp_path):
+    path = str(tmp_path / 'reports.db')
+    index = DeliveryReportIndex(path)
+    index.add('+8613912345678', [1, 2], key='a', now=100)
+    assert not index.match(report(1, status=0x41), now=110).complete
+    index.close()
+
+    index = DeliveryReportIndex(path)
+    d = index.match(report(2), now=120)
+    assert d.complete and d.delivered
+    assert not d.message_delivered  # part 1 failed before the restart
+    assert index.db.execute('SELECT COUNT(*) FROM failed').fetchone()[0] == 0
+    index.close()
+
+def test_delivery_report_index_outbox(tmp_path, emulator):
+    emulator.settings['+CNMI'] = '2,1,0,1,0'
+    outbox = Outbox(str(tmp_path / 'outbox.db'))
+    id = outbox.put('+8613912345678', 'x' * 200)
+    deliveries = []
+    index = DeliveryReportIndex(reported=deliveries.append)
+    s = SIM800(emulator.port, timeout=1)
+    s.on(StatusReportResult, index.match)
+    OutboxScheduler(outbox, s, reports=index).run()
+    # the report of the first part may come before the second part is sent
+    s.subscriptions.join()
+    while len(deliveries) < 2:
+        s.recv_unsolicited()
+        s.subscriptions.join()
+    s.close()
+    outbox.close()
+
+    assert [d.key for d in deliveries] == [id, id]
+    assert deliveries[-1].complete and deliveries[-1].delivered
@@ -0,0 +1,211 @@
+import time
+
+from sim800.emulator import SIM800Emulator
+from sim800.manager import SIM800
+from sim800.commands.command import Command, CombinedCommand
+from sim800.commands.ts27005 import (
+    SelectSMSMessageFormatCommand, SendSMSMessageCommand, ReadSMSMessageCommand, DeleteSMSMessageCommand,
+    ListSMSMessagesCommand,
+)
+from sim800.results.unsolicited import NewMessageResult, StatusReportResult
+
+
+def test_emulator_at(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    f, r = s.send_command(Command())
+    s.close()
+
+    assert f.success
+    assert r is None
+    assert emulator.commands == ['AT']
+
+def test_emulator_combined(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    f, r = s.send_command(CombinedCommand(Command('+CSQ', ['+CSQ: ']), Command('+CREG?', ['+CREG: '])))
+    s.close()
+
+    assert f.success
+    assert [x.str_result for x in r] == ['+CSQ: 20,0', '+CREG: 0,1']
+
+def test_emulator_error(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    f, r = s.send_command(ReadSMSMessageCommand.write(7))
+    s.close()
+
+    assert not f.success
+    assert f.str_result == '+CMS ERROR: 321'
+
+def test_emulator_send_sms(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    assert s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))[0].success
+    f, r = s.send_command(SendSMSMessageCommand.write("+8613912345678", text="Test SMS message"))
+    s.close()
+
+    assert f.success
+    assert r.str_result == '+CMGS: 1'
+    assert emulator.sent[0].address == "+8613912345678"
+    assert emulator.sent[0].text == "Test SMS message"
+
+def test_emulator_receive_sms(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+    emulator.receive_sms("+8613912345678", "Hello")
+
+    r = s.recv_unsolicited()
+    assert type(r) is NewMessageResult
+    assert r.index == 1
+
+    f, r = s.send_command(ReadSMSMessageCommand.write(r.index))
+    assert f.success
+    assert r.str_result.startswith('+CMGR: "REC UNREAD","+8613912345678"')
+    assert r.str_result.endswith('\r\nHello')
+
+    f, r = s.send_command(ListSMSMessagesCommand.write(ListSMSMessagesCommand.TEXT_MODE.ALL))
+    assert r.str_result.startswith('+CMGL: 1,"REC READ"')
+
+    assert s.send_command(DeleteSMSMessageCommand.write(1))[0].success
+    s.close()
+    assert emulator.storage['SM'] == {}
+
+def test_emulator_echo_off(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    s.send_command(Command('E0'))
+    s.serial.write(b'AT+CSQ\r')
+    assert s.serial.read(len(b'\r\n+CSQ: 20,0\r\n')) == b'\r\n+CSQ: 20,0\r\n'
+    s.close()
+
+def test_emulator_fast_mode(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    assert s.enable_fast_mode().success
+    assert not emulator.echo and not emulator.verbose
+
+    s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+    emulator.receive_sms("+8613912345678", "Hello")
+    assert s.recv_unsolicited().index == 1
+
+    f, r = s.send_command(CombinedCommand(Command('+CSQ', ['+CSQ: ']), ReadSMSMessageCommand.write(1)))
+    assert f.success
+    assert r[0].str_result == '+CSQ: 20,0'
+    assert r[1].str_result.endswith('\r\nHello')
+
+    f, r = s.send_command(ReadSMSMessageCommand.write(7))
+    assert f.str_result == '+CMS ERROR: 321'
+    s.close()
+
+def test_emulator_fast_mode_text_like_result(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    assert s.enable_fast_mode().success
+    s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+    emulator.receive_sms("+8613912345678", "OK")
+    emulator.receive_sms("+8613912345678", "ERROR")
+    s.recv_unsolicited()
+    s.recv_unsolicited()
+
+    for index, text in ((1, 'OK'), (2, 'ERROR')):
+        f, r = s.send_command(ReadSMSMessageCommand.write(index))
+        assert f.success
+        assert r.str_result.endswith('\r\n' + text)
+    assert s.send_command(Command('+CSQ', ['+CSQ: ']))[1].str_result == '+CSQ: 20,0'
+    s.close()
+
+def test_emulator_latency():
+    with SIM800Emulator(latency={'+CSQ': 0.2}) as emulator:
+        s = SIM800(emulator.port, timeout=1)
+        start = time.monotonic()
+        assert s.send_command(Command('+CSQ', ['+CSQ: ']))[0].success
+        assert time.monotonic() - start >= 0.2
+        s.close()
+
+def test_emulator_latency_beyond_serial_timeout():
+    # the command deadline, not the serial timeout, gives up on the reply
+    with SIM800Emulator(latency={'+CSQ': 1.2}) as emulator:
+        s = SIM800(emulator.port, timeout=0.5)
+        assert s.send_command(Command('+CSQ', ['+CSQ: ']), timeout=3)[0].success
+        s.close()
+
+def test_emulator_baudrate():
+    with SIM800Emulator(baudrate=9600) as emulator:
+        s = SIM800(emulator.port, timeout=1)
+        start = time.monotonic()
+        emulator.inject_unsolicited(['+CMTI: "SM",{}'.format(i) for i in range(20)])
+        assert time.monotonic() - start >= 20 * 16 * 10 / 9600
+        results = [s.recv_unsolicited() for i in range(20)]
+        s.close()
+    assert [r.index for r in results] == list(range(20))
+
+def test_emulator_negotiate_speed():
+    with SIM800Emulator(rate=115200, max_rate=230400) as emulator:
+        s = SIM800(emulator.port, baudrate=9600, timeout=1)
+        assert s.negotiate_speed() == 230400
+        assert s.serial.baudrate == 230400
+        assert s.serial.rtscts
+        assert emulator.rate == 230400
+        assert emulator.settings['+IFC'] == '2,2'
+        assert s.send_command(Command('+CSQ', ['+CSQ: ']))[1].str_result == '+CSQ: 20,0'
+        s.close()
+
+def test_emulator_iter_command_result(emulator):
+    for i in range(1, 31):
+        emulator.receive_sms("+8613912345678", "Message {}".format(i))
+    s = SIM800(emulator.port, timeout=1)
+    s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+
+    records = s.iter_command_result(ListSMSMessagesCommand.write(ListSMSMessagesCommand.TEXT_MODE.ALL))
+    assert [(r.index, r.text) for r in records] == [(i, "Message {}".format(i)) for i in range(1, 31)]
+
+    # closing early discards the rest of the response
+    records = s.iter_command_result(ListSMSMessagesCommand.write(ListSMSMessagesCommand.TEXT_MODE.ALL))
+    assert next(records).stat == 'REC READ'
+    records.close()
+    assert s.send_command(Command('+CSQ', ['+CSQ: ']))[1].str_result == '+CSQ: 20,0'
+    s.close()
+
+def test_emulator_send_long_sms(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    results = s.send_sms('+8613912345678', 'x' * 400)
+    s.close()
+
+    assert [f.success for f, r in results] == [True] * 3
+    assert [r.str_result for f, r in results] == ['+CMGS: 1', '+CMGS: 2', '+CMGS: 3']
+    assert emulator.sms_format == 0
+    # 8 bit reference 1, 3 parts, part numbers 1-3
+    assert [m.pdu[30:42] for m in emulator.sent] == ['050003010301', '050003010302', '050003010303']
+
+def test_emulator_status_report(emulator):
+    s = SIM800(emulator.port, timeout=1)
+    s.send_command(Command('+CNMI=2,1,0,1,0'))
+    results = s.send_sms('+8613912345678', 'Hello', status_report=True)
+    assert results[0][1].str_result == '+CMGS: 1'
+
+    r = s.recv_unsolicited()
+    assert type(r) is StatusReportResult
+    assert r.pdu_mode
+    assert r.message_reference == 1
+    assert r.address == '+8613912345678'
+    assert r.delivered
+    s.close()
+
+def test_emulator_send_sms_burst():
+    with SIM800Emulator(link_setup=0.2) as emulator:
+        emulator.rejected.add('+8613900000002')
+        s = SIM800(emulator.port, timeout=1)
+        messages = [('+861390000000{}'.format(i), 'Message {}'.format(i)) for i in range(5)]
+        messages.append(('+8613900000005', 'x' * 200))
+        report = s.send_sms_burst(messages)
+
+        assert report.link_kept
+        assert [o.success for o in report.outcomes] == [True, True, False, True, True, True]
+        assert report.outcomes[2].error == 'short message transfer rejected'
+        assert report.sent == 5 and report.failed == 1
+        assert report.parts == 6
+        assert report.seconds < 1  # the link is set up once
+        assert report.throughput > 5
+        assert [m.address for m in emulator.sent][:2] == ['+8613900000000', '+8613900000001']
+        assert emulator.settings['+CMMS'] == '0'
+
+        # without +CMMS every message sets up the link again
+        start = time.monotonic()
+        s.send_sms('+8613900000000', 'Message')
+        s.send_sms('+8613900000000', 'Message')
+        assert time.monotonic() - start >= 0.4
+        s.close()
@@ -0,0 +1,64 @@
+from sim800.framer import LineFramer
+
+
+def test_line_framer_lines():
+    f = LineFramer()
+    f.feed(b'AT+GSN\r\r\n862643039999994\r\n\r\nOK\r\n')
+
+    assert f.next_line() == b'AT+GSN\r'
+    assert f.next_line() == b'\r\n'
+    assert f.next_line() == b'862643039999994\r\n'
+    assert f.next_line() == b'\r\n'
+    assert f.next_line() == b'OK\r\n'
+    assert f.next_line() is None
+    assert len(f) == 0
+
+def test_line_framer_partial():
+    f = LineFramer()
+    f.feed(b'\r\n+COPS: 0,0,')
+    assert f.next_line() == b'\r\n'
+    assert f.next_line() is None
+
+    f.feed(b'"CHINA MOBILE"\r')
+    assert f.next_line() is None  # b'\n' might follow
+
+    f.feed(b'\n')
+    assert f.next_line() == b'+COPS: 0,0,"CHINA MOBILE"\r\n'
+
+def test_line_framer_trailing_cr_final():
+    f = LineFramer()
+    f.feed(b'AT\r')
+    assert f.next_line() is None
+    assert f.next_line(final=True) == b'AT\r'
+
+def test_line_framer_numeric_result_code():
+    f = LineFramer()
+    f.numeric = True
+    f.feed(b'+CSQ: 20,0\r\n0\r')
+    assert f.next_line() == b'+CSQ: 20,0\r\n'
+    assert f.next_line() == b'0\r'
+
+def test_line_framer_numeric_not_result_code():
+    f = LineFramer()
+    f.numeric = True
+    f.feed(b'AT\r')
+    assert f.next_line() is None
+
+def test_line_framer_flush():
+    f = LineFramer()
+    f.feed(b'\r\n> ')
+    assert f.next_line() == b'\r\n'
+    assert f.peek() == b'> '
+    assert f.flush() == b'> '
+    assert f.flush() == b''
+
+def test_line_framer_compact():
+    f = LineFramer()
+    f.feed(b'\r')
+    for _ in range(1000):
+        f.feed(b'\n+CSQ: 20,0\r\n\r')
+        assert f.next_line() == b'\r\n'
+        assert f.next_line() == b'+CSQ: 20,0\r\n'
+        assert f.next_line() is None
+    assert len(f) == 1
+    assert len(f._buffer) < 2 * LineFramer.COMPACT_THRESHOLD
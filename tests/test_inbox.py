@@ -0,0 +1,74 @@
+import pytest
+
+from sim800.inbox import InboxSync
+from sim800.manager import SIM800
+from sim800.threaded import ThreadedSIM800
+
+
+@pytest.mark.parametrize('manager_class', [SIM800, ThreadedSIM800])
+def test_inbox_sync(emulator, manager_class):
+    emulator.sms_format = 1
+    emulator.receive_sms('+8613900000001', 'before start 1')
+    emulator.receive_sms('+8613900000002', 'before start 2')  # their +CMTI are waiting on the port
+
+    s = manager_class(emulator.port, timeout=0.5)
+    if manager_class is ThreadedSIM800:
+        s.start()
+    messages = []
+    inbox = InboxSync(s, messages.append)
+    inbox.start()
+    inbox.sync()
+    assert [(m.index, m.text) for m in messages] == [(1, 'before start 1'), (2, 'before start 2')]
+    assert inbox.listed == 2
+    assert emulator.storage['SM'] == {}
+
+    emulator.receive_sms('+8613900000003', 'new')
+    emulator.receive_sms('+8613900000004', 'newer')
+    inbox.run()
+    s.close()
+
+    assert [m.text for m in messages[2:]] == ['new', 'newer']
+    assert messages[2].address == '+8613900000003'
+    assert messages[2].memory == 'SM'
+    assert inbox.received == 4
+    assert emulator.storage['SM'] == {}
+    # only the new messages are read, the storage is listed once
+    assert len([c for c in emulator.commands if '+CMGL' in c]) == 1
+    assert len([c for c in emulator.commands if '+CMGR' in c]) == 2
+
+def test_inbox_handler_error(emulator):
+    emulator.sms_format = 1
+    s = SIM800(emulator.port, timeout=0.5)
+    inbox = InboxSync(s, lambda message: 1 / 0)
+    inbox.start()
+
+    emulator.receive_sms('+8613900000001', 'kept')
+    with pytest.raises(ZeroDivisionError):
+        inbox.run()
+    s.close()
+    assert len(emulator.storage['SM']) == 1  # found again by the next reconcile()
+
+@pytest.mark.parametrize('sms_format', [0, 1])
+def test_inbox_direct_delivery(emulator, sms_format):
+    emulator.sms_format = sms_format
+    emulator.settings['+CNMI'] = '2,2,0,0,0'
+    emulator.settings['+CSMS'] = '1'
+    s = SIM800(emulator.port, timeout=0.5)
+    messages = []
+    inbox = InboxSync(s, messages.append, acknowledge=True)
+    inbox.start()
+
+    deliver = '07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07'
+    emulator.receive_sms('+31641600986', 'How are you?', pdu=deliver)
+    inbox.run()
+    s.close()
+
+    assert len(messages) == 1
+    assert messages[0].index is None
+    if sms_format == 0:
+        assert messages[0].deliver.text == 'How are you?'
+    else:
+        assert messages[0].text == 'How are you?'
+    assert emulator.unacknowledged == 0
+    # no storage round trip
+    assert not any('+CMGR' in c or '+CMGD' in c for c in emulator.commands)
@@ -1,5 +1,6 @@
 import pytest
 
+import time
 import serial
 from sim800.manager import SIM800, TimeoutException
 from sim800.commands.command import Command
@@ -132,3 +133,153 @@ def test_sim800_recv_unsolicited_timeout():
     with pytest.raises(TimeoutException):
         u = sim800.recv_unsolicited()
 
+def test_sim800_timeout_port_returning_at_once(sim800):
+    # a read with no data that doesn't block is a timeout, not a busy loop until the deadline
+    start = time.monotonic()
+    with pytest.raises(TimeoutException):
+        sim800.send_command(Command(), timeout=5)
+    assert time.monotonic() - start < 1
+
+
+def test_sim800_readline_trailing_cr(sim800):
+    s = sim800
+    s.serial.write(b'AT\r')
+    s.serial.seek(0)
+
+    assert s.readline() == b'AT\r'
+    with pytest.raises(TimeoutException):
+        s.readline()
+
+def test_sim800_readline_bulk_reads(sim800):
+    data = b'\r\n+CSQ: 20,0\r\n\r\nOK\r\n' * 10
+
+    s = sim800
+    s.serial.write(data)
+    s.serial.seek(0)
+
+    reads = []
+    read = s.serial.read
+    def counting_read(*args):
+        b = read(*args)
+        reads.append(b)
+        return b
+    s.serial.read = counting_read
+
+    lines = [s.readline() for _ in range(40)]
+    assert b''.join(lines) == data
+    assert len(reads) == 1
+
+def test_sim800_on_unsolicited(sim800):
+    results = []
+    sim800.on(unsolicited.NewMessageResult, results.append)
+
+    sim800.serial.write(b'\r\n+CMTI: "ME",1\r\n')
+    sim800.serial.after_next_write(b'\r\nOK\r\n')
+    f, r = sim800.send_command(Command(''))
+    sim800.subscriptions.join()
+
+    assert f.success
+    assert len(results) == 1
+    assert results[0].index == 1
+    assert len(sim800.unsolicited) == 0
+
+def test_sim800_send_command_adaptive_timeout():
+    import time
+    from sim800.commands.v25ter import ATCommand
+
+    sim800 = SIM800(timeout=3)
+    sim800.serial = serial.serial_for_url('loop://', timeout=3)
+    for _ in range(5):
+        sim800.latency.observe(ATCommand(), 0.01)
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutException):
+        sim800.send_command(ATCommand())
+    assert time.monotonic() - start < 1
+
+def test_sim800_run_queue(sim800):
+    sim800.serial.after_next_write(b'\r\n+CSQ: 20,0\r\n\r\n+CBC: 0,80,4000\r\n\r\nOK\r\n')
+    csq = sim800.submit(Command('+CSQ', ['+CSQ: ']))
+    cbc = sim800.submit(Command('+CBC', ['+CBC: ']))
+    assert not csq.done()
+
+    sim800.run_queue()
+
+    assert sim800.serial.getvalue().startswith(b'AT+CSQ;+CBC\r')
+    assert csq.result(0)[1].str_result == '+CSQ: 20,0'
+    assert cbc.result(0)[1].str_result == '+CBC: 0,80,4000'
+
+def test_sim800_send_command_after_prompt(pty_port, fake_modem):
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n> ', b'\r\n+CMGS: 12\r\n\r\nOK\r\n'])
+    modem.start()
+
+    sim800 = SIM800(port, timeout=1)
+    f, r = sim800.send_command(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+    sim800.close()
+
+    assert modem.commands == [b'AT+CMGS="+999"\r', b'Test SMS message\x1a']
+    assert f.success
+    assert r.str_result == '+CMGS: 12'
+
+def test_sim800_send_command_no_prompt(pty_port, fake_modem):
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+CMS ERROR: 500\r\n'])
+    modem.start()
+
+    sim800 = SIM800(port, timeout=1)
+    f, r = sim800.send_command(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+    sim800.close()
+
+    assert modem.commands == [b'AT+CMGS="+999"\r']
+    assert not f.success
+    assert r is None
+
+def test_sim800_send_command_prompt_timeout(pty_port):
+    import os
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+
+    master, port = pty_port
+    sim800 = SIM800(port, timeout=1)
+    sim800.PROMPT_TIMEOUT = 0.2
+    with pytest.raises(TimeoutException):
+        sim800.send_command(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+    sim800.close()
+
+    written = b''
+    while len(written) < len(b'AT+CMGS="+999"\r\x1b'):
+        written += os.read(master, 1024)  # the pty may return each write separately
+    assert written == b'AT+CMGS="+999"\r\x1b'
+
+def test_sim800_send_sms_part_timeout(sim800):
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+    from sim800.results.result import ExecutedCommandFinalResult
+    from sim800.results.ts27005 import SentMessageResult
+
+    parts = []
+
+    def send_command(command, recv_result=True, timeout=None):
+        # the second part of every message times out
+        if isinstance(command, SendSMSMessageCommand):
+            parts.append(command)
+            if len(parts) % 2 == 0:
+                raise TimeoutException('no final result')
+            return ExecutedCommandFinalResult(b'\r\nOK\r\n'), SentMessageResult(b'\r\n+CMGS: 7\r\n')
+        return ExecutedCommandFinalResult(b'\r\nOK\r\n'), None
+    sim800.send_command = send_command
+
+    report = sim800.send_sms_burst([('+123', 'x' * 200), ('+123', 'short')])
+    long, short = report.outcomes
+    assert long.error.startswith('timeout')
+    assert [r.mr for f, r in long.results] == [7]  # the part accepted isn't lost
+    assert short.success
+    assert report.parts == 2
+
+    parts.clear()
+    with pytest.raises(TimeoutException) as e:
+        sim800.send_sms('+123', 'x' * 200)
+    assert [r.mr for f, r in e.value.results] == [7]
@@ -0,0 +1,117 @@
+import pytest
+
+from sim800.metrics import Histogram, Metrics
+from sim800.commands.command import Command
+from sim800.commands.ts27005 import ReadSMSMessageCommand
+from sim800.emulator import SIM800Emulator
+from sim800.manager import SIM800, TimeoutException
+from sim800.protocol import Echo, Response, Unsolicited
+
+
+def test_histogram():
+    h = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 2):
+        h.observe(value)
+
+    assert h.count == 4
+    assert h.sum == 2.65
+    assert h.cumulative() == [(0.1, 2), (1, 3), (float('inf'), 4)]
+
+def test_metrics_command():
+    m = Metrics()
+    m.command_written(Command())
+    m.sent(3)
+    m.unsolicited_received()
+    m.received(5)
+    m.events_received([Echo(b'AT\r'), Unsolicited(b'+CMTI: "SM",1', None)])
+    assert m.snapshot()['first_response_seconds'] == {}
+    m.received(5)
+    m.events_received([Response(b'+CSQ: 20,0')])
+    m.events_received([Response(b'+CSQ: 20,0')])
+    m.command_completed()
+    m.unsolicited_received()
+
+    snapshot = m.snapshot()
+    assert snapshot['bytes_sent'] == 3
+    assert snapshot['bytes_received'] == 10
+    assert snapshot['unsolicited'] == 2
+    assert snapshot['unsolicited_mid_command'] == 1
+    assert snapshot['first_response_seconds']['Command']['count'] == 1
+    assert snapshot['final_result_seconds']['Command']['count'] == 1
+
+def test_metrics_timeout():
+    m = Metrics()
+    m.command_written(ReadSMSMessageCommand.write(1))
+    m.command_timed_out()
+    m.command_completed()  # nothing in flight
+
+    assert m.snapshot()['timeouts'] == {'ReadSMSMessageCommand': 1}
+    assert m.snapshot()['final_result_seconds'] == {}
+
+def test_metrics_prometheus():
+    m = Metrics(buckets=[1])
+    m.command_written(Command())
+    m.command_completed()
+    m.set_queue_depth(2)
+
+    text = m.prometheus()
+    assert '# TYPE sim800_queue_depth gauge\nsim800_queue_depth 2\n' in text
+    assert 'sim800_command_final_result_seconds_bucket{command="Command",le="1.0"} 1\n' in text
+    assert 'sim800_command_final_result_seconds_bucket{command="Command",le="+Inf"} 1\n' in text
+    assert 'sim800_command_final_result_seconds_count{command="Command"} 1\n' in text
+
+def test_metrics_delivery():
+    m = Metrics()
+    m.delivery_reported(42, True)
+    m.delivery_reported(7, False)
+    m.delivery_expired()
+    m.delivery_unmatched()
+
+    assert m.snapshot()['deliveries'] == {'delivered': 1, 'failed': 1, 'expired': 1, 'unmatched': 1}
+    text = m.prometheus()
+    assert 'sim800_deliveries_total{outcome="failed"} 1\n' in text
+    assert 'sim800_delivery_seconds_bucket{le="60.0"} 1\n' in text
+    assert 'sim800_delivery_seconds_bucket{le="30.0"} 0\n' in text
+    assert 'sim800_delivery_seconds_sum 42\n' in text
+
+def test_sim800_metrics(sim800):
+    s = sim800
+    s.metrics = Metrics()
+    s.serial.after_next_write(b'\r\n+CMTI: "SM",1\r\n\r\n+CSQ: 20,0\r\n\r\nOK\r\n')
+
+    f, r = s.send_command(Command('+CSQ', ['+CSQ: ']))
+
+    snapshot = s.metrics.snapshot()
+    assert f.success
+    assert snapshot['bytes_sent'] == len(b'AT+CSQ\r')
+    assert snapshot['bytes_received'] == len(b'AT+CSQ\r\r\n+CMTI: "SM",1\r\n\r\n+CSQ: 20,0\r\n\r\nOK\r\n')
+    assert snapshot['unsolicited_mid_command'] == 1
+    assert snapshot['final_result_seconds']['Command']['count'] == 1
+
+def test_sim800_metrics_queue_depth(sim800):
+    s = sim800
+    s.metrics = Metrics()
+    s.submit(Command('+CSQ', ['+CSQ: ']))
+    s.submit(Command('+CBC', ['+CBC: ']))
+
+    assert s.metrics.snapshot()['queue_depth'] == 2
+
+def test_sim800_metrics_timeout():
+    with SIM800Emulator(latency={'+CSQ': 0.5}) as emulator:
+        metrics = Metrics()
+        s = SIM800(emulator.port, timeout=0.2, metrics=metrics)
+        with pytest.raises(TimeoutException):
+            s.send_command(Command('+CSQ', ['+CSQ: ']))
+        s.close()
+
+    assert metrics.snapshot()['timeouts'] == {'Command': 1}
+
+def test_sim800_metrics_first_response():
+    # the echo comes at once, the first response after the latency
+    with SIM800Emulator(latency={'+CSQ': 0.3}) as emulator:
+        metrics = Metrics()
+        s = SIM800(emulator.port, timeout=1, metrics=metrics)
+        assert s.send_command(Command('+CSQ', ['+CSQ: ']))[0].success
+        s.close()
+
+    assert metrics.snapshot()['first_response_seconds']['Command']['sum'] >= 0.3
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from sim800.manager import SIM800
+from sim800.outbox import Outbox, OutboxScheduler
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    o = Outbox(str(tmp_path / 'outbox.db'))
+    yield o
+    o.close()
+
+
+def test_outbox_take(outbox):
+    ids = outbox.put_many([('+123', 'one'), ('+456', 'two')])
+    assert outbox.take() == (ids[0], '+123', 'one', 0)
+    assert outbox.take() == (ids[1], '+456', 'two', 0)
+    assert outbox.take() is None
+
+    outbox.mark_sent(ids[0], [7])
+    outbox.mark_failed(ids[1], 'rejected')
+    assert outbox.get(ids[0])['message_references'] == '7'
+    assert outbox.get(ids[1])['error'] == 'rejected'
+    assert outbox.counts() == {'queued': 0, 'sending': 0, 'sent': 1, 'failed': 1, 'unknown': 0}
+
+def test_outbox_not_before(outbox):
+    id = outbox.put('+123', 'later', not_before=2000)
+    assert outbox.take(now=1000) is None
+    assert outbox.next_due() == 2000
+    assert outbox.take(now=2000)[0] == id
+    assert outbox.next_due() is None
+
+def test_outbox_restart(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path)
+    sending, queued = outbox.put_many([('+123', 'one'), ('+123', 'two')])
+    outbox.take()
+    outbox.close()  # e.g. killed while the modem sends the first message
+
+    outbox = Outbox(path)
+    assert outbox.get(sending)['state'] == Outbox.SENDING  # another process may be sending it
+    assert outbox.recover() == 1
+    assert outbox.get(sending)['state'] == Outbox.UNKNOWN
+    assert outbox.take()[0] == queued  # not sent twice
+    assert outbox.requeue(Outbox.UNKNOWN) == 1
+    assert outbox.take()[0] == sending
+    outbox.close()
+
+def test_outbox_many(outbox):
+    outbox.put_many(('+123', 'message {}'.format(i)) for i in range(20000))
+    assert outbox.counts()['queued'] == 20000
+    assert outbox.take()[2] == 'message 0'
+
+def test_outbox_scheduler_rate(outbox, emulator):
+    s = SIM800(emulator.port, timeout=1)
+    outbox.put_many([('+123', 'message {}'.format(i)) for i in range(4)] + [('+123', 'x' * 200)])
+    scheduler = OutboxScheduler(outbox, s, rate=3)
+
+    assert [scheduler.run_once() for i in range(3)] == [0, 0, 0]
+    assert 59 < scheduler.run_once() <= 60
+    assert len(emulator.sent) == 3
+    assert outbox.counts()['sent'] == 3
+
+    # a minute later
+    scheduler._sent = type(scheduler._sent)(t - 60 for t in scheduler._sent)
+    assert [scheduler.run_once() for i in range(3)] == [0, 0, None]
+    assert len(emulator.sent) == 6  # the long message has 2 parts
+    assert outbox.counts()['sent'] == 5
+    s.close()
+
+def test_outbox_scheduler_rate_restart(outbox, emulator):
+    s = SIM800(emulator.port, timeout=1)
+    outbox.put_many([('+123', 'message {}'.format(i)) for i in range(3)])
+    assert OutboxScheduler(outbox, s, rate=2).run_once() == 0
+    assert OutboxScheduler(outbox, s, rate=2).run_once() == 0
+
+    # a new scheduler of the same SIM knows the SMS sent, another SIM has a cap of its own
+    assert 59 < OutboxScheduler(outbox, s, rate=2).run_once() <= 60
+    assert OutboxScheduler(outbox, s, rate=2, sim='other').run_once() == 0
+    s.close()
+
+def test_outbox_scheduler_rate_parts(outbox):
+    # the 2 parts of a long message don't fit next to a short one in a cap of 2
+    scheduler = OutboxScheduler(outbox, None, rate=2)
+    scheduler._sent.append(time.time())
+    id = outbox.put('+123', 'x' * 200)
+    assert 59 < scheduler.run_once() <= 60
+    assert outbox.get(id)['state'] == Outbox.QUEUED
+    assert outbox.get(id)['attempts'] == 0
+
+def test_outbox_scheduler_part_timeout(outbox):
+    from sim800.delivery import DeliveryReportIndex
+    from sim800.manager import TimeoutException
+    from sim800.results.result import ExecutedCommandFinalResult
+    from sim800.results.ts27005 import SentMessageResult
+
+    class Manager:
+        # the first part is accepted, the second one times out
+        def send_sms(self, address, text, status_report=False):
+            e = TimeoutException('no final result')
+            e.results = [(ExecutedCommandFinalResult(b'\r\nOK\r\n'), SentMessageResult(b'\r\n+CMGS: 7\r\n'))]
+            raise e
+
+    reports = DeliveryReportIndex()
+    id = outbox.put('+123', 'x' * 200)
+    scheduler = OutboxScheduler(outbox, Manager(), reports=reports, sim='sim')
+    assert scheduler.run_once() == 0
+
+    message = outbox.get(id)
+    assert message['state'] == Outbox.UNKNOWN
+    assert message['message_references'] == '7'
+    assert len(scheduler._sent) == 1
+    assert len(outbox.sends('sim', 0)) == 1
+    assert len(reports) == 1
+
+def test_outbox_scheduler_errors(outbox, emulator):
+    s = SIM800(emulator.port, timeout=1)
+    emulator.send_errors = [42, 42]
+    emulator.rejected.add('+456')
+    scheduler = OutboxScheduler(outbox, s, retries=1, retry_delay=0)
+    transient = outbox.put('+123', 'congestion')
+    scheduler.run()
+    permanent = outbox.put('+456', 'rejected')
+    scheduler.run()
+    s.close()
+
+    assert outbox.get(transient)['state'] == Outbox.FAILED
+    assert outbox.get(transient)['attempts'] == 2
+    assert outbox.get(transient)['error'] == 'congestion'
+    assert outbox.get(permanent)['state'] == Outbox.FAILED
+    assert outbox.get(permanent)['attempts'] == 1
+    assert emulator.send_errors == []
+
+def test_outbox_scheduler_retry(outbox, emulator):
+    s = SIM800(emulator.port, timeout=1)
+    emulator.send_errors = [500]
+    id = outbox.put('+123', 'retried')
+    scheduler = OutboxScheduler(outbox, s, retry_delay=0)
+    scheduler.run()
+    s.close()
+
+    message = outbox.get(id)
+    assert message['state'] == Outbox.SENT
+    assert message['attempts'] == 2
+    assert message['message_references'] == '1'
@@ -0,0 +1,143 @@
+import datetime
+
+import pytest
+
+from sim800 import pdu
+
+
+def test_gsm7_septets():
+    assert pdu.gsm7_septets('Hello @£') == b'Hello \x00\x01'
+    assert pdu.gsm7_septets('{€}') == b'\x1b\x28\x1b\x65\x1b\x29'
+    assert pdu.gsm7_septets('`') is None
+    assert pdu.gsm7_septets('Привет') is None
+
+def test_septets_to_text():
+    assert pdu.septets_to_text(b'Hello \x00\x01') == 'Hello @£'
+    assert pdu.septets_to_text(b'\x1b\x28\x1b\x65\x1b\x29') == '{€}'
+    assert pdu.septets_to_text(b'\x1bA') == 'A'  # unknown extension character
+
+@pytest.mark.parametrize('count', [0, 1, 7, 8, 9, 15, 16, 17, 153, 160])
+@pytest.mark.parametrize('padding', [0, 1, 6])
+def test_pack_unpack_septets(count, padding):
+    septets = bytes((i * 37) % 128 for i in range(count))
+    packed = pdu.pack_septets(septets, padding)
+    assert len(packed) == (count * 7 + padding + 7) // 8
+    assert pdu.unpack_septets(packed, count, padding) == septets
+
+def test_pack_septets():
+    assert pdu.pack_septets(pdu.gsm7_septets('hellohello')).hex().upper() == 'E8329BFD4697D9EC37'
+
+def test_encoded_length():
+    assert pdu.encoded_length('Hello [x]') == (pdu.GSM7, 11)
+    assert pdu.encoded_length('Привет') == (pdu.UCS2, 12)
+    with pytest.raises(ValueError):
+        pdu.encoded_length('Привет', pdu.GSM7)
+
+def test_encode_validity():
+    assert pdu.encode_validity(5 * 60) == 0
+    assert pdu.encode_validity(12 * 3600) == 143
+    assert pdu.encode_validity(24 * 3600) == 167
+    assert pdu.encode_validity(4 * 24 * 3600) == 170
+    assert pdu.encode_validity(9 * 7 * 24 * 3600) == 201
+    assert pdu.encode_validity(63 * 7 * 24 * 3600) == 255
+
+def test_encode_submit():
+    assert pdu.encode_submit('+46708251358', 'hellohello', validity=4 * 24 * 3600) == (
+        '0011000B916407281553F80000AA0AE8329BFD4697D9EC37', 23)
+
+def test_encode_submit_ucs2():
+    p, length = pdu.encode_submit('+46708251358', 'Привет', reference=5, status_report=True, smsc='+31624000000')
+    assert p == '07911326040000F0' + '2105' + '0B916407281553F8' + '0008' + '0C041F04400438043204350442'
+    assert length == len(p) // 2 - 8
+
+def test_encode_submit_udh():
+    p, length = pdu.encode_submit('123', 'hi', udh=pdu.concat_header(7, 2, 1))
+    # 6 octets of header, 1 fill bit, the text from the 8th septet on
+    assert p == '00' + '4100' + '038121F3' + '0000' + '09' + '050003070201D069'
+    assert length == len(p) // 2 - 1
+
+def test_encode_submit_too_long():
+    pdu.encode_submit('123', 'x' * 160)
+    with pytest.raises(ValueError):
+        pdu.encode_submit('123', 'x' * 161)
+    with pytest.raises(ValueError):
+        pdu.encode_submit('123', 'ж' * 71)
+    with pytest.raises(ValueError):
+        pdu.encode_submit('12a', 'x')
+
+def test_encode_submits():
+    messages = [('+8613912345678', 'Message {}'.format(i)) for i in range(100)] + [('123', 'hi', b'\x00\x03\x07\x02\x01')]
+    encoded = pdu.encode_submits(messages, validity=3600)
+    assert len(encoded) == 101
+    assert encoded[5] == pdu.encode_submit('+8613912345678', 'Message 5', validity=3600)
+    assert encoded[100] == pdu.encode_submit('123', 'hi', validity=3600, udh=b'\x00\x03\x07\x02\x01')
+
+def test_decode_deliver():
+    d = pdu.decode_deliver('07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07')
+    assert d.smsc == '+31624000000'
+    assert d.address == '+31641600986'
+    assert d.address_type == pdu.INTERNATIONAL
+    assert d.encoding == pdu.GSM7
+    assert d.text == 'How are you?'
+    assert d.timestamp.replace(tzinfo=None) == datetime.datetime(2002, 8, 26, 19, 37, 41)
+    assert d.udh == []
+    assert d.concat is None
+    assert not d.more_messages
+
+def test_decode_deliver_ucs2_concat_alphanumeric():
+    # from "Test", +02:00, part 2 of 3 of the message 0x1234
+    d = pdu.Deliver('00' + '44' + '08D0D4F29C0E' + '0008' + '42802151000080' + '13'
+                    + '06080412340302' + '041F04400438043204350442')
+    assert d.smsc is None
+    assert d.address == 'Test'
+    assert d.text == 'Привет'
+    assert d.timestamp == datetime.datetime(2024, 8, 12, 15, 0, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert d.concat == (0x1234, 3, 2)
+
+def test_decode_deliver_not_deliver():
+    with pytest.raises(ValueError):
+        pdu.Deliver('0011000B916407281553F80000AA0AE8329BFD4697D9EC37')
+
+def test_status_report():
+    r = pdu.StatusReport('00' + '062A' + '0B911326880736F4' + '42802151000080' + '42802151000580' + '00')
+    assert r.message_reference == 42
+    assert r.address == '+31628870634'
+    assert r.timestamp == datetime.datetime(2024, 8, 12, 15, 0, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert r.discharge_time.second == 50
+    assert r.delivered and r.final
+
+    r = pdu.StatusReport('00' + '062A' + '0B911326880736F4' + '42802151000080' + '42802151000580' + '30')
+    assert not r.delivered and not r.final  # still trying
+    with pytest.raises(ValueError):
+        pdu.StatusReport('07911326040000F0040B911346610089F60000208062917314080CC8F71D14969741F977FD07')
+
+def test_encode_timestamp():
+    t = datetime.datetime(2024, 8, 12, 15, 0, 50, tzinfo=datetime.timezone(datetime.timedelta(hours=-3)))
+    assert pdu.encode_timestamp(t).hex().upper() == '42802151000529'
+    assert pdu.decode_timestamp(pdu.encode_timestamp(t)) == t
+
+def test_split_text():
+    assert pdu.split_text('x' * 160) == (pdu.GSM7, ['x' * 160])
+    assert pdu.split_text('x' * 400) == (pdu.GSM7, ['x' * 153, 'x' * 153, 'x' * 94])
+    assert pdu.split_text('ж' * 200) == (pdu.UCS2, ['ж' * 67, 'ж' * 67, 'ж' * 66])
+
+def test_split_text_keeps_characters_whole():
+    # an escaped character takes 2 septets, a character out of the BMP 4 octets
+    encoding, parts = pdu.split_text('x' * 152 + '€' * 5)
+    assert parts == ['x' * 152, '€' * 5]
+    encoding, parts = pdu.split_text('ж' * 60 + '\U0001F600' * 20)
+    assert parts == ['ж' * 60 + '\U0001F600' * 3, '\U0001F600' * 17]
+
+def test_encode_sms():
+    assert pdu.encode_sms('+46708251358', 'hellohello') == [pdu.encode_submit('+46708251358', 'hellohello')]
+
+    parts = pdu.encode_sms('123', 'x' * 170, 9)
+    assert len(parts) == 2
+    assert parts[0] == pdu.encode_submit('123', 'x' * 153, udh=pdu.concat_header(9, 2, 1))
+    assert parts[1] == pdu.encode_submit('123', 'x' * 17, udh=pdu.concat_header(9, 2, 2))
+
+    # a full part takes all of the user data next to the header
+    parts = pdu.encode_sms('123', 'x' * 306, 255)
+    assert [length for data, length in parts] == [pdu.encode_submit('123', 'x' * 160)[1]] * 2
+    with pytest.raises(ValueError):
+        pdu.encode_sms('123', 'x' * 306, 256)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from sim800.emulator import SIM800Emulator
+from sim800.manager import SIM800, TimeoutException
+from sim800.pool import ModemPool
+
+
+@pytest.fixture
+def emulators():
+    emulators = [SIM800Emulator(latency={'+CMGS': 0.1}) for i in range(3)]
+    for e in emulators:
+        e.start()
+    yield emulators
+    for e in emulators:
+        e.stop()
+
+
+def wait_healthy(pool, count):
+    deadline = time.monotonic() + 3
+    while len(pool.healthy) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return len(pool.healthy)
+
+def send_all(pool, count):
+    futures = [pool.send_sms('+8613900000{:03}'.format(i), 'Message {}'.format(i)) for i in range(count)]
+    return [f.result(5) for f in futures]
+
+def test_pool_health(emulators):
+    emulators[1].signal = (99, 99)
+    with ModemPool([e.port for e in emulators], timeout=1) as pool:
+        assert wait_healthy(pool, 2) == 2
+        assert pool.modems[1].error == 'signal 99'
+        assert not pool.modems[1].healthy
+
+        emulators[1].signal = (20, 0)
+        pool.check_health()
+        assert wait_healthy(pool, 3) == 3
+        assert pool.modems[1].signal == 20
+
+def test_pool_least_outstanding(emulators):
+    with ModemPool([e.port for e in emulators], timeout=1) as pool:
+        assert wait_healthy(pool, 3) == 3
+        results = send_all(pool, 9)
+
+    assert all(final.success for r in results for final, result in r)
+    assert [len(e.sent) for e in emulators] == [3, 3, 3]
+    assert [m.sent for m in pool.modems] == [3, 3, 3]
+
+def test_pool_quota(emulators):
+    with ModemPool([e.port for e in emulators[:2]], quota=2, timeout=1) as pool:
+        assert wait_healthy(pool, 2) == 2
+        assert all(final.success for r in send_all(pool, 4) for final, result in r)
+
+        future = pool.send_sms('+8613900000000', 'over the quota')
+        time.sleep(0.2)
+        assert not future.done()
+        assert pool.outstanding == 1
+
+        pool.add(SIM800(emulators[2].port, timeout=1))
+        assert future.result(3)[0][0].success
+    assert [len(e.sent) for e in emulators] == [2, 2, 1]
+
+def test_pool_fail_over(emulators):
+    emulators[0].latency['+CMGS'] = 1  # no "> " prompt in time
+    with ModemPool([e.port for e in emulators[:2]], timeout=1) as pool:
+        pool.modems[0].manager.PROMPT_TIMEOUT = 0.3
+        assert wait_healthy(pool, 2) == 2
+        futures = [pool.send_sms('+8613900000{:03}'.format(i), 'Message {}'.format(i)) for i in range(6)]
+
+        with pytest.raises(TimeoutException):
+            futures[0].result(5)  # it may have been sent, it isn't sent again
+        assert all(f.result(5)[0][0].success for f in futures[1:])
+        assert not pool.modems[0].healthy
+    assert len(emulators[1].sent) == 5
+
+def test_pool_quota_skips_job_too_big(emulators):
+    with ModemPool([emulators[0].port], quota=2, timeout=1) as pool:
+        assert wait_healthy(pool, 1) == 1
+        big = pool.send_sms('+8613900000000', 'x' * 400)  # 3 parts
+        small = pool.send_sms('+8613900000001', 'fits')
+        assert small.result(3)[0][0].success
+        assert not big.done()
+        assert pool.outstanding == 3
+
+def test_pool_send_failures(emulators):
+    emulators[0].send_errors = [500] * 10  # answers AT and +CSQ, but every +CMGS fails
+    with ModemPool([e.port for e in emulators[:2]], timeout=1) as pool:
+        pool.RECHECK_INTERVAL = 10
+        assert wait_healthy(pool, 2) == 2
+        for i in range(pool.MAX_SEND_FAILURES):
+            assert not send_all(pool, 1)[0][-1][0].success
+        assert not pool.modems[0].healthy
+        assert pool.modems[0].error == '3 messages failed in a row: Unknown'
+
+        assert send_all(pool, 1)[0][-1][0].success
+    assert len(emulators[1].sent) == 1
+
+def test_pool_parallel(emulators):
+    # the modems send at the same time: 3 of them take about a third of the time of one
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def counting(send_sms):
+        def wrapper(*args, **kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            try:
+                return send_sms(*args, **kwargs)
+            finally:
+                with lock:
+                    active.pop()
+        return wrapper
+
+    with ModemPool([e.port for e in emulators], timeout=1) as pool:
+        for modem in pool.modems:
+            modem.manager.send_sms = counting(modem.manager.send_sms)
+        assert wait_healthy(pool, 3) == 3
+        send_all(pool, 12)
+
+    assert max(peak) >= 2
+    assert [len(e.sent) for e in emulators] == [4, 4, 4]
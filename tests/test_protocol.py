@@ -0,0 +1,202 @@
+from sim800.protocol import ATProtocol, Echo, Response, FinalResult, Unsolicited, Prompt
+import sim800.results.unsolicited as unsolicited
+
+
+def test_protocol_command_result():
+    p = ATProtocol()
+    events = p.receive_data(b'AT+GSV;+GSN\r\r\nSIMCOM_Ltd\r\nSIMCOM_SIM800L\r\nRevision:9999999SIM800L99\r\n\r\n862643039999994\r\n\r\nOK\r\n')
+
+    assert events == [
+        Echo(b'AT+GSV;+GSN\r'),
+        Response(b'\r\nSIMCOM_Ltd\r\nSIMCOM_SIM800L\r\nRevision:9999999SIM800L99\r\n'),
+        Response(b'\r\n862643039999994\r\n'),
+        FinalResult(b'\r\nOK\r\n'),
+    ]
+    assert events[-1].result.success
+    assert p.flush() == []
+
+def test_protocol_byte_by_byte():
+    data = b'AT+COPS?\r\r\n+COPS: 0,0,"CHINA MOBILE"\r\n\r\n+CME ERROR: 10\r\n'
+    p = ATProtocol()
+    events = []
+    for i in range(len(data)):
+        events += p.receive_data(data[i:i + 1])
+
+    assert events == [
+        Echo(b'AT+COPS?\r'),
+        Response(b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n'),
+        FinalResult(b'\r\n+CME ERROR: 10\r\n'),
+    ]
+    assert events[-1].result.error == 'SIM not inserted'
+
+def test_protocol_unsolicited_flush():
+    p = ATProtocol()
+    assert p.receive_data(b'\r\n+CMTI: "ME",1\r\n') == []
+
+    events = p.flush()
+    assert len(events) == 1
+    assert type(events[0]) is Unsolicited
+    assert type(events[0].result) is unsolicited.NewMessageResult
+    assert events[0].result.index == 1
+
+def test_protocol_unsolicited_before_result():
+    p = ATProtocol()
+    events = p.receive_data(b'\r\n+CMTI: "ME",1\r\nAT\r\r\nOK\r\n')
+
+    assert [type(e) for e in events] == [Unsolicited, Echo, FinalResult]
+
+def test_protocol_trailing_cr_flush():
+    p = ATProtocol()
+    assert p.receive_data(b'AT\r') == []
+    assert p.flush() == [Echo(b'AT\r')]
+
+def test_protocol_prompt():
+    p = ATProtocol()
+    p.expect_prompt()
+    events = p.receive_data(b'AT+CMGS="+999"\r\r\n> ')
+
+    assert events == [Echo(b'AT+CMGS="+999"\r'), Prompt(b'\r\n> ')]
+
+    events = p.receive_data(b'Test SMS message\x1a\r\n+CMGS: 12\r\n\r\nOK\r\n')
+    assert [type(e) for e in events] == [Response, Response, FinalResult]
+
+def test_protocol_prompt_not_expected():
+    p = ATProtocol()
+    assert p.receive_data(b'\r\n> ') == []
+
+def test_protocol_error_instead_of_prompt():
+    p = ATProtocol()
+    p.expect_prompt()
+    events = p.receive_data(b'AT+CMGS="+999"\r\r\nERROR\r\n')
+    assert [type(e) for e in events] == [Echo, FinalResult]
+
+    assert p.receive_data(b'\r\n> ') == []
+
+def test_protocol_numeric():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'+CSQ: 20,0\r\n+CREG: 0,1\r\n0\r')
+
+    assert events == [
+        Response(b'+CSQ: 20,0\r\n'),
+        Response(b'+CREG: 0,1\r\n'),
+        FinalResult(b'0\r'),
+    ]
+    assert events[-1].result.success
+    assert p.flush() == []
+
+def test_protocol_numeric_multiline_result():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'+CMGL: 1,"REC READ","+999"\r\nfirst\r\n+CMGL: 2,"REC READ","+999"\r\nsecond\r\n0\r')
+
+    assert events == [
+        Response(b'+CMGL: 1,"REC READ","+999"\r\nfirst\r\n+CMGL: 2,"REC READ","+999"\r\nsecond\r\n'),
+        FinalResult(b'0\r'),
+    ]
+
+def test_protocol_numeric_error_and_unsolicited():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'AT+CMGR=9\r+CMS ERROR: 321\r\n+CMTI: "SM",1\r\n4\r')
+
+    assert [type(e) for e in events] == [Echo, FinalResult, Unsolicited, FinalResult]
+    assert events[1].result.error == 'unknown CMS error code'
+    assert events[3].result.error == 'ERROR'
+
+def test_protocol_numeric_call_results():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'2\r2\rATD+8613912345678;\r3\r')
+
+    assert [type(e) for e in events] == [Unsolicited, Unsolicited, Echo, FinalResult]
+    assert type(events[0].result) is unsolicited.RingResult
+    assert events[3].result.error == 'NO CARRIER'
+
+def test_protocol_ring():
+    p = ATProtocol()
+    events = p.receive_data(b'\r\nRING\r\n\r\n')
+    assert [type(e.result) for e in events] == [unsolicited.RingResult]
+
+def test_protocol_numeric_verbose_result():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'ATV0\r\r\nOK\r\n')
+
+    assert [type(e) for e in events] == [Echo, FinalResult]
+
+def test_protocol_numeric_text_like_result():
+    # after ATV0's final result b'OK\r\n' and b'ERROR\r\n' are text, e.g. SMS text
+    p = ATProtocol()
+    p.numeric = True
+    assert [type(e) for e in p.receive_data(b'ATV0\r0\r')] == [Echo, FinalResult]
+    events = p.receive_data(b'+CMGR: "REC READ","+999","","24/10/18,10:00:00+32"\r\nOK\r\n0\r'
+                            b'+CMGR: "REC READ","+999","","24/10/18,10:00:00+32"\r\nERROR\r\n0\r')
+
+    assert events == [
+        Response(b'+CMGR: "REC READ","+999","","24/10/18,10:00:00+32"\r\nOK\r\n'),
+        FinalResult(b'0\r'),
+        Response(b'+CMGR: "REC READ","+999","","24/10/18,10:00:00+32"\r\nERROR\r\n'),
+        FinalResult(b'0\r'),
+    ]
+
+def test_protocol_stream():
+    p = ATProtocol()
+    p.stream(b'+CMGL: ')
+    events = p.receive_data(b'AT+CMGL=4\r\r\n+CMGL: 1,1,,3\r\n010203\r\n+CMGL: 2,1,,2\r\n0405\r\n\r\nOK\r\n')
+
+    assert events == [
+        Echo(b'AT+CMGL=4\r'),
+        Response(b'\r\n+CMGL: 1,1,,3\r\n010203\r\n'),
+        Response(b'\r\n+CMGL: 2,1,,2\r\n0405\r\n'),
+        FinalResult(b'\r\nOK\r\n'),
+    ]
+    assert p._stream_prefix is None
+
+def test_protocol_numeric_stream():
+    p = ATProtocol()
+    p.numeric = True
+    p.stream(b'+CMGL: ')
+    events = p.receive_data(b'+CMGL: 1,1,,3\r\n010203\r\n+CMGL: 2,1,,2\r\n0405\r\n0\r')
+
+    assert [e.raw for e in events] == [b'+CMGL: 1,1,,3\r\n010203\r\n', b'+CMGL: 2,1,,2\r\n0405\r\n', b'0\r']
+    assert p._stream_prefix is None
+
+def test_protocol_unsolicited_body():
+    # the SMS text of +CMT ends the result, whatever it looks like
+    p = ATProtocol()
+    events = p.receive_data(b'\r\n+CMT: "+999","","24/10/18,10:00:00+32"\r\nOK\r\n')
+    assert len(events) == 1
+    assert type(events[0].result) is unsolicited.DeliveredMessageResult
+    assert events[0].result.text == 'OK'
+
+    events = p.receive_data(b'\r\n+CDS: 6,42,,,"24/10/18,10:00:00+32","24/10/18,10:00:05+32",0\r\n\r\n+CDS: 25\r\n')
+    assert [type(e.result) for e in events] == [unsolicited.StatusReportResult]
+    events = p.receive_data(b'00062A0B911326880736F4428021510000804280215100058000\r\n')
+    assert events[0].result.message_reference == 42
+
+def test_protocol_unsolicited_multiline_text():
+    # with <length> the text goes on over its own line breaks, even lines that look like results
+    p = ATProtocol()
+    header = b'\r\n+CMT: "+123","","24/10/18,10:00:00+32",145,4,0,0,"+1",145,{}\r\n'
+    events = p.receive_data(header.replace(b'{}', b'15') + b'line1\r\nOK\r\nline2\r\n\r\nOK\r\n')
+    assert [type(e) for e in events] == [Unsolicited, FinalResult]
+    assert events[0].result.text == 'line1\r\nOK\r\nline2'
+
+    events = p.receive_data(header.replace(b'{}', b'7') + b'{line}\r\n\r\nOK\r\n')  # '{' takes two septets
+    assert events[0].result.text == '{line}'
+    assert type(events[1]) is FinalResult
+
+    # 8 bit data is shown in hex on one line
+    events = p.receive_data(header.replace(b'{}', b'4').replace(b',0,0,', b',0,4,') + b'01020304\r\n\r\nOK\r\n')
+    assert events[0].result.text == '01020304'
+    assert type(events[1]) is FinalResult
+
+def test_protocol_numeric_unsolicited_body():
+    p = ATProtocol()
+    p.numeric = True
+    events = p.receive_data(b'+CMT: ,25\r\n0\r\n+CDS: 6,42,,,"24/10/18,10:00:00+32","24/10/18,10:00:05+32",0\r\n0\r')
+
+    assert [type(e) for e in events] == [Unsolicited, Unsolicited, FinalResult]
+    assert events[0].raw == b'+CMT: ,25\r\n0\r\n'
+    assert events[1].result.message_reference == 42
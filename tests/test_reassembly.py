@@ -0,0 +1,61 @@
+from sim800 import pdu
+from sim800.reassembly import ReassemblyIndex
+
+
+def deliver(address, text, udh=b''):
+    dcs, length, data = pdu.encode_user_data(text, udh=udh)
+    first_octet = pdu.UDHI if len(udh) > 0 else 0
+    return pdu.Deliver(b'\x00' + bytes([first_octet]) + pdu.encode_address(address) + bytes([0, dcs])
+                       + bytes.fromhex('42802151000080') + bytes([length]) + data)
+
+def parts(address, reference, texts):
+    return [deliver(address, text, pdu.concat_header(reference, len(texts), i)) for i, text in enumerate(texts, 1)]
+
+def test_reassembly_single():
+    index = ReassemblyIndex()
+    message = index.add(deliver('+123', 'Hello'))
+    assert message.text == 'Hello'
+    assert message.address == '+123'
+    assert len(index) == 0
+
+def test_reassembly_out_of_order():
+    index = ReassemblyIndex()
+    a = parts('+123', 7, ['one ', 'two ', 'three'])
+    b = parts('+456', 7, ['four ', 'five'])
+
+    assert index.add(a[2]) is None
+    assert index.add(b[1]) is None
+    assert index.add(a[0]) is None
+    assert len(index) == 2
+    assert index.add(a[0]) is None  # repeated
+    message = index.add(a[1])
+    assert message.text == 'one two three'
+    assert message.parts == [a[0], a[1], a[2]]
+    assert index.add(b[0]).text == 'four five'
+    assert len(index) == 0
+
+def test_reassembly_timeout():
+    expired = []
+    index = ReassemblyIndex(timeout=10, expired=expired.append)
+    a = parts('+123', 1, ['one ', 'two'])
+    b = parts('+123', 2, ['three ', 'four'])
+
+    assert index.add(a[0], now=100) is None
+    assert index.add(b[0], now=105) is None
+    assert index.add(b[1], now=109).text == 'three four'
+    assert index.add(a[1], now=111) is None  # too late, the first part is evicted
+    assert expired == [[a[0]]]
+    assert index.evict(now=120) == []
+    assert index.evict(now=121) == [[a[1]]]
+    assert expired == [[a[0]], [a[1]]]
+    assert len(index) == 0
+
+def test_reassembly_reference_reused():
+    index = ReassemblyIndex()
+    a = parts('+123', 1, ['one ', 'two'])
+    b = parts('+123', 1, ['three ', 'four ', 'five'])
+
+    assert index.add(a[0]) is None
+    assert index.add(b[1]) is None
+    assert index.add(b[0]) is None
+    assert index.add(b[2]).text == 'three four five'
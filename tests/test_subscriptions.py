@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from sim800.subscriptions import UnsolicitedRegistry, QueueEmpty
+from sim800.results.unsolicited import UnsolicitedResult, NewMessageResult
+
+
+def cmti(index):
+    return NewMessageResult('\r\n+CMTI: "SM",{}\r\n'.format(index).encode('ascii'))
+
+
+def test_registry_dispatch_by_type():
+    r = UnsolicitedRegistry()
+    new_messages = []
+    everything = []
+    r.on(NewMessageResult, new_messages.append)
+    r.on(UnsolicitedResult, everything.append)
+
+    r.publish(cmti(1))
+    other = UnsolicitedResult(b'\r\n+CRING: VOICE\r\n')
+    r.publish(other)
+    assert r.join(1)
+
+    assert [m.index for m in new_messages] == [1]
+    assert everything == [new_messages[0], other]
+    assert len(r.queue) == 0
+    assert r.counters()['dispatched'] == 2
+
+def test_registry_off():
+    r = UnsolicitedRegistry()
+    results = []
+    r.on(NewMessageResult, results.append)
+    r.off(NewMessageResult, results.append)
+
+    r.publish(cmti(1))
+    assert results == []
+    assert r.get(0).index == 1
+
+def test_registry_drop_oldest():
+    r = UnsolicitedRegistry(maxlen=3)
+    for i in range(5):
+        r.publish(cmti(i))
+
+    assert [m.index for m in r.queue] == [2, 3, 4]
+    assert r.dropped == 2
+    assert r.received == 5
+
+def test_registry_drop_newest():
+    r = UnsolicitedRegistry(maxlen=3, overflow=UnsolicitedRegistry.DROP_NEWEST)
+    for i in range(5):
+        r.publish(cmti(i))
+
+    assert [m.index for m in r.queue] == [0, 1, 2]
+    assert r.dropped == 2
+
+def test_registry_overflow_not_supported():
+    with pytest.raises(ValueError):
+        UnsolicitedRegistry(overflow='block')
+
+def test_registry_callback_error():
+    r = UnsolicitedRegistry()
+
+    def failing(result):
+        raise RuntimeError('slow consumer')
+    r.on(NewMessageResult, failing)
+
+    r.publish(cmti(1))
+    r.join()
+    assert r.callback_errors == 1
+
+def test_registry_get_empty():
+    r = UnsolicitedRegistry()
+    with pytest.raises(QueueEmpty):
+        r.get(0)
+
+def test_registry_slow_callback():
+    r = UnsolicitedRegistry(maxlen=2)
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow(result):
+        started.set()
+        release.wait(1)
+        results.append(result.index)
+    r.on(NewMessageResult, slow)
+
+    r.publish(cmti(0))
+    assert started.wait(1)
+    start = time.monotonic()
+    for i in range(1, 4):
+        r.publish(cmti(i))
+    assert time.monotonic() - start < 0.5  # publish() doesn't wait for the callback
+    release.set()
+    assert r.join(1)
+
+    assert results == [0, 2, 3]  # the oldest result waiting is dropped
+    assert r.dropped == 1
+    r.close()
+
+def test_registry_watch():
+    r = UnsolicitedRegistry()
+    results = []
+    r.on(NewMessageResult, results.append, consume=False)
+
+    r.publish(cmti(1))
+    r.join()
+    assert [m.index for m in results] == [1]
+    assert r.get(0) is results[0]
@@ -0,0 +1,170 @@
+import os
+import threading
+
+import pytest
+import serial
+
+from sim800.threaded import ThreadedSIM800
+from sim800.manager import TimeoutException
+from sim800.commands.command import Command
+from sim800.results.result import Result
+import sim800.results.unsolicited as unsolicited
+
+
+def threaded_sim800(port, timeout=1):
+    s = ThreadedSIM800(timeout=timeout)
+    s.serial = serial.Serial(port, timeout=ThreadedSIM800.READ_TIMEOUT)
+    return s
+
+
+def test_threaded_sim800_send_command(pty_port, fake_modem):
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        f, r = s.send_command(Command('+COPS?', ['+COPS: ']))
+
+    assert f.success
+    assert type(r) is Result
+    assert r.raw_result == b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n'
+
+def test_threaded_sim800_submit_batched(pty_port, fake_modem):
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+CSQ: 20,0\r\n\r\n+CREG: 0,1\r\n\r\n+CBC: 0,80,4000\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        csq = s.submit(Command('+CSQ', ['+CSQ: ']))
+        creg = s.submit(Command('+CREG?', ['+CREG: ']))
+        cbc = s.submit(Command('+CBC', ['+CBC: ']))
+        assert cbc.result(1)[1].str_result == '+CBC: 0,80,4000'
+        assert creg.result(1)[1].str_result == '+CREG: 0,1'
+        assert csq.result(1)[1].str_result == '+CSQ: 20,0'
+
+    assert modem.commands == [b'AT+CSQ;+CREG?;+CBC\r']
+
+def test_threaded_sim800_submit_in_order(pty_port, fake_modem):
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+CSQ: 20,0\r\n\r\nOK\r\n', b'\r\n+CBC: 0,80,4000\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        s.BATCH_WINDOW = 0
+        csq = s.submit(Command('+CSQ', ['+CSQ: ']))
+        cbc = s.submit(Command('+CBC', ['+CBC: ']))
+        assert cbc.result(1)[1].str_result == '+CBC: 0,80,4000'
+        assert csq.result(1)[1].str_result == '+CSQ: 20,0'
+
+    assert modem.commands == [b'AT+CSQ\r', b'AT+CBC\r']
+
+def test_threaded_sim800_timeout(pty_port):
+    master, port = pty_port
+
+    with threaded_sim800(port, timeout=0.3) as s:
+        with pytest.raises(TimeoutException):
+            s.send_command(Command(''))
+
+def test_threaded_sim800_subscribe(pty_port):
+    master, port = pty_port
+    received = threading.Event()
+    results = []
+
+    def on_unsolicited(result):
+        results.append(result)
+        received.set()
+
+    with threaded_sim800(port) as s:
+        s.subscribe(on_unsolicited)
+        os.write(master, b'\r\n+CMTI: "SM",7\r\n')
+        assert received.wait(1)
+        u = s.recv_unsolicited()
+
+        s.unsubscribe(on_unsolicited)
+        os.write(master, b'\r\n+CMTI: "SM",8\r\n')
+        assert s.recv_unsolicited().index == 8
+
+    assert results == [u]
+    assert type(u) is unsolicited.NewMessageResult
+    assert u.index == 7
+
+def test_threaded_sim800_send_command_after_prompt(pty_port, fake_modem):
+    from sim800.commands.ts27005 import SendSMSMessageCommand
+
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n> ', b'\r\n+CMGS: 12\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        f, r = s.send_command(SendSMSMessageCommand.write("+999", text="Test SMS message"))
+
+    assert modem.commands == [b'AT+CMGS="+999"\r', b'Test SMS message\x1a']
+    assert f.success
+    assert r.str_result == '+CMGS: 12'
+
+def test_threaded_sim800_recv_command_result(pty_port, fake_modem):
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+COPS: 0,0,"CHINA MOBILE"\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        cmd = Command('+COPS?', ['+COPS: '])
+        assert s.send_command(cmd, recv_result=False) is None
+        f, r = s.recv_command_result(cmd, timeout=1)
+        with pytest.raises(ValueError):
+            s.recv_command_result(cmd)
+
+    assert f.success
+    assert r.str_result == '+COPS: 0,0,"CHINA MOBILE"'
+
+def test_threaded_sim800_iter_command_result(pty_port, fake_modem):
+    from sim800.commands.ts27005 import ListSMSMessagesCommand
+
+    master, port = pty_port
+    modem = fake_modem(master, [
+        b'\r\n+CMGL: 1,"REC UNREAD","+8613912345678","","24/10/18,10:00:00+32"\r\nfirst\r\n'
+        b'+CMGL: 2,"REC READ","+8613912345678","","24/10/18,10:01:00+32"\r\nsecond\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        records = s.iter_command_result(ListSMSMessagesCommand.write(ListSMSMessagesCommand.TEXT_MODE.ALL))
+        assert [(m.index, m.text) for m in records] == [(1, 'first'), (2, 'second')]
+
+def test_threaded_sim800_run_queue(pty_port, fake_modem):
+    master, port = pty_port
+    modem = fake_modem(master, [b'\r\n+CSQ: 20,0\r\n\r\nERROR\r\n', b'\r\n+CME ERROR: 3\r\n', b'\r\n+CBC: 0,80,4000\r\n\r\nOK\r\n'])
+    modem.start()
+
+    with threaded_sim800(port) as s:
+        s.BATCH_WINDOW = 1
+        csq = s.submit(Command('+CSQ', ['+CSQ: ']))
+        creg = s.submit(Command('+CREG?', ['+CREG: ']))
+        cbc = s.submit(Command('+CBC', ['+CBC: ']))
+        s.run_queue()  # doesn't wait for BATCH_WINDOW
+        assert csq.done() and creg.done() and cbc.done()
+
+    assert csq.result()[0].success
+    assert not creg.result()[0].success
+    assert cbc.result()[1].str_result == '+CBC: 0,80,4000'
+    assert modem.commands == [b'AT+CSQ;+CREG?;+CBC\r', b'AT+CREG?\r', b'AT+CBC\r']
+
+def test_threaded_sim800_send_sms(emulator):
+    with ThreadedSIM800(emulator.port, timeout=1) as s:
+        results = s.send_sms('+8613912345678', 'x' * 200)
+        report = s.send_sms_burst([('+8613900000001', 'Message 1'), ('+8613900000002', 'Message 2')])
+
+    assert [r.str_result for f, r in results] == ['+CMGS: 1', '+CMGS: 2']
+    assert report.sent == 2 and report.failed == 0
+    assert [m.address for m in emulator.sent] == ['+8613912345678'] * 2 + ['+8613900000001', '+8613900000002']
+
+def test_threaded_sim800_without_start(emulator):
+    # the first command starts the reader, which gives up on the command at its deadline
+    from sim800.commands.ts27005 import ListSMSMessagesCommand
+
+    emulator.sms_format = 1
+    emulator.receive_sms('+8613912345678', 'Hello')
+    s = ThreadedSIM800(emulator.port, timeout=1)
+    assert s.send_command(Command('+CSQ', ['+CSQ: ']))[1].str_result == '+CSQ: 20,0'
+    records = s.iter_command_result(ListSMSMessagesCommand.write(ListSMSMessagesCommand.TEXT_MODE.ALL))
+    assert [m.text for m in records] == ['Hello']
+    s.close()
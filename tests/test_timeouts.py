@@ -0,0 +1,57 @@
+from sim800.timeouts import LatencyEstimator
+from sim800.commands.command import Command, CombinedCommand
+from sim800.commands.v25ter import ATCommand
+from sim800.commands.ts27005 import SendSMSMessageCommand, ListSMSMessagesCommand
+from sim800.commands.ts27007 import OperationSelectionCommand, SignalQualityReportCommand
+
+
+def test_latency_estimator_default_before_samples():
+    e = LatencyEstimator(5)
+    assert e.timeout(ATCommand()) == 5
+    e.observe(ATCommand(), 0.01)
+    assert e.timeout(ATCommand()) == 5
+
+def test_latency_estimator_fast_command():
+    e = LatencyEstimator(5)
+    for _ in range(10):
+        e.observe(ATCommand(), 0.01)
+
+    assert e.timeout(ATCommand()) == LatencyEstimator.MIN_TIMEOUT
+    latency, variation = e.estimate(ATCommand())
+    assert abs(latency - 0.01) < 0.001
+
+def test_latency_estimator_command_limit():
+    e = LatencyEstimator(5)
+    assert e.timeout(ListSMSMessagesCommand.execute()) == 20
+    for _ in range(10):
+        e.observe(ListSMSMessagesCommand.execute(), 30)
+    assert e.timeout(ListSMSMessagesCommand.execute()) == 20
+
+def test_latency_estimator_not_adaptive():
+    e = LatencyEstimator(5)
+    cmd = SendSMSMessageCommand.write("+999", text="Test SMS message")
+    for _ in range(10):
+        e.observe(cmd, 0.5)
+    assert e.timeout(cmd) == 60
+
+def test_latency_estimator_modes_are_separate():
+    e = LatencyEstimator(5)
+    for _ in range(10):
+        e.observe(OperationSelectionCommand.read(), 0.05)
+    assert e.estimate(OperationSelectionCommand.test()) is None
+    assert e.estimate(OperationSelectionCommand.read()) is not None
+
+def test_latency_estimator_timed_out_backs_off():
+    e = LatencyEstimator(5)
+    for _ in range(10):
+        e.observe(SignalQualityReportCommand.execute(), 0.2)
+    timeout = e.timeout(SignalQualityReportCommand.execute())
+    e.timed_out(SignalQualityReportCommand.execute())
+    assert e.timeout(SignalQualityReportCommand.execute()) > timeout
+
+def test_latency_estimator_combined_command():
+    e = LatencyEstimator(5)
+    cmd = CombinedCommand(ATCommand(), OperationSelectionCommand.test())
+    assert cmd.TIMEOUT == 120
+    assert not cmd.ADAPTIVE_TIMEOUT
+    assert e.key(cmd) == (e.key(ATCommand()), e.key(OperationSelectionCommand.test()))
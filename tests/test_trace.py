@@ -0,0 +1,83 @@
+import io
+import time
+
+import pytest
+
+from sim800.trace import TraceRecorder, ReplaySerial, TraceMismatch, read_trace, READ, WRITE
+from sim800.emulator import SIM800Emulator
+from sim800.manager import SIM800
+from sim800.commands.command import Command
+from sim800.commands.ts27005 import SelectSMSMessageFormatCommand, SendSMSMessageCommand
+
+
+class UnclosedBytesIO(io.BytesIO):
+    def close(self):
+        pass
+
+
+def make_trace(records):
+    f = UnclosedBytesIO()
+    recorder = TraceRecorder(f)
+    for direction, data in records:
+        recorder.record(direction, data)
+    return f.getvalue()
+
+
+def test_read_trace():
+    trace = make_trace([(WRITE, b'AT\r'), (READ, b''), (READ, b'AT\r\r\nOK\r\n')])
+
+    records = list(read_trace(io.BytesIO(trace)))
+    assert [(d, data) for t, d, data in records] == [(WRITE, b'AT\r'), (READ, b'AT\r\r\nOK\r\n')]
+    assert records[0][0] <= records[1][0]
+
+def test_replay_serial_waits_for_write():
+    s = ReplaySerial(io.BytesIO(make_trace([(READ, b'\r\nRDY\r\n'), (WRITE, b'AT\r'), (READ, b'AT\r\r\nOK\r\n')])))
+
+    assert s.read(100) == b'\r\nRDY\r\n'
+    assert s.read(100) == b''
+    s.write(b'A')
+    assert s.in_waiting == 0
+    s.write(b'T\r')
+    assert s.read(3) == b'AT\r'
+    assert s.read(100) == b'\r\nOK\r\n'
+    assert s.done
+
+def test_replay_serial_mismatch():
+    s = ReplaySerial(io.BytesIO(make_trace([(WRITE, b'AT\r'), (READ, b'AT\r\r\nOK\r\n')])))
+
+    with pytest.raises(TraceMismatch):
+        s.write(b'AT+CSQ\r')
+
+def test_sim800_trace_replay():
+    trace = UnclosedBytesIO()
+    with SIM800Emulator(latency={'+CSQ': 0.2}) as emulator:
+        s = SIM800(emulator.port, timeout=1, trace=trace)
+        s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+        recorded = s.send_command(Command('+CSQ', ['+CSQ: ']))
+        s.send_command(SendSMSMessageCommand.write("+8613912345678", text="Hello"))
+        s.close()
+
+    for realtime in (False, True):
+        s = SIM800.replay(io.BytesIO(trace.getvalue()), realtime=realtime, timeout=1)
+        s.send_command(SelectSMSMessageFormatCommand.write(SelectSMSMessageFormatCommand.TEXT))
+        start = time.monotonic()
+        f, r = s.send_command(Command('+CSQ', ['+CSQ: ']))
+        elapsed = time.monotonic() - start
+        f_sms, r_sms = s.send_command(SendSMSMessageCommand.write("+8613912345678", text="Hello"))
+
+        assert (f, r) == recorded
+        assert r_sms.str_result == '+CMGS: 1'
+        assert s.serial.done
+        if realtime:
+            assert elapsed >= 0.15
+        else:
+            assert elapsed < 0.15
+
+def test_sim800_trace_negotiate_speed():
+    with SIM800Emulator(rate=115200, max_rate=230400) as emulator:
+        s = SIM800(emulator.port, baudrate=9600, timeout=1, trace=UnclosedBytesIO())
+        assert s.negotiate_speed() == 230400
+        assert s.serial.serial.baudrate == 230400
+        assert s.serial.serial.rtscts
+        assert s.send_command(Command('+CSQ', ['+CSQ: ']))[0].success
+        s.close()